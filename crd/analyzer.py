@@ -2,14 +2,95 @@ import os
 import logging
 import re
 import json
-from concurrent.futures import ThreadPoolExecutor
+import time
+from .utils.streaming import bounded_map, batched
+from .utils.topk import TopKSelector
+from .utils.leases import LeaseKeeper, make_worker_id, DEFAULT_LEASE_SECONDS
+from .utils.fingerprints import fingerprint, stage_fingerprint
 
 logger = logging.getLogger(__name__)
 
+RATING_PROMPT = (
+    "You are an AI assistant that rates articles strictly based on the criteria: '{criteria}'. "
+    "Reply with only a JSON object of the form "
+    '{{"relevant": <true or false>, "score": <1 to 10>, "reason": "<one sentence>"}}. '
+    "Set relevant to false, and leave out score and reason, if the article does not strictly match the criteria."
+)
+
+# Sent once, with the model's own reply, when a rating reply cannot be parsed.
+RATING_REPAIR_PROMPT = "Your reply could not be used: {error}. Reply again with only the JSON object described above."
+
+# Output tokens allowed for one rating; the JSON object needs far fewer.
+RATING_MAX_TOKENS = 150
+
+# Listwise mode: several articles per request, compared with each other and answered as JSON.
+LISTWISE_RATING_PROMPT = (
+    "You are an AI assistant that rates articles strictly based on the criteria: '{criteria}'. "
+    "You will be given several articles, each introduced by a line 'Article <id>: <title>'. "
+    "Compare them with each other and rate every one. Reply with only a JSON object of the form "
+    '{{"ratings": [{{"id": <id>, "relevant": <true or false>, "reason": "<one sentence>", "score": <1 to 10>}}]}} '
+    "with exactly one entry per article. Set relevant to false for an article that does not strictly match the criteria."
+)
+
+# Characters of each article sent in a listwise request.
+RATING_EXCERPT_CHARS = 2000
+
+# The reason returned with no score when the model judged an article irrelevant, as opposed to a failed rating.
+IRRELEVANT = "Not relevant to the criteria."
+
+# Cascade: articles scored within this many points of the selection threshold are re-rated by the escalation model.
+ESCALATION_BAND = 1.0
+
+def parse_json_reply(text):
+    """Parse the JSON object in a model reply, ignoring code fences or prose around it."""
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("No JSON object in reply")
+    return json.loads(text[start:end + 1])
+
+def rating_score(value):
+    """A score from a reply as a float from 1 to 10; accepts numbers and strings such as '7' or '7/10'."""
+    if isinstance(value, bool):
+        raise ValueError(f"score {value!r} is not a number")
+    if isinstance(value, str):
+        match = re.match(r'\s*(\d+(?:\.\d+)?)', value)
+        if not match:
+            raise ValueError(f"score {value!r} is not a number")
+        value = match.group(1)
+    score = float(value)
+    if not 1 <= score <= 10:
+        raise ValueError(f"score {score:g} is outside 1 to 10")
+    return score
+
+def parse_rating_reply(text):
+    """Parse a pointwise rating reply into (score, reason), with score None for an irrelevant article.
+
+    Besides the JSON object the prompt asks for, older 'reason, then
+    Rating: X/10' and 'Not relevant' replies are accepted. Anything else
+    raises ValueError saying what is wrong.
+    """
+    text = text.strip()
+    if text.rstrip('.').lower() == 'not relevant':
+        return None, None
+    try:
+        reply = parse_json_reply(text)
+    except ValueError:
+        match = re.search(r'Rating:\s*(\d+(?:\.\d+)?)\s*/\s*10', text, re.IGNORECASE)
+        if not match:
+            raise ValueError("the reply is not a JSON object")
+        return rating_score(match.group(1)), text[:match.start()].strip() or "No reason provided."
+    if not isinstance(reply, dict):
+        raise ValueError("the reply is not a JSON object")
+    if reply.get('relevant') is False:
+        return None, None
+    if 'score' not in reply:
+        raise ValueError("the JSON object has no score")
+    return rating_score(reply['score']), str(reply.get('reason') or "No reason provided.").strip()
+
 class ArticleAnalyzer:
     """Analyzes and rates articles"""
 
-    def __init__(self, db_manager, api_client, criteria_path, stats_manager=None, top_articles=10, min_score_map=None, max_workers=10, model="gpt-3.5-turbo"):
+    def __init__(self, db_manager, api_client, criteria_path, stats_manager=None, top_articles=10, min_score_map=None, max_workers=10, model="gpt-3.5-turbo", worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, batch_size=1, excerpt_chars=RATING_EXCERPT_CHARS, escalation_model=None, escalation_band=ESCALATION_BAND, cost_fn=None, max_tokens=RATING_MAX_TOKENS, stream=False):
         self.api_client = api_client
         self.db_manager = db_manager
         self.criteria_path = criteria_path
@@ -18,6 +99,21 @@ class ArticleAnalyzer:
         self.max_workers = max_workers
         self.stats_manager = stats_manager
         self.model = model
+        # Identifies this process's leases when several workers rate the same category.
+        self.worker_id = worker_id or make_worker_id()
+        self.lease_seconds = lease_seconds
+        # Articles per rating request; above 1, articles are rated listwise from excerpts of ``excerpt_chars``.
+        self.batch_size = max(1, batch_size)
+        self.excerpt_chars = excerpt_chars
+        # Rating cascade: ``model`` rates every article, and ``escalation_model`` re-rates those
+        # scored within ``escalation_band`` of the selection threshold. ``cost_fn(model,
+        # prompt_tokens, completion_tokens)`` prices the escalations for the stats report.
+        self.escalation_model = escalation_model if escalation_model and escalation_model != model else None
+        self.escalation_band = escalation_band
+        self.cost_fn = cost_fn
+        # Output token budget of a pointwise rating, and whether to stream it and stop once the JSON object is complete.
+        self.max_tokens = max_tokens
+        self.stream = stream
         self.rating_criteria = self._load_criteria()
 
     def _load_criteria(self):
@@ -32,52 +128,250 @@ class ArticleAnalyzer:
             logger.error(f"Error decoding JSON from {self.criteria_path}")
             return {}
 
-    def get_article_rating(self, content, category):
-        """Get rating for an article using the API"""
-        criteria = self.rating_criteria.get('default', {})
+    def criteria_text(self, category):
+        """The default criteria overlaid with the category's own, as prompt text, or None."""
+        criteria = dict(self.rating_criteria.get('default', {}))
         criteria.update(self.rating_criteria.get(category, {}))
-        
         if not criteria:
-            logger.warning(f"No rating criteria found for category: {category}")
             return None
+        return ", ".join([f"{k} ({v} points)" for k, v in criteria.items()])
+
+    def rating_prompt(self, category):
+        """The system prompt for rating one article of ``category``, or None without criteria."""
+        criteria = self.criteria_text(category)
+        return RATING_PROMPT.format(criteria=criteria) if criteria else None
+
+    def rating_key(self, category):
+        """Fingerprint of everything besides the article that decides its rating: models, prompts, batching and cascade."""
+        listwise = (LISTWISE_RATING_PROMPT, self.batch_size, self.excerpt_chars) if self.batch_size > 1 else ()
+        cascade = (self.escalation_model, self.escalation_band) if self.escalation_model else ()
+        return fingerprint(self.model, self.rating_prompt(category), *listwise, *cascade)
+
+    def get_article_rating(self, content, category, model=None):
+        """Rate an article with the API, using ``model`` instead of the rating model if given.
+
+        Returns (score, reason); (None, IRRELEVANT) if the model judged the
+        article irrelevant, or (None, None) if no usable rating came back. A
+        reply that cannot be parsed gets one repair request, which shows the
+        model its reply and what was wrong.
+        """
+        system_prompt = self.rating_prompt(category)
+        if not system_prompt:
+            logger.warning(f"No rating criteria found for category: {category}")
+            return None, None
+
+        model = model or self.model
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Rate the following article:\n\n{content}"}
+        ]
+        raw_rating = ''
+
+        timer = 'analyzer_escalation_api_call' if model != self.model else 'analyzer_api_call'
+        with self.stats_manager.time_block(timer) if self.stats_manager else open(os.devnull, 'w'):
+            try:
+                raw_rating = self.request_rating(model, messages)
+                logger.debug(f"Raw rating response: {raw_rating}")
+                try:
+                    score, reason = parse_rating_reply(raw_rating)
+                except ValueError as e:
+                    logger.info(f"Asking for a repaired rating, {e}: {raw_rating}")
+                    if self.stats_manager: self.stats_manager.increment('ratings_repair_requested')
+                    messages += [{"role": "assistant", "content": raw_rating},
+                                 {"role": "user", "content": RATING_REPAIR_PROMPT.format(error=e)}]
+                    raw_rating = self.request_rating(model, messages)
+                    score, reason = parse_rating_reply(raw_rating)
+                    if self.stats_manager: self.stats_manager.increment('ratings_repaired')
+            except ValueError as e:
+                logger.warning(f"Unexpected rating format, {e}: {raw_rating}")
+                if self.stats_manager: self.stats_manager.increment('articles_rated_failed_format')
+                return None, None
+            except Exception as e:
+                logger.error(f"Error getting rating: {e}")
+                return None, None
+
+        if score is None:
+            if self.stats_manager: self.stats_manager.increment('articles_rated_irrelevant')
+            return None, IRRELEVANT
+        if self.stats_manager: self.stats_manager.increment('articles_rated_success')
+        return score, reason
+
+    def request_rating(self, model, messages):
+        """Send one rating request and return the reply text.
+
+        The reply is asked for as a JSON object within ``max_tokens``. With
+        streaming on, reading stops as soon as the object is complete. The
+        server's usage report comes only at the end of a stream, so the API
+        client records an estimate for it, and ``ratings_streamed_unmetered``
+        counts these ratings. Escalations are never streamed, so their
+        cost is exact.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "response_format": {"type": "json_object"}
+        }
+        if model != self.model:
+            response = self.api_client.request(payload)
+            self.record_escalation_usage(model, response)
+            return response['choices'][0]['message']['content']
+        if not self.stream:
+            return self.api_client.request(payload)['choices'][0]['message']['content']
+
+        reply = ''
+        start = time.perf_counter()
+        pieces = self.api_client.stream(payload)
+        try:
+            for piece in pieces:
+                reply += piece
+                if '}' not in piece:
+                    continue
+                try:
+                    parse_json_reply(reply)
+                except ValueError:
+                    continue
+                if self.stats_manager:
+                    self.stats_manager.record_time('analyzer_time_to_score', time.perf_counter() - start)
+                    self.stats_manager.increment('ratings_streamed_unmetered')
+                break
+        finally:
+            # Closing the stream ends the generation, so nothing after the object is paid for.
+            pieces.close()
+        return reply
 
-        criteria_prompt = ", ".join([f"{k} ({v} points)" for k, v in criteria.items()])
-        
+    def record_escalation_usage(self, model, response):
+        """Count the tokens, and the cost if ``cost_fn`` is set, of one escalated rating."""
+        usage = response.get('usage') if isinstance(response, dict) else None
+        if not self.stats_manager or not usage:
+            return
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        self.stats_manager.increment('escalation_prompt_tokens', prompt_tokens)
+        self.stats_manager.increment('escalation_completion_tokens', completion_tokens)
+        if self.cost_fn:
+            # Counters are integers, so the cost is kept in millionths of the price currency.
+            self.stats_manager.increment('escalation_cost_micro_usd', round(self.cost_fn(model, prompt_tokens, completion_tokens) * 1_000_000))
+
+    def selection_threshold(self, category):
+        """The category's minimum score: the selection threshold before any top-N cut line exists."""
+        return self.min_score_map.get(category, 6.5)
+
+    def escalate(self, article, score, reason, threshold=None):
+        """Re-rate ``article`` with the escalation model if ``score`` is within the band around the threshold.
+
+        ``threshold`` is a callable returning the current selection threshold
+        (the top-N cut line once it is known). Returns (score, reason, model,
+        screening_score), where screening_score is the first model's score if
+        the article was escalated, else None. If the escalation model judges
+        the article irrelevant, the score is None and the article drops out of
+        the selection. If the escalation fails, the first score stands.
+        """
+        cut = threshold() if threshold else self.selection_threshold(article['category'])
+        if not self.escalation_model or abs(float(score) - cut) > self.escalation_band:
+            return score, reason, self.model, None
+        if self.stats_manager:
+            self.stats_manager.increment('ratings_escalated')
+        with self.stats_manager.span('escalate', article_id=article['id']) if self.stats_manager else open(os.devnull, 'w'):
+            escalated_score, escalated_reason = self.get_article_rating(article['content'], article['category'],
+                                                                        model=self.escalation_model)
+        if escalated_reason is IRRELEVANT:
+            logger.info(f"Escalated {article['title']}: {score}/10 from {self.model}, not relevant according to {self.escalation_model}")
+            if self.stats_manager:
+                self.stats_manager.increment('ratings_escalated_irrelevant')
+            return None, IRRELEVANT, self.escalation_model, float(score)
+        if not escalated_score:
+            logger.warning(f"Escalated rating failed for {article['title']}; keeping {self.model}'s score")
+            if self.stats_manager:
+                self.stats_manager.increment('ratings_escalation_failed')
+            return score, reason, self.model, None
+        logger.info(f"Escalated {article['title']}: {score}/10 from {self.model}, {escalated_score}/10 from {self.escalation_model}")
+        return escalated_score, escalated_reason, self.escalation_model, float(score)
+
+    def get_batch_ratings(self, articles, category):
+        """Rate several articles of ``category`` in one request.
+
+        Returns {article_id: (score, reason)} for the articles the reply rated
+        validly; irrelevant ones map to (None, None). Articles left out or
+        answered malformed are missing from the result.
+        """
+        criteria = self.criteria_text(category)
+        if not criteria:
+            logger.warning(f"No rating criteria found for category: {category}")
+            return {}
+
+        listing = "\n\n".join(f"Article {a['id']}: {a['title']}\n{a['content'][:self.excerpt_chars]}" for a in articles)
         payload = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": f"You are an AI assistant that rates articles strictly based on the criteria: '{criteria_prompt}'. First, determine if the article strictly matches the criteria. If it does not, respond with 'Not relevant'. If it matches, you must first provide a one-sentence reason for your rating, followed by the rating itself in the format 'Rating: X/10', where X is a number from 1 to 10."},
-                {"role": "user", "content": f"Rate the following article:\n\n{content}"}
+                {"role": "system", "content": LISTWISE_RATING_PROMPT.format(criteria=criteria)},
+                {"role": "user", "content": f"Rate the following {len(articles)} articles:\n\n{listing}"}
             ]
         }
-        
-        with self.stats_manager.time_block('analyzer_api_call') if self.stats_manager else open(os.devnull, 'w'):
+
+        with self.stats_manager.time_block('analyzer_batch_api_call') if self.stats_manager else open(os.devnull, 'w'):
             try:
                 response = self.api_client.request(payload)
-                raw_rating = response['choices'][0]['message']['content'].strip()
-                logger.debug(f"Raw rating response: {raw_rating}")
-                
-                if raw_rating.lower() == "not relevant":
-                    if self.stats_manager: self.stats_manager.increment('articles_rated_irrelevant')
-                    return None, None
-                    
-                match = re.search(r'Rating:\s*(\d+(\.\d+)?)/10', raw_rating, re.IGNORECASE)
-                
-                if match:
-                    score = match.group(1)
-                    reason_match = re.match(r'(.*?)Rating:', raw_rating, re.DOTALL | re.IGNORECASE)
-                    reason = reason_match.group(1).strip() if reason_match else "No reason provided."
-                    if self.stats_manager: self.stats_manager.increment('articles_rated_success')
-                    return score, reason
-                else:
-                    logger.warning(f"Unexpected rating format: {raw_rating}")
-                    if self.stats_manager: self.stats_manager.increment('articles_rated_failed_format')
-                    return None, None
+                reply = parse_json_reply(response['choices'][0]['message']['content'])
             except Exception as e:
-                logger.error(f"Error getting rating: {e}")
-                return None
+                logger.error(f"Error getting batch rating: {e}")
+                return {}
+
+        wanted = {a['id'] for a in articles}
+        ratings = {}
+        entries = reply.get('ratings') if isinstance(reply, dict) else None
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                article_id = int(entry['id'])
+                if article_id not in wanted:
+                    continue
+                if entry.get('relevant') is False:
+                    ratings[article_id] = (None, None)
+                    continue
+                ratings[article_id] = (rating_score(entry['score']), str(entry.get('reason') or 'No reason provided.').strip())
+            except (KeyError, TypeError, ValueError):
+                continue
+        return ratings
 
-    def rate_single_article(self, article):
+    def rate_article_batch(self, articles, threshold=None):
+        """Rate a batch of articles listwise in one request, then retry any the reply missed one at a time."""
+        rateable = [a for a in articles if a['content']]
+        results = [(a['id'], None, None) for a in articles if not a['content']]
+        if not rateable:
+            return results
+        with self.stats_manager.span('rate_batch', articles=len(rateable)) if self.stats_manager else open(os.devnull, 'w'):
+            ratings = self.get_batch_ratings(rateable, rateable[0]['category'])
+        if self.stats_manager:
+            self.stats_manager.increment('rating_batches')
+
+        for article in rateable:
+            if article['id'] not in ratings:
+                logger.info(f"Batch reply missed article {article['id']}; rating it individually")
+                if self.stats_manager:
+                    self.stats_manager.increment('ratings_retried_individually')
+                results.append(self.rate_single_article(article, threshold))
+                continue
+            score, reason = ratings[article['id']]
+            if score is None:
+                if self.stats_manager:
+                    self.stats_manager.increment('articles_rated_irrelevant')
+                results.append((article['id'], None, None))
+                continue
+            if self.stats_manager:
+                self.stats_manager.increment('articles_rated_success')
+            results.append(self.save_rating(article, *self.escalate(article, score, reason, threshold)))
+        return results
+
+    def save_rating(self, article, score, reason, model=None, screening_score=None):
+        """Store a rating; a None score records a verdict of irrelevant, which is never selected."""
+        self.db_manager.update_article_score_and_reason(
+            article['id'], None if score is None else float(score), reason, stage_fingerprint(self.rating_key(article['category']), article.get('content_hash')),
+            model or self.model, screening_score
+        )
+        logger.info(f"Rating for {article['title']}: {'none' if score is None else f'{score}/10'}. Reason: {reason}")
+        return article['id'], score, reason
+
+    def rate_single_article(self, article, threshold=None):
         """Rate a single article"""
         article_id = article['id']
         title = article['title']
@@ -87,35 +381,95 @@ class ArticleAnalyzer:
         if not article['content']:
             return article_id, None, None
 
-        score, reason = self.get_article_rating(article['content'], category)
+        with self.stats_manager.span('article', article_id=article_id) if self.stats_manager else open(os.devnull, 'w'):
+            with self.stats_manager.span('rate') if self.stats_manager else open(os.devnull, 'w'):
+                score, reason = self.get_article_rating(article['content'], category)
+            if score:
+                rating = self.escalate(article, score, reason, threshold)
         if score:
-            self.db_manager.update_article_score_and_reason(article_id, float(score), reason)
-            logger.info(f"Rating for {title}: {score}/10. Reason: {reason}")
-            return article_id, score, reason
+            return self.save_rating(article, *rating)
+        if reason is IRRELEVANT:
+            logger.info(f"Not relevant: {title}")
+            return article_id, None, None
 
         logger.warning(f"Failed to get rating for {title}")
         return article_id, None, None
 
-    def process(self, category, date_str):
-        """Process all articles for a category: rate them and select top ones"""
-        articles_to_rate = self.db_manager.get_articles_by_status('fetched', category, date_str)
-        if not articles_to_rate:
+    def process(self, category, date_str, on_selected=None):
+        """Process all articles for a category: rate them and select top ones.
+
+        Selection happens online: as soon as an article is provably among the
+        final top articles it is marked for summarization and, if given,
+        passed to ``on_selected(article_ids)``, while the rest are still
+        being rated. The final selection is the same as selecting after all
+        ratings are in.
+
+        Ratings made with a different model, prompt or article content are
+        dropped first, so a rerun re-rates only what is stale.
+        """
+        stale = self.db_manager.invalidate_stale_ratings(category, date_str, self.rating_key(category))
+        if stale:
+            logger.info(f"Re-rating {stale} articles whose rating inputs changed for '{category}' on {date_str}.")
+            if self.stats_manager:
+                self.stats_manager.increment('ratings_invalidated', stale)
+        pending_ids = self.db_manager.get_article_ids_by_status('fetched', category, date_str)
+        if not pending_ids:
             logger.warning(f"No articles found with status 'fetched' for category '{category}' on {date_str}.")
             return []
 
-        # Rate articles concurrently
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = [executor.submit(self.rate_single_article, article) for article in articles_to_rate]
-            for future in futures:
-                future.result()  # Wait for all futures to complete
-
         # Get the minimum score for the current category
         min_score = self.min_score_map.get(category, 6.5)
+        selector = TopKSelector(self.top_articles, min_score, pending_ids)
+        start = time.perf_counter()
+        selected = []
 
-        # Select top articles and mark them for summarization
-        top_article_ids = self.db_manager.select_top_articles_for_summary(
-            category, date_str, self.top_articles, min_score
-        )
-        logger.info(f"Selected {len(top_article_ids)} top articles for category '{category}' for summarization.")
+        def select(article_ids):
+            article_ids = self.db_manager.mark_selected_for_summary(article_ids)
+            if not article_ids:
+                return
+            if not selected and self.stats_manager:
+                self.stats_manager.record_time('analyzer_time_to_first_selection', time.perf_counter() - start)
+            selected.extend(article_ids)
+            logger.info(f"Selected {len(article_ids)} articles for summarization ({len(selected)} so far).")
+            if on_selected:
+                on_selected(article_ids)
 
+        # Ratings from earlier runs or other workers compete for the same top spots.
+        for article_id, score in self.db_manager.get_selection_scores(category, date_str):
+            select(selector.offer(article_id, score))
+
+        # Claim articles in small leased batches, so other worker processes can rate the
+        # same category without overlap, and rate them with a bounded number in flight.
+        with LeaseKeeper(self.db_manager, self.worker_id, self.lease_seconds):
+            articles_to_rate = self.db_manager.iter_claimed_articles(
+                'fetched', category, date_str, self.worker_id, self.max_workers, self.lease_seconds
+            )
+            # A cascade escalates scores near the selector's current threshold, which rises as ratings come in.
+            if self.batch_size > 1:
+                rated = (result for results in bounded_map(lambda batch: self.rate_article_batch(batch, selector.threshold),
+                                                           batched(articles_to_rate, self.batch_size), self.max_workers)
+                         for result in results)
+            else:
+                rated = bounded_map(lambda article: self.rate_single_article(article, selector.threshold),
+                                    articles_to_rate, self.max_workers)
+            for article_id, score, _ in rated:
+                if score:
+                    select(selector.offer(article_id, float(score)))
+                else:
+                    # Irrelevant or failed: out of this selection. A failed rating stays
+                    # 'fetched' in the database, so another worker may still retry it.
+                    select(selector.discard(article_id))
+
+        # Take in ratings written by other workers. Articles they are still rating stay
+        # pending, so the selection is completed by whichever worker finishes last.
+        leased_elsewhere = self.db_manager.get_leased_article_ids('fetched', category, date_str)
+        for article_id, score in self.db_manager.get_selection_scores(category, date_str):
+            select(selector.offer(article_id, score))
+        select(selector.finish(still_pending=leased_elsewhere))
+        if leased_elsewhere:
+            logger.info(f"{len(leased_elsewhere)} articles are still being rated by other workers; "
+                        f"they will complete the selection for '{category}'.")
+
+        top_article_ids = selector.selection()
+        logger.info(f"Selected {len(top_article_ids)} top articles for category '{category}' for summarization.")
         return top_article_ids
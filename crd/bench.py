@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import re
+import hashlib
+import logging
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .database import DatabaseManager
+from .fetcher import ArticleFetcher
+from .analyzer import ArticleAnalyzer
+from .summarizer import ArticleSummarizer
+from .renderer import NewsletterRenderer
+from .utils.stats import StatsManager
+from .utils.api_client import APIClient
+
+logger = logging.getLogger(__name__)
+
+BENCH_CATEGORY = 'Bench'
+REPORT_VERSION = 1
+STAGES = ('fetch', 'analyze', 'summarize', 'render')
+
+# A 1x1 transparent PNG, served as every article's og:image.
+PIXEL_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082'
+)
+WORDS = ('model', 'training', 'inference', 'latency', 'throughput', 'dataset', 'benchmark', 'token',
+         'agent', 'compute', 'research', 'network', 'protocol', 'market', 'release', 'analysis')
+
+class FakeServer:
+    """A local stand-in for RSS feeds, article pages and an OpenAI-compatible chat API.
+
+    Routes:
+        /feed/<n>.xml                 RSS feed with ``articles_per_feed`` items dated ``target_date``
+        /article/<n>/<i>.html         article page of about ``article_kb`` KB
+        /image/<n>/<i>.png            thumbnail
+        /v1/chat/completions          fake LLM, ``llm_latency`` seconds per call, 429 with ``rate_429`` probability
+
+    Everything is generated deterministically from the path so runs are comparable.
+    """
+
+    def __init__(self, target_date, feeds=5, articles_per_feed=20, article_kb=20, llm_latency=0.05, rate_429=0.0, seed=0):
+        self.target_date = target_date
+        self.feeds = feeds
+        self.articles_per_feed = articles_per_feed
+        self.article_kb = article_kb
+        self.llm_latency = llm_latency
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.counts_lock = threading.Lock()
+        self.request_counts = {}
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/v1/chat/completions"
+
+    def feed_urls(self):
+        return [f"{self.base_url}/feed/{n}.xml" for n in range(self.feeds)]
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self, 'GET')
+
+            def do_HEAD(self):
+                server.handle(self, 'HEAD')
+
+            def do_POST(self):
+                server.handle(self, 'POST')
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='bench-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count(self, key):
+        with self.counts_lock:
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    def handle(self, request, method):
+        path = request.path.split('?', 1)[0]
+        parts = path.strip('/').split('/')
+        try:
+            if method == 'POST' and path == '/v1/chat/completions':
+                length = int(request.headers.get('Content-Length') or 0)
+                payload = json.loads(request.rfile.read(length) or b'{}')
+                return self._chat_completion(request, payload)
+            if parts[0] == 'feed' and len(parts) == 2:
+                self._count('feed')
+                return self._send(request, 200, 'application/rss+xml', self.render_feed(int(parts[1].split('.')[0])), method)
+            if parts[0] == 'article' and len(parts) == 3:
+                self._count('article')
+                return self._send(request, 200, 'text/html; charset=utf-8',
+                                  self.render_article(int(parts[1]), int(parts[2].split('.')[0])), method)
+            if parts[0] == 'image':
+                self._count('image')
+                return self._send(request, 200, 'image/png', PIXEL_PNG, method)
+        except (ValueError, IndexError):
+            pass
+        self._count('not_found')
+        self._send(request, 404, 'text/plain', b'not found', method)
+
+    def _send(self, request, status, content_type, body, method='GET', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        if method != 'HEAD':
+            request.wfile.write(body)
+
+    def _send_stream(self, request, payload, digest, content, prompt_tokens, completion_tokens):
+        """Answer as server-sent events: the content in a few pieces, then the usage if asked for."""
+        base = {'id': f'bench-{digest % 10 ** 12}', 'object': 'chat.completion.chunk', 'model': payload.get('model', 'bench')}
+        step = max(1, len(content) // 4)
+        chunks = [dict(base, choices=[{'index': 0, 'delta': {'content': content[i:i + step]}, 'finish_reason': None}])
+                  for i in range(0, len(content), step)]
+        chunks.append(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            chunks.append(dict(base, choices=[], usage={'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                                                        'total_tokens': prompt_tokens + completion_tokens}))
+        body = ''.join(f'data: {json.dumps(chunk)}\n\n' for chunk in chunks) + 'data: [DONE]\n\n'
+        return self._send(request, 200, 'text/event-stream', body)
+
+    def _text(self, key, words):
+        rng = random.Random(key)
+        return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+    def render_feed(self, feed):
+        published = format_datetime(datetime(self.target_date.year, self.target_date.month, self.target_date.day,
+                                             12, 0, tzinfo=timezone.utc))
+        items = []
+        for i in range(self.articles_per_feed):
+            link = f"{self.base_url}/article/{feed}/{i}.html"
+            items.append(f"<item><title>Bench article {feed}-{i}: {self._text(f'title-{feed}-{i}', 6)}</title>"
+                         f"<link>{link}</link><guid>{link}</guid><pubDate>{published}</pubDate></item>")
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench feed {feed}</title>'
+                f'<link>{self.base_url}/</link><description>Synthetic feed</description>{"".join(items)}</channel></rss>')
+
+    def render_article(self, feed, index):
+        # Roughly seven bytes per word.
+        body = self._text(f'body-{feed}-{index}', max(1, self.article_kb * 1024 // 7))
+        paragraphs = ''.join(f'<p>{body[i:i + 800]}</p>' for i in range(0, len(body), 800))
+        return (f'<!DOCTYPE html><html><head><title>Bench article {feed}-{index}</title>'
+                f'<meta property="og:image" content="{self.base_url}/image/{feed}/{index}.png"></head>'
+                f'<body><nav>menu</nav><article><h1>Bench article {feed}-{index}</h1>{paragraphs}</article>'
+                f'<footer>footer</footer></body></html>')
+
+    def _chat_completion(self, request, payload):
+        with self.random_lock:
+            throttled = self.random.random() < self.rate_429
+        if throttled:
+            self._count('llm_429')
+            return self._send(request, 429, 'application/json', json.dumps({'error': {'message': 'Rate limit'}}),
+                              headers={'Retry-After': '1'})
+        self._count('llm')
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        messages = payload.get('messages', [])
+        prompt = '\n'.join(str(m.get('content', '')) for m in messages)
+        system = str(messages[0].get('content', '')) if messages else ''
+        digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        if 'rates articles' in system and 'several articles' in system:
+            ids = re.findall(r'^Article (\d+):', prompt, re.MULTILINE)
+            content = json.dumps({'ratings': [{'id': int(i), 'relevant': True, 'reason': 'Matches the criteria.',
+                                               'score': (digest >> (4 * n)) % 10 + 1} for n, i in enumerate(ids)]})
+        elif 'rates articles' in system and 'JSON' in system:
+            content = json.dumps({'relevant': True, 'score': digest % 10 + 1, 'reason': 'The article matches the criteria.'})
+        elif 'rates articles' in system:
+            content = f"The article matches the criteria. Rating: {digest % 10 + 1}/10"
+        elif 'Translate' in system:
+            content = '基准测试标题'
+        elif 'Chinese' in system:
+            content = '这是一个用于基准测试的中文摘要。'
+        else:
+            content = 'This is a synthetic summary used for benchmarking.'
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4 + 1
+        if payload.get('stream'):
+            return self._send_stream(request, payload, digest, content, prompt_tokens, completion_tokens)
+        body = {
+            'id': f'bench-{digest % 10 ** 12}', 'object': 'chat.completion', 'model': payload.get('model', 'bench'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }
+        return self._send(request, 200, 'application/json', json.dumps(body))
+
+class BenchmarkRunner:
+    """Runs fetch, analyze, summarize and render against a FakeServer and reports throughput."""
+
+    def __init__(self, feeds=5, articles_per_feed=20, article_kb=20, llm_latency=0.05, rate_429=0.0,
+                 max_workers=10, top_articles=10, retry_delay=2, rating_batch_size=1, escalation_model=None, rating_stream=False,
+                 skip_render=False, seed=0, work_dir=None):
+        self.params = {
+            'feeds': feeds, 'articles_per_feed': articles_per_feed, 'article_kb': article_kb,
+            'llm_latency': llm_latency, 'rate_429': rate_429, 'max_workers': max_workers,
+            'top_articles': top_articles, 'retry_delay': retry_delay, 'rating_batch_size': rating_batch_size,
+            'escalation_model': escalation_model, 'rating_stream': rating_stream,
+            'skip_render': skip_render, 'seed': seed
+        }
+        self.work_dir = work_dir
+
+    def run(self):
+        """Run every stage once in a scratch directory and return the report dict."""
+        params = self.params
+        target_date = datetime.now().date()
+        date_str = target_date.strftime('%Y-%m-%d')
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix='crd-bench-')
+        stats_manager = StatsManager()
+        stages = {}
+        server = FakeServer(target_date, params['feeds'], params['articles_per_feed'], params['article_kb'],
+                            params['llm_latency'], params['rate_429'], params['seed'])
+        db_manager = DatabaseManager(os.path.join(work_dir, 'bench.db'))
+        started_at = time.time()
+        try:
+            server.start()
+            feeds_path = os.path.join(work_dir, 'feeds.json')
+            criteria_path = os.path.join(work_dir, 'news_criteria.json')
+            with open(feeds_path, 'w', encoding='utf-8') as f:
+                json.dump({BENCH_CATEGORY: {'feeds': server.feed_urls()}}, f)
+            with open(criteria_path, 'w', encoding='utf-8') as f:
+                json.dump({'default': {'Relevance to the benchmark': 10}}, f)
+            db_manager.create_tables()
+            api_client = APIClient(server.api_url, 'bench', retry_delay=params['retry_delay'])
+            output_dir_for_date = os.path.join(work_dir, 'output', date_str)
+            os.makedirs(output_dir_for_date, exist_ok=True)
+
+            fetcher = ArticleFetcher(db_manager=db_manager, feeds_path=feeds_path, stats_manager=stats_manager,
+                                     target_date=target_date, max_workers=params['max_workers'])
+            analyzer = ArticleAnalyzer(db_manager=db_manager, api_client=api_client, criteria_path=criteria_path,
+                                       stats_manager=stats_manager, top_articles=params['top_articles'],
+                                       max_workers=params['max_workers'], model='bench-rating',
+                                       batch_size=params['rating_batch_size'], escalation_model=params['escalation_model'],
+                                       stream=params['rating_stream'])
+            summarizer = ArticleSummarizer(db_manager=db_manager, api_client=api_client, stats_manager=stats_manager,
+                                           model='bench-summary', max_workers=params['max_workers'])
+            renderer = NewsletterRenderer(db_manager=db_manager, stats_manager=stats_manager)
+
+            steps = {
+                'fetch': (lambda: fetcher.process(BENCH_CATEGORY, date_str), 'fetched'),
+                'analyze': (lambda: analyzer.process(BENCH_CATEGORY, date_str), 'selected_for_summary'),
+                'summarize': (lambda: summarizer.process(BENCH_CATEGORY, date_str), 'summarized'),
+                'render': (lambda: renderer.process(BENCH_CATEGORY, date_str, output_dir_for_date), 'complete'),
+            }
+            for stage in STAGES:
+                if stage == 'render' and params['skip_render']:
+                    continue
+                step, _ = steps[stage]
+                items = self._stage_input_count(db_manager, stage, date_str)
+                start = time.perf_counter()
+                error = None
+                try:
+                    with stats_manager.time_block(f'stage_{stage}'):
+                        step()
+                except Exception as e:
+                    logger.error(f"Benchmark stage {stage} failed: {e}")
+                    error = str(e)
+                seconds = time.perf_counter() - start
+                stages[stage] = {
+                    'seconds': seconds, 'items': items,
+                    'items_per_second': items / seconds if seconds > 0 else None, 'error': error
+                }
+        finally:
+            server.stop()
+            db_manager.close()
+            if not self.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        snapshot = stats_manager.snapshot()
+        return {
+            'version': REPORT_VERSION,
+            'started_at': datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+            'total_seconds': time.time() - started_at,
+            'environment': environment_info(),
+            'params': params,
+            'stages': stages,
+            'counters': snapshot['counters'],
+            'timings': snapshot['timings'],
+            'server_requests': dict(server.request_counts),
+        }
+
+    def _stage_input_count(self, db_manager, stage, date_str):
+        """Number of items the stage works on: articles offered by the feeds, or articles waiting for it."""
+        if stage == 'fetch':
+            return self.params['feeds'] * self.params['articles_per_feed']
+        status = {'analyze': 'fetched', 'summarize': 'selected_for_summary', 'render': 'summarized'}[stage]
+        return len(db_manager.get_articles_by_status(status, BENCH_CATEGORY, date_str))
+
+def environment_info():
+    info = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+    try:
+        info['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        info['git_commit'] = None
+    return info
+
+def compare_reports(baseline, current, threshold=0.10):
+    """Compare stage durations of two reports.
+
+    Returns a list of {'stage', 'baseline', 'current', 'change', 'regression'}
+    rows; ``change`` is the relative change in seconds, and a stage regresses
+    when it got slower by more than ``threshold``.
+    """
+    rows = []
+    for stage in STAGES:
+        before = baseline.get('stages', {}).get(stage)
+        after = current.get('stages', {}).get(stage)
+        if not before or not after:
+            continue
+        change = (after['seconds'] - before['seconds']) / before['seconds'] if before['seconds'] else None
+        rows.append({
+            'stage': stage, 'baseline': before['seconds'], 'current': after['seconds'], 'change': change,
+            'regression': change is not None and change > threshold
+        })
+    return rows
+
+def format_report(report, comparison=None, out=sys.stdout):
+    print("\n--- CRD Benchmark ---", file=out)
+    params = report['params']
+    print(f"{params['feeds']} feeds x {params['articles_per_feed']} articles, {params['article_kb']} KB pages, "
+          f"LLM latency {params['llm_latency']}s, 429 rate {params['rate_429']:.0%}, {params['max_workers']} workers", file=out)
+    for stage, data in report['stages'].items():
+        rate = f"{data['items_per_second']:.1f} items/s" if data['items_per_second'] else '-'
+        suffix = f" (error: {data['error']})" if data['error'] else ''
+        print(f"  {stage:<10} {data['seconds']:8.2f}s  {data['items']:5d} items  {rate}{suffix}", file=out)
+    if comparison:
+        print("\nCompared with baseline:", file=out)
+        for row in comparison:
+            change = f"{row['change']:+.1%}" if row['change'] is not None else 'n/a'
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"  {row['stage']:<10} {row['baseline']:8.2f}s -> {row['current']:8.2f}s  {change}{flag}", file=out)
+    print("---------------------\n", file=out)
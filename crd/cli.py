@@ -3,25 +3,63 @@ import sys
 import logging
 import os
 import json
+import importlib
 from datetime import datetime, timedelta
 from .utils.config import Config
 from .utils.logging import setup_logger
-from .database import DatabaseManager
-from .fetcher import ArticleFetcher
-from .analyzer import ArticleAnalyzer
-from .summarizer import ArticleSummarizer
-from .renderer import NewsletterRenderer
+from .database import open_database
 from .utils.stats import StatsManager
-from .utils.api_client import APIClient
+from .utils.profiling import StageProfiler, PROFILE_MODES, PROFILE_STAGES
+
+# The pipeline stages pull in playwright, feedparser, BeautifulSoup, Jinja2, Pillow,
+# pangu and requests. Each subcommand imports only what it runs, on first use, so
+# short commands like `finalize` and `rebuild-stats` start quickly.
+LAZY_IMPORTS = {
+    'APIClient': '.utils.api_client',
+    'ArticleFetcher': '.fetcher',
+    'ArticleAnalyzer': '.analyzer',
+    'ArticleSummarizer': '.summarizer',
+    'NewsletterRenderer': '.renderer',
+    'RenderWorker': '.render_worker',
+    'StaticSiteExporter': '.exporter',
+    'PageArchive': '.utils.archive',
+    'reextract_archive': '.fetcher',
+    'BenchmarkRunner': '.bench',
+    'compare_reports': '.bench',
+    'format_report': '.bench',
+}
+
+# Subcommands that call the LLM API.
+LLM_COMMANDS = ('process', 'analyze', 'summarize')
+
+def __getattr__(name):
+    """Resolve ``LAZY_IMPORTS`` on first access, so ``crd.cli.ArticleFetcher`` and the rest stay patchable."""
+    module = LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __package__), name)
+    globals()[name] = value
+    return value
+
+def lazy(name):
+    """Return a lazily imported name, preferring one already bound (or patched) on this module."""
+    return globals()[name] if name in globals() else __getattr__(name)
 
 def create_parser():
     parser = argparse.ArgumentParser(description='Content Research Digest - Newsletter Generator')
     parser.add_argument('--config', '-c', default='.env', help='Path to configuration file')
     parser.add_argument('--output-dir', '-d', default='crd/web/static/output', help='Directory to store output files')
-    parser.add_argument('--db-path', default='crd/crd.db', help='Path to SQLite database file')
+    parser.add_argument('--db-path', default=os.environ.get('CRD_DATABASE', 'crd/crd.db'),
+                        help='Path to the SQLite database file, or a postgresql:// DSN (default: $CRD_DATABASE or crd/crd.db)')
+    parser.add_argument('--archive-dir', default=os.environ.get('CRD_ARCHIVE_DIR', 'crd/archive'),
+                        help='Directory of the raw page archive; empty to disable (default: $CRD_ARCHIVE_DIR or crd/archive)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
     parser.add_argument('--feeds-config', default='feeds.json', help='Path to feeds configuration JSON file')
     parser.add_argument('--news-criteria', default='news_criteria.json', help='Path to news criteria JSON file')
+    parser.add_argument('--profile', choices=PROFILE_MODES, help='Profile pipeline stages with cProfile (cpu) or tracemalloc (mem)')
+    parser.add_argument('--profile-stage', default=','.join(PROFILE_STAGES),
+                        help=f"Comma-separated stages to profile (default: {','.join(PROFILE_STAGES)})")
+    parser.add_argument('--trace', metavar='PATH', help='Write a Chrome trace (chrome://tracing, ui.perfetto.dev) of per-article spans to PATH')
 
     subparsers = parser.add_subparsers(dest='command', required=True)
 
@@ -29,13 +67,13 @@ def create_parser():
     process_parser = subparsers.add_parser('process', help='Run the full pipeline for a category')
     process_parser.add_argument('category', help='Category to process')
     process_parser.add_argument('--date', '-t', help='Target date (YYYY-MM-DD). Defaults to today.')
-    process_parser.add_argument('--force', action='store_true', help='Force re-processing by clearing existing data for the category and date.')
+    process_parser.add_argument('--force', action='store_true', help='Re-download stored articles and redo the later stages for those whose content changed.')
 
     # Fetch command
     fetch_parser = subparsers.add_parser('fetch', help='Fetch articles for a category')
     fetch_parser.add_argument('category', help='Category to fetch')
     fetch_parser.add_argument('--date', '-t', help='Target date (YYYY-MM-DD). Defaults to today.')
-    fetch_parser.add_argument('--force', action='store_true', help='Force re-fetching by clearing existing data for the category and date.')
+    fetch_parser.add_argument('--force', action='store_true', help='Re-download stored articles and update any whose content changed.')
 
     # Analyze command
     analyze_parser = subparsers.add_parser('analyze', help='Analyze articles for a category')
@@ -58,6 +96,41 @@ def create_parser():
     finalize_parser.add_argument('--category', '-c', help='Category to finalize.')
     finalize_parser.add_argument('--all-stuck', action='store_true', help='Force finalize all articles stuck in intermediate states.')
 
+    # Render worker command
+    worker_parser = subparsers.add_parser('render-worker', help='Run the background worker that renders queued share images.')
+    worker_parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of polling forever.')
+    worker_parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait between polls of an empty queue.')
+
+    # Static export command
+    export_parser = subparsers.add_parser('export-static', help='Export the digest as a static site into the output directory.')
+    export_parser.add_argument('--full', action='store_true', help='Rewrite every date instead of only those whose content changed.')
+
+    # Re-extract command
+    reextract_parser = subparsers.add_parser('reextract', help='Re-run content extraction over archived pages, without network access.')
+    reextract_parser.add_argument('--date', '-t', help='Only pages fetched for this date (YYYY-MM-DD). Defaults to all dates.')
+    reextract_parser.add_argument('--workers', type=int, help='Extraction processes (default: one per CPU).')
+
+    # Rebuild stats command
+    subparsers.add_parser('rebuild-stats', help='Recompute the statistics rollup tables from the articles table.')
+
+    # Benchmark command
+    bench_parser = subparsers.add_parser('bench', help='Benchmark the pipeline against a local fake feed, article and LLM server.')
+    bench_parser.add_argument('--feeds', type=int, default=5, help='Number of synthetic RSS feeds.')
+    bench_parser.add_argument('--articles-per-feed', type=int, default=20, help='Articles in each feed.')
+    bench_parser.add_argument('--article-kb', type=int, default=20, help='Approximate size of each article page in KB.')
+    bench_parser.add_argument('--llm-latency', type=float, default=0.05, help='Seconds the fake LLM takes per call.')
+    bench_parser.add_argument('--rate-429', type=float, default=0.0, help='Fraction of LLM calls answered with 429 Too Many Requests.')
+    bench_parser.add_argument('--rating-batch-size', type=int, default=1, help='Articles per rating request (above 1: listwise rating).')
+    bench_parser.add_argument('--escalation-model', help='Re-rate articles near the selection threshold with this model.')
+    bench_parser.add_argument('--rating-stream', action='store_true', help='Stream ratings and stop reading once the score is in.')
+    bench_parser.add_argument('--retry-delay', type=float, default=2, help='Seconds the API client waits before retrying a failed call.')
+    bench_parser.add_argument('--skip-render', action='store_true', help='Skip the render stage (it needs Playwright browsers).')
+    bench_parser.add_argument('--seed', type=int, default=0, help='Seed for the fake server, so runs are comparable.')
+    bench_parser.add_argument('--report', help='Write the JSON report to this file.')
+    bench_parser.add_argument('--compare', metavar='BASELINE', help='Compare against a previous JSON report.')
+    bench_parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown of a stage that counts as a regression.')
+    bench_parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any stage regressed.')
+
     return parser
 
 def main():
@@ -68,40 +141,62 @@ def main():
     logger = setup_logger('crd', level=log_level)
 
     config = Config(args.config, args.feeds_config)
-    api_client = APIClient(config.api_url, config.api_key)
-    stats_manager = StatsManager()
+    api_client = lazy('APIClient')(config.api_url, config.api_key) if args.command in LLM_COMMANDS else None
+    stats_manager = StatsManager(trace=bool(args.trace))
+    try:
+        profiler = StageProfiler(
+            args.profile,
+            [s.strip() for s in args.profile_stage.split(',') if s.strip()],
+            os.path.join(args.output_dir, 'profiles', datetime.now().strftime('%Y%m%d-%H%M%S'))
+        )
+    except ValueError as e:
+        parser.error(str(e))
 
     os.makedirs(args.output_dir, exist_ok=True)
 
     db_manager = None
+    exit_code = 0
+    run_status = 'failed'
+    date_str = None
     try:
-        db_manager = DatabaseManager(args.db_path)
-        target_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else datetime.now().date()
+        if args.command == 'bench':
+            # The benchmark writes only to its own scratch database, never to --db-path.
+            exit_code = run_bench(logger, config, args)
+            run_status = 'success'
+            return exit_code
+
+        db_manager = open_database(args.db_path)
+        db_manager.create_tables()
+        if api_client:
+            api_client.usage_callback = make_usage_recorder(db_manager, config)
+        date_arg = getattr(args, 'date', None)
+        target_date = datetime.strptime(date_arg, '%Y-%m-%d').date() if date_arg else datetime.now().date()
         date_str = target_date.strftime('%Y-%m-%d')
         output_dir_for_date = os.path.join(args.output_dir, date_str)
         os.makedirs(output_dir_for_date, exist_ok=True)
 
         if args.command == 'process':
-            if args.force:
-                logger.info(f"Force-updating category '{args.category}' for {date_str}.")
-                db_manager.clear_category_for_date(args.category, date_str)
-            
-            run_fetch(logger, db_manager, config, args, stats_manager, target_date, date_str)
-            run_analyze(logger, db_manager, api_client, config, args, stats_manager, date_str)
-            run_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str)
-            run_render(logger, db_manager, args, stats_manager, date_str, output_dir_for_date)
+            with profiler.profile('fetch'):
+                run_fetch(logger, db_manager, config, args, stats_manager, target_date, date_str)
+            with profiler.profile('analyze_summarize'):
+                run_analyze_and_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str)
+            with profiler.profile('summarize'):
+                run_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str)
+            with profiler.profile('render'):
+                run_render(logger, db_manager, args, stats_manager, date_str, output_dir_for_date)
 
         elif args.command == 'fetch':
-            if args.force:
-                logger.info(f"Force-fetching category '{args.category}' for {date_str}.")
-                db_manager.clear_category_for_date(args.category, date_str)
-            run_fetch(logger, db_manager, config, args, stats_manager, target_date, date_str)
+            with profiler.profile('fetch'):
+                run_fetch(logger, db_manager, config, args, stats_manager, target_date, date_str)
         elif args.command == 'analyze':
-            run_analyze(logger, db_manager, api_client, config, args, stats_manager, date_str)
+            with profiler.profile('analyze'):
+                run_analyze(logger, db_manager, api_client, config, args, stats_manager, date_str)
         elif args.command == 'summarize':
-            run_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str)
+            with profiler.profile('summarize'):
+                run_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str)
         elif args.command == 'render':
-            run_render(logger, db_manager, args, stats_manager, date_str, output_dir_for_date)
+            with profiler.profile('render'):
+                run_render(logger, db_manager, args, stats_manager, date_str, output_dir_for_date)
         elif args.command == 'finalize':
             if args.all_stuck:
                 logger.info("Forcibly finalizing all stuck articles across all dates.")
@@ -111,29 +206,86 @@ def main():
                 db_manager.finalize_stuck_articles(args.category, args.date)
             else:
                 logger.warning("Please provide --date and --category to finalize, or use --all-stuck.")
+        elif args.command == 'render-worker':
+            run_render_worker(logger, db_manager, config, args, stats_manager)
+        elif args.command == 'export-static':
+            with profiler.profile('export'):
+                run_export_static(logger, db_manager, config, args, stats_manager)
+        elif args.command == 'reextract':
+            run_reextract(logger, db_manager, args, stats_manager)
+        elif args.command == 'rebuild-stats':
+            logger.info("Rebuilding statistics rollups.")
+            db_manager.rebuild_stats()
+        run_status = 'success'
 
     finally:
         if db_manager:
+            stats_manager.persist(db_manager, args.command, getattr(args, 'category', None), date_str, run_status)
             db_manager.close()
+        if args.trace:
+            stats_manager.write_trace(args.trace)
         stats_manager.report()
+        profiler.report()
 
-    return 0
+    return exit_code
+
+def make_usage_recorder(db_manager, config):
+    """Return an APIClient usage callback that records token usage and cost per day."""
+    def record_usage(model, usage):
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        cost = config.llm_cost(model, prompt_tokens, completion_tokens)
+        db_manager.record_llm_usage(model, prompt_tokens, completion_tokens, cost)
+    return record_usage
 
 def run_fetch(logger, db_manager, config, args, stats_manager, target_date, date_str):
     logger.info(f"--- Fetching category: {args.category} for {date_str} ---")
-    fetcher = ArticleFetcher(
+    archive = lazy('PageArchive')(args.archive_dir) if args.archive_dir else None
+    fetcher = lazy('ArticleFetcher')(
         db_manager=db_manager,
         feeds_path=args.feeds_config,
         stats_manager=stats_manager,
         target_date=target_date,
         max_workers=config.threads,
-        keywords=config.keywords
+        keywords=config.keywords,
+        archive=archive,
+        refresh=args.force
     )
-    fetcher.process(args.category, date_str)
+    if args.force:
+        logger.info(f"Refreshing stored articles of '{args.category}' for {date_str}; only changed ones will be redone.")
+    try:
+        with stats_manager.time_block('stage_fetch'):
+            fetcher.process(args.category, date_str)
+    finally:
+        if archive:
+            archive.close()
 
 def run_analyze(logger, db_manager, api_client, config, args, stats_manager, date_str):
     logger.info(f"--- Analyzing category: {args.category} for {date_str} ---")
-    analyzer = ArticleAnalyzer(
+    analyzer = lazy('ArticleAnalyzer')(
+        db_manager=db_manager,
+        api_client=api_client,
+        criteria_path=args.news_criteria,
+        stats_manager=stats_manager,
+        top_articles=config.top_articles,
+        min_score_map=config.minimum_score_map,
+        max_workers=config.threads,
+        model=config.rating_model,
+        batch_size=config.rating_batch_size,
+        excerpt_chars=config.rating_excerpt_chars,
+        escalation_model=config.rating_escalation_model,
+        escalation_band=config.rating_escalation_band,
+        cost_fn=config.llm_cost,
+        max_tokens=config.rating_max_tokens,
+        stream=config.rating_stream
+    )
+    with stats_manager.time_block('stage_analyze'):
+        analyzer.process(args.category, date_str)
+
+def run_analyze_and_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str):
+    """Rate articles and start summarizing each one as soon as it is certain to be selected."""
+    logger.info(f"--- Analyzing and summarizing category: {args.category} for {date_str} ---")
+    analyzer = lazy('ArticleAnalyzer')(
         db_manager=db_manager,
         api_client=api_client,
         criteria_path=args.news_criteria,
@@ -141,25 +293,111 @@ def run_analyze(logger, db_manager, api_client, config, args, stats_manager, dat
         top_articles=config.top_articles,
         min_score_map=config.minimum_score_map,
         max_workers=config.threads,
-        model=config.rating_model
+        model=config.rating_model,
+        batch_size=config.rating_batch_size,
+        excerpt_chars=config.rating_excerpt_chars,
+        escalation_model=config.rating_escalation_model,
+        escalation_band=config.rating_escalation_band,
+        cost_fn=config.llm_cost,
+        max_tokens=config.rating_max_tokens,
+        stream=config.rating_stream
+    )
+    summarizer = lazy('ArticleSummarizer')(
+        db_manager=db_manager,
+        api_client=api_client,
+        stats_manager=stats_manager,
+        model=config.summary_model,
+        max_workers=config.threads
     )
-    analyzer.process(args.category, date_str)
+    # Summaries overlap the rating, so the step is timed under its own name, apart from
+    # the separate analyze and summarize commands' stage_analyze and stage_summarize.
+    with stats_manager.time_block('stage_analyze_summarize'):
+        with summarizer.early_summaries() as enqueue:
+            analyzer.process(args.category, date_str, on_selected=enqueue)
 
 def run_summarize(logger, db_manager, api_client, config, args, stats_manager, date_str):
     logger.info(f"--- Summarizing category: {args.category} for {date_str} ---")
-    summarizer = ArticleSummarizer(
+    summarizer = lazy('ArticleSummarizer')(
         db_manager=db_manager,
         api_client=api_client,
         stats_manager=stats_manager,
         model=config.summary_model,
         max_workers=config.threads
     )
-    summarizer.process(args.category, date_str)
+    with stats_manager.time_block('stage_summarize'):
+        summarizer.process(args.category, date_str)
+
+def run_reextract(logger, db_manager, args, stats_manager):
+    if not args.archive_dir:
+        logger.warning("No archive directory configured; nothing to re-extract.")
+        return
+    logger.info(f"--- Re-extracting archived pages from {args.archive_dir} ---")
+    with stats_manager.time_block('stage_reextract'):
+        lazy('reextract_archive')(lazy('PageArchive')(args.archive_dir), db_manager, date_str=args.date,
+                                  max_workers=args.workers, stats_manager=stats_manager)
 
 def run_render(logger, db_manager, args, stats_manager, date_str, output_dir_for_date):
     logger.info(f"--- Rendering category: {args.category} for {date_str} ---")
-    renderer = NewsletterRenderer(db_manager=db_manager, stats_manager=stats_manager)
-    renderer.process(args.category, date_str, output_dir_for_date)
+    renderer = lazy('NewsletterRenderer')(db_manager=db_manager, stats_manager=stats_manager)
+    with stats_manager.time_block('stage_render'):
+        renderer.process(args.category, date_str, output_dir_for_date)
+
+def run_render_worker(logger, db_manager, config, args, stats_manager):
+    logger.info(f"--- Starting render worker for {args.output_dir} ---")
+    worker = lazy('RenderWorker')(
+        db_manager=db_manager,
+        output_dir=os.path.abspath(args.output_dir),
+        stats_manager=stats_manager,
+        title=config.newsletter_title,
+        font=config.newsletter_font,
+        poll_interval=args.poll_interval
+    )
+    worker.run(once=args.once)
+
+def run_export_static(logger, db_manager, config, args, stats_manager):
+    logger.info(f"--- Exporting static site to {args.output_dir} ---")
+    exporter = lazy('StaticSiteExporter')(
+        db_manager=db_manager,
+        output_dir=args.output_dir,
+        stats_manager=stats_manager,
+        title=config.newsletter_title
+    )
+    with stats_manager.time_block('stage_export'):
+        exporter.export(full=args.full)
+
+def run_bench(logger, config, args):
+    logger.info("--- Running benchmark against the local fake server ---")
+    runner = lazy('BenchmarkRunner')(
+        feeds=args.feeds,
+        articles_per_feed=args.articles_per_feed,
+        article_kb=args.article_kb,
+        llm_latency=args.llm_latency,
+        rate_429=args.rate_429,
+        max_workers=config.threads,
+        top_articles=config.top_articles,
+        retry_delay=args.retry_delay,
+        rating_batch_size=args.rating_batch_size,
+        escalation_model=args.escalation_model,
+        rating_stream=args.rating_stream,
+        skip_render=args.skip_render,
+        seed=args.seed
+    )
+    report = runner.run()
+
+    comparison = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            comparison = lazy('compare_reports')(json.load(f), report, args.threshold)
+        report['comparison'] = {'baseline': args.compare, 'threshold': args.threshold, 'stages': comparison}
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark report written to {args.report}")
+    lazy('format_report')(report, comparison)
+
+    if args.fail_on_regression and comparison and any(row['regression'] for row in comparison):
+        return 1
+    return 0
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -1,18 +1,89 @@
+import re
 import sqlite3
 import logging
+import time
+import html
 from urllib.parse import urlparse
 import threading
+from contextlib import contextmanager
+
+from .repository import ArticleRepository
+from .utils.fingerprints import fingerprint
 
 logger = logging.getLogger(__name__)
 
-class DatabaseManager:
+# Columns of the articles table that API callers may project.
+ARTICLE_FIELDS = (
+    'id', 'url', 'title', 'publication_date', 'fetch_date', 'category', 'content', 'score',
+    'status', 'chinese_title', 'english_summary', 'chinese_summary', 'thumbnail_path',
+    'rating_reason', 'source'
+)
+
+# Lightweight list view: everything the digest cards show, without the article body.
+ARTICLE_LIST_FIELDS = (
+    'id', 'url', 'title', 'fetch_date', 'category', 'score', 'source',
+    'chinese_title', 'chinese_summary', 'thumbnail_path'
+)
+
+SEARCH_RESULT_FIELDS = (
+    'id', 'url', 'title', 'fetch_date', 'category', 'score', 'source', 'chinese_title', 'chinese_summary'
+)
+
+# Rows read per query when streaming articles through a pipeline stage.
+STREAM_BATCH_SIZE = 100
+
+# Pipeline stages in order, for the stats funnel.
+FUNNEL_STAGES = ('fetched', 'rated', 'selected', 'summarized', 'complete')
+
+# Private-use characters wrapped around search matches, HTML-escaped and turned into <mark> afterwards.
+SNIPPET_MARKS = ('\ue000', '\ue001')
+
+# Han, Kana and Hangul. Search terms containing them go to the Chinese columns; all
+# other terms, accented Latin ones included, are words the English index can match.
+CJK_CHARACTERS = re.compile('[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u31f0-\u31ff\u3400-\u4dbf'
+                            '\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002fa1f]')
+
+def is_cjk(term):
+    return CJK_CHARACTERS.search(term) is not None
+
+def like_pattern(term):
+    """A LIKE pattern matching ``term`` anywhere, with its wildcards escaped for ``ESCAPE '\\'``."""
+    return '%{}%'.format(term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+
+def validate_article_fields(fields):
+    """Raise ValueError if any requested field is not a column of the articles table."""
+    unknown = [f for f in fields if f not in ARTICLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown article fields: {', '.join(unknown)}")
+
+def open_database(target):
+    """Open the repository for ``target``: a ``postgresql://`` DSN, or else a SQLite file path."""
+    if target.startswith(('postgres://', 'postgresql://')):
+        from .postgres import PostgresDatabaseManager
+        return PostgresDatabaseManager(target)
+    return DatabaseManager(target)
+
+class DatabaseManager(ArticleRepository):
+    """SQLite implementation of ``ArticleRepository``, with one connection per thread.
+
+    Apart from schema setup and search, the queries stick to SQL that
+    PostgreSQL also accepts. ``PostgresDatabaseManager`` reuses them and
+    overrides only the connection handling, the schema and the search queries.
+    """
+
+    Error = sqlite3.Error
+    # Appended to the subqueries that pick rows to claim. SQLite serialises writers and
+    # needs nothing here. Server databases lock the picked rows and skip the ones others hold.
+    LOCK_CLAIMED_ROWS = ''
+
     def __init__(self, db_path):
         self.db_path = db_path
         self.thread_local = threading.local()
 
     def get_conn(self):
         if not hasattr(self.thread_local, 'conn'):
-            self.thread_local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Other worker processes may hold the write lock briefly; wait for it rather than failing.
+            self.thread_local.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
             self.thread_local.conn.row_factory = sqlite3.Row
         return self.thread_local.conn
 
@@ -21,130 +92,761 @@ class DatabaseManager:
             self.thread_local.conn.close()
             del self.thread_local.conn
 
+    @contextmanager
+    def connection(self):
+        """Yield the connection for one unit of work, rolling back if it raises."""
+        conn = self.get_conn()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
     def create_tables(self):
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS articles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    url TEXT UNIQUE NOT NULL,
-                    title TEXT NOT NULL,
-                    publication_date TEXT NOT NULL,
-                    fetch_date TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    content TEXT,
-                    score REAL,
-                    status TEXT NOT NULL DEFAULT 'fetched',
-                    chinese_title TEXT,
-                    english_summary TEXT,
-                    chinese_summary TEXT,
-                    thumbnail_path TEXT,
-                    rating_reason TEXT,
-                    source TEXT
-                )
-            """)
-            logger.info("Tables created or already exist.")
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS articles (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        url TEXT UNIQUE NOT NULL,
+                        title TEXT NOT NULL,
+                        publication_date TEXT NOT NULL,
+                        fetch_date TEXT NOT NULL,
+                        category TEXT NOT NULL,
+                        content TEXT,
+                        score REAL,
+                        status TEXT NOT NULL DEFAULT 'fetched',
+                        chinese_title TEXT,
+                        english_summary TEXT,
+                        chinese_summary TEXT,
+                        thumbnail_path TEXT,
+                        rating_reason TEXT,
+                        source TEXT,
+                        lease_owner TEXT,
+                        lease_expires_at REAL,
+                        content_hash TEXT,
+                        rating_fingerprint TEXT,
+                        summary_fingerprint TEXT,
+                        rating_model TEXT,
+                        screening_score REAL
+                    )
+                """)
+                self._migrate_articles(cursor)
+                # WAL lets several worker processes read while one writes.
+                cursor.execute("PRAGMA journal_mode=WAL")
+                # A row's lease ends when a worker moves it to its next status.
+                cursor.execute("""
+                    CREATE TRIGGER IF NOT EXISTS articles_lease_release
+                    AFTER UPDATE OF status ON articles WHEN new.lease_owner IS NOT NULL
+                    BEGIN
+                        UPDATE articles SET lease_owner = NULL, lease_expires_at = NULL WHERE id = new.id;
+                    END
+                """)
+                # Generation counter for read caches: bumped in the same transaction as
+                # every write to articles, so readers can tell when cached data is stale.
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS db_meta (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                """)
+                cursor.execute("INSERT OR IGNORE INTO db_meta(key, value) VALUES('generation', 0)")
+                # LLM usage and pipeline runs are written on every API call; they have their own
+                # counter so that those writes do not drop cached article responses.
+                cursor.execute("INSERT OR IGNORE INTO db_meta(key, value) VALUES('metrics_generation', 0)")
+                # Lease bookkeeping does not change what readers see, so updates count
+                # only when they touch a data column. Recreated so older databases pick up the column list.
+                cursor.execute("DROP TRIGGER IF EXISTS articles_generation_update")
+                data_columns = ', '.join(f for f in ARTICLE_FIELDS if f != 'id')
+                for event in ('INSERT', f'UPDATE OF {data_columns}', 'DELETE'):
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS articles_generation_{event.split()[0].lower()}
+                        AFTER {event} ON articles
+                        BEGIN
+                            UPDATE db_meta SET value = value + 1 WHERE key = 'generation';
+                        END
+                    """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS render_jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        article_id INTEGER NOT NULL,
+                        cache_key TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'queued',
+                        image_relpath TEXT NOT NULL,
+                        error TEXT,
+                        enqueued_at REAL NOT NULL,
+                        started_at REAL,
+                        finished_at REAL
+                    )
+                """)
+                # At most one live job per rendered card, across all web processes.
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_render_jobs_live_key
+                    ON render_jobs(cache_key) WHERE status IN ('queued', 'running')
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs(status, id)")
+                # The fetch tier each site needs ('http' or 'browser'), learned by the fetcher.
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS fetch_tiers (
+                        domain TEXT PRIMARY KEY,
+                        tier TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                # Serves the per-stage scans of one category and date in id order.
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_stage ON articles(category, fetch_date, status, id)")
+                self._create_search_index(cursor)
+                self._create_stats_rollups(cursor)
+                self._create_pipeline_metrics(cursor)
+                conn.commit()
+                logger.info("Tables created or already exist.")
+        except self.Error as e:
             logger.error(f"Error creating tables: {e}")
 
+    def _migrate_articles(self, cursor):
+        """Add columns introduced after the articles table was first created."""
+        cursor.execute("PRAGMA table_info(articles)")
+        columns = {row['name'] for row in cursor.fetchall()}
+        for column, definition in (('lease_owner', 'TEXT'), ('lease_expires_at', 'REAL'), ('content_hash', 'TEXT'),
+                                   ('rating_fingerprint', 'TEXT'), ('summary_fingerprint', 'TEXT'),
+                                   ('rating_model', 'TEXT'), ('screening_score', 'REAL')):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE articles ADD COLUMN {column} {definition}")
+        if 'content_hash' not in columns:
+            self._backfill_content_hashes(cursor)
+
+    def _backfill_content_hashes(self, cursor):
+        """Hash the content of articles stored before content hashes existed.
+
+        Their ratings and summaries have no fingerprint and are kept as they
+        are; only output written from now on is checked for staleness.
+        """
+        cursor.execute("SELECT id, content FROM articles WHERE content_hash IS NULL AND content IS NOT NULL")
+        rows = [(fingerprint(row['content']), row['id']) for row in cursor.fetchall()]
+        cursor.executemany("UPDATE articles SET content_hash = ? WHERE id = ?", rows)
+
+    def _create_search_index(self, cursor):
+        """Create the FTS5 search indexes and the triggers that keep them in sync with articles.
+
+        English text uses the unicode61 tokenizer. Chinese titles and summaries
+        use the trigram tokenizer, because CJK text has no spaces to split words on.
+        """
+        indexes = {
+            'articles_fts': (('title', 'english_summary', 'content'), "unicode61 remove_diacritics 2"),
+            'articles_fts_cjk': (('chinese_title', 'chinese_summary'), "trigram"),
+        }
+        for table, (columns, tokenizer) in indexes.items():
+            try:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+                exists = cursor.fetchone() is not None
+                column_list = ', '.join(columns)
+                new_values = ', '.join(f'new.{c}' for c in columns)
+                old_values = ', '.join(f'old.{c}' for c in columns)
+                cursor.execute(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {table}
+                    USING fts5({column_list}, content='articles', content_rowid='id', tokenize='{tokenizer}')
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON articles BEGIN
+                        INSERT INTO {table}(rowid, {column_list}) VALUES (new.id, {new_values});
+                    END
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON articles BEGIN
+                        INSERT INTO {table}({table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                    END
+                """)
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {column_list} ON articles BEGIN
+                        INSERT INTO {table}({table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                        INSERT INTO {table}(rowid, {column_list}) VALUES (new.id, {new_values});
+                    END
+                """)
+                if not exists:
+                    # Index articles written before search existed.
+                    cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Full-text search index {table} unavailable (SQLite built without FTS5 or trigram?): {e}")
+
+    def _create_stats_rollups(self, cursor):
+        """Create the per-day rollup tables behind /stats and the triggers that maintain them.
+
+        stats_daily holds article counts and score sums per (day, category, status).
+        Triggers on articles keep it current in the same transaction as each
+        insert, status change or rescore. llm_usage_daily is written by
+        record_llm_usage.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_daily'")
+        exists = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_daily (
+                fetch_date TEXT NOT NULL,
+                category TEXT NOT NULL,
+                status TEXT NOT NULL,
+                article_count INTEGER NOT NULL DEFAULT 0,
+                score_sum REAL NOT NULL DEFAULT 0,
+                scored_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (fetch_date, category, status)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage_daily (
+                day TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cost REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, model)
+            )
+        """)
+        add_new = """
+            INSERT INTO stats_daily(fetch_date, category, status, article_count, score_sum, scored_count)
+            VALUES (new.fetch_date, new.category, new.status, 1, COALESCE(new.score, 0), new.score IS NOT NULL)
+            ON CONFLICT(fetch_date, category, status) DO UPDATE SET
+                article_count = article_count + 1,
+                score_sum = score_sum + excluded.score_sum,
+                scored_count = scored_count + excluded.scored_count;
+        """
+        remove_old = """
+            UPDATE stats_daily SET
+                article_count = article_count - 1,
+                score_sum = score_sum - COALESCE(old.score, 0),
+                scored_count = scored_count - (old.score IS NOT NULL)
+            WHERE fetch_date = old.fetch_date AND category = old.category AND status = old.status;
+        """
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_daily_ai AFTER INSERT ON articles BEGIN {add_new} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS stats_daily_ad AFTER DELETE ON articles BEGIN {remove_old} END")
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS stats_daily_au AFTER UPDATE OF status, score, fetch_date, category ON articles
+            BEGIN {remove_old} {add_new} END
+        """)
+        if not exists:
+            self._backfill_stats(cursor)
+
+    def _backfill_stats(self, cursor):
+        cursor.execute("DELETE FROM stats_daily")
+        cursor.execute("""
+            INSERT INTO stats_daily(fetch_date, category, status, article_count, score_sum, scored_count)
+            SELECT fetch_date, category, status, COUNT(*), COALESCE(SUM(score), 0), COUNT(score)
+            FROM articles GROUP BY fetch_date, category, status
+        """)
+
+    def rebuild_stats(self):
+        """Recompute the stats rollups from the articles table."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                self._backfill_stats(cursor)
+                conn.commit()
+                logger.info("Rebuilt stats rollups from the articles table.")
+                return True
+        except self.Error as e:
+            logger.error(f"Failed to rebuild stats rollups: {e}")
+            return False
+
+    def record_llm_usage(self, model, prompt_tokens, completion_tokens, cost=0.0, day=None):
+        """Add one API call's token usage (and cost, if known) to the daily LLM spend rollup."""
+        sql = """
+            INSERT INTO llm_usage_daily(day, model, calls, prompt_tokens, completion_tokens, cost)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT(day, model) DO UPDATE SET
+                calls = llm_usage_daily.calls + 1,
+                prompt_tokens = llm_usage_daily.prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = llm_usage_daily.completion_tokens + excluded.completion_tokens,
+                cost = llm_usage_daily.cost + excluded.cost
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (day or time.strftime('%Y-%m-%d'), model or 'unknown', prompt_tokens, completion_tokens, cost))
+                cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'metrics_generation'")
+                conn.commit()
+        except self.Error as e:
+            logger.error(f"Failed to record LLM usage for {model}: {e}")
+
+    def _create_pipeline_metrics(self, cursor):
+        """Create the tables that keep each CLI run's StatsManager counters and timings."""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                command TEXT NOT NULL,
+                category TEXT,
+                target_date TEXT,
+                status TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                duration REAL NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_metrics (
+                run_id INTEGER NOT NULL REFERENCES pipeline_runs(id) ON DELETE CASCADE,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                p50 REAL,
+                p95 REAL,
+                p99 REAL,
+                max REAL,
+                PRIMARY KEY (run_id, kind, name)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_metrics_name ON pipeline_metrics(kind, name, run_id)")
+
+    def record_pipeline_run(self, command, category, target_date, status, snapshot):
+        """Store one run's StatsManager snapshot; returns the new run id."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """INSERT INTO pipeline_runs(command, category, target_date, status, started_at, duration)
+                       VALUES (?, ?, ?, ?, ?, ?) RETURNING id""",
+                    (command, category, target_date, status, snapshot['started_at'], snapshot['duration'])
+                )
+                run_id = cursor.fetchone()['id']
+                rows = [(run_id, name, 'counter', value, value, None, None, None, None)
+                        for name, value in snapshot['counters'].items()]
+                rows += [(run_id, name, 'timing', t['count'], t['total_time'], t['p50'], t['p95'], t['p99'], t['max'])
+                         for name, t in snapshot['timings'].items()]
+                cursor.executemany(
+                    """INSERT INTO pipeline_metrics(run_id, name, kind, count, total, p50, p95, p99, max)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+                cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'metrics_generation'")
+                conn.commit()
+                return run_id
+        except self.Error as e:
+            logger.error(f"Failed to record pipeline run for {command}: {e}")
+            return None
+
+    def get_stage_duration_history(self, limit=30):
+        """Total time per timed block for the most recent runs, oldest first.
+
+        Returns {'runs': [run dicts], 'series': {name: [total seconds or None per run]}}.
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """SELECT * FROM (SELECT * FROM pipeline_runs ORDER BY id DESC LIMIT ?) AS recent ORDER BY id""", (limit,)
+                )
+                runs = [dict(row) for row in cursor.fetchall()]
+                if not runs:
+                    return {'runs': [], 'series': {}}
+                position = {run['id']: i for i, run in enumerate(runs)}
+                cursor.execute(
+                    """SELECT run_id, name, total FROM pipeline_metrics
+                       WHERE kind = 'timing' AND run_id >= ? ORDER BY name""", (runs[0]['id'],)
+                )
+                series = {}
+                for row in cursor.fetchall():
+                    values = series.setdefault(row['name'], [None] * len(runs))
+                    values[position[row['run_id']]] = row['total']
+                return {'runs': runs, 'series': series}
+        except self.Error as e:
+            logger.error(f"Failed to get stage duration history: {e}")
+            return {'runs': [], 'series': {}}
+
+    def get_pipeline_metrics_summary(self):
+        """Aggregates for the /metrics endpoint.
+
+        Counters are summed over all runs so they only ever grow. Timings have
+        the percentiles from the latest run that recorded each block, with
+        count and total summed over all runs so those only grow too.
+        """
+        summary = {'runs': {}, 'counters': {}, 'timings': {}}
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT command, status, COUNT(*) as count FROM pipeline_runs GROUP BY command, status")
+                for row in cursor.fetchall():
+                    summary['runs'][(row['command'], row['status'])] = row['count']
+                cursor.execute("SELECT name, SUM(count) as total FROM pipeline_metrics WHERE kind = 'counter' GROUP BY name")
+                summary['counters'] = {row['name']: row['total'] for row in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT m.name, m.p50, m.p95, m.p99, m.max, latest.count, latest.total FROM pipeline_metrics m
+                    JOIN (SELECT name, MAX(run_id) AS run_id, SUM(count) AS count, SUM(total) AS total
+                          FROM pipeline_metrics WHERE kind = 'timing' GROUP BY name) latest
+                    ON m.name = latest.name AND m.run_id = latest.run_id
+                    WHERE m.kind = 'timing'
+                """)
+                summary['timings'] = {row['name']: dict(row) for row in cursor.fetchall()}
+                return summary
+        except self.Error as e:
+            logger.error(f"Failed to get pipeline metrics summary: {e}")
+            return summary
+
     def add_article(self, article_data):
-        sql = ''' INSERT OR IGNORE INTO articles(url, title, publication_date, fetch_date, category, content, source, status)
-                  VALUES(?,?,?,?,?,?,?,?) '''
-        try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            source = urlparse(article_data['link']).netloc.replace('www.', '')
-            cursor.execute(sql, (
-                article_data['link'],
-                article_data['title'],
-                article_data['date'],
-                article_data['fetch_date'],
-                article_data['category'],
-                article_data['content'],
-                source,
-                'fetched'
-            ))
-            conn.commit()
-            return cursor.lastrowid > 0
-        except sqlite3.Error as e:
+        sql = ''' INSERT INTO articles(url, title, publication_date, fetch_date, category, content, content_hash, source, status)
+                  VALUES(?,?,?,?,?,?,?,?,?) ON CONFLICT DO NOTHING RETURNING id '''
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                source = urlparse(article_data['link']).netloc.replace('www.', '')
+                cursor.execute(sql, (
+                    article_data['link'],
+                    article_data['title'],
+                    article_data['date'],
+                    article_data['fetch_date'],
+                    article_data['category'],
+                    article_data['content'],
+                    fingerprint(article_data['content']) if article_data['content'] is not None else None,
+                    source,
+                    'fetched'
+                ))
+                added = cursor.fetchone() is not None
+                conn.commit()
+                return added
+        except self.Error as e:
             logger.error(f"Failed to add article {article_data.get('link')}: {e}")
             return False
 
     def get_articles_by_status(self, status, category, date_str):
         sql = "SELECT * FROM articles WHERE status = ? AND category = ? AND fetch_date = ?"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (status, category, date_str))
-            return cursor.fetchall()
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (status, category, date_str))
+                return cursor.fetchall()
+        except self.Error as e:
             logger.error(f"Failed to get articles with status {status}: {e}")
             return []
 
-    def update_article_score_and_reason(self, article_id, score, reason):
-        sql = "UPDATE articles SET score = ?, rating_reason = ?, status = 'rated' WHERE id = ?"
+    def iter_articles_by_status(self, status, category, date_str, batch_size=STREAM_BATCH_SIZE):
+        """Yield articles with the given status as dicts, reading ``batch_size`` rows at a time.
+
+        Batches are read by id keyset, so callers may update the yielded rows
+        (moving them to another status) while iterating without skipping any,
+        and only one batch of article bodies is held at once.
+        """
+        sql = """SELECT * FROM articles WHERE status = ? AND category = ? AND fetch_date = ? AND id > ?
+                 ORDER BY id LIMIT ?"""
+        last_id = 0
+        while True:
+            try:
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(sql, (status, category, date_str, last_id, batch_size))
+                    rows = cursor.fetchall()
+            except self.Error as e:
+                logger.error(f"Failed to iterate articles with status {status}: {e}")
+                return
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['id']
+            del rows
+
+    def claim_articles(self, status, category, date_str, worker_id, limit=10, lease_seconds=300, after_id=0):
+        """Atomically lease up to ``limit`` unleased articles (or ones whose lease expired) to ``worker_id``.
+
+        Returns the claimed rows as dicts, in id order, starting after ``after_id``.
+        """
+        now = time.time()
+        sql = f"""
+            UPDATE articles SET lease_owner = ?, lease_expires_at = ?
+            WHERE id IN (
+                SELECT id FROM articles
+                WHERE status = ? AND category = ? AND fetch_date = ? AND id > ?
+                  AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                ORDER BY id LIMIT ?{self.LOCK_CLAIMED_ROWS}
+            )
+            RETURNING *
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (worker_id, now + lease_seconds, status, category, date_str, after_id, now, limit))
+                rows = [dict(row) for row in cursor.fetchall()]
+                conn.commit()
+                return sorted(rows, key=lambda row: row['id'])
+        except self.Error as e:
+            logger.error(f"Failed to claim articles with status {status}: {e}")
+            return []
+
+    def claim_article(self, article_id, status, worker_id, lease_seconds=300):
+        """Lease one article if it still has ``status`` and nobody else holds it; returns the row or None."""
+        now = time.time()
+        sql = """
+            UPDATE articles SET lease_owner = ?, lease_expires_at = ?
+            WHERE id = ? AND status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ? OR lease_owner = ?)
+            RETURNING *
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (worker_id, now + lease_seconds, article_id, status, now, worker_id))
+                row = cursor.fetchone()
+                conn.commit()
+                return self._row_to_dict(row)
+        except self.Error as e:
+            logger.error(f"Failed to claim article {article_id}: {e}")
+            return None
+
+    def iter_claimed_articles(self, status, category, date_str, worker_id, batch_size=10, lease_seconds=300):
+        """Yield articles claimed batch by batch until none are left for this worker.
+
+        Other workers claim from the same rows concurrently; each row is
+        handed to one worker at a time. Claims move forward by id, so rows this
+        worker released unfinished are not claimed again in the same pass.
+        """
+        last_id = 0
+        while True:
+            rows = self.claim_articles(status, category, date_str, worker_id, batch_size, lease_seconds, after_id=last_id)
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield from rows
+
+    def renew_leases(self, worker_id, lease_seconds=300):
+        """Extend every unexpired lease held by ``worker_id``; returns how many were renewed."""
+        now = time.time()
+        sql = "UPDATE articles SET lease_expires_at = ? WHERE lease_owner = ? AND lease_expires_at >= ?"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (now + lease_seconds, worker_id, now))
+                conn.commit()
+                return cursor.rowcount
+        except self.Error as e:
+            logger.error(f"Failed to renew leases for {worker_id}: {e}")
+            return 0
+
+    def release_leases(self, worker_id, article_ids=None):
+        """Release ``worker_id``'s leases, all of them or only on ``article_ids``; returns how many."""
+        sql = "UPDATE articles SET lease_owner = NULL, lease_expires_at = NULL WHERE lease_owner = ?"
+        params = [worker_id]
+        if article_ids is not None:
+            sql += f" AND id IN ({', '.join('?' for _ in article_ids)})"
+            params += list(article_ids)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+                conn.commit()
+                return cursor.rowcount
+        except self.Error as e:
+            logger.error(f"Failed to release leases for {worker_id}: {e}")
+            return 0
+
+    def get_leased_article_ids(self, status, category, date_str):
+        """Ids of articles with ``status`` currently under an unexpired lease."""
+        sql = """SELECT id FROM articles WHERE status = ? AND category = ? AND fetch_date = ?
+                 AND lease_expires_at >= ? ORDER BY id"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (status, category, date_str, time.time()))
+                return [row['id'] for row in cursor.fetchall()]
+        except self.Error as e:
+            logger.error(f"Failed to get leased articles with status {status}: {e}")
+            return []
+
+    def update_article_score_and_reason(self, article_id, score, reason, fingerprint=None, model=None, screening_score=None):
+        sql = """UPDATE articles SET score = ?, rating_reason = ?, rating_fingerprint = ?, rating_model = ?, screening_score = ?,
+                 status = 'rated' WHERE id = ?"""
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (score, reason, article_id))
-            conn.commit()
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (score, reason, fingerprint, model, screening_score, article_id))
+                conn.commit()
+        except self.Error as e:
             logger.error(f"Failed to update score and reason for article {article_id}: {e}")
 
     def select_top_articles_for_summary(self, category, date_str, limit, min_score):
         sql_select = """
             SELECT id FROM articles 
             WHERE category = ? AND fetch_date = ? AND status = 'rated' AND score >= ?
-            ORDER BY score DESC 
+            ORDER BY score DESC, id ASC
             LIMIT ?
         """
         sql_update = "UPDATE articles SET status = 'selected_for_summary' WHERE id = ?"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            logger.info(f"Executing select_top_articles_for_summary with params: category={category}, date_str={date_str}, limit={limit}, min_score={min_score}")
-            cursor.execute(sql_select, (category, date_str, min_score, limit))
-            top_article_ids = [row['id'] for row in cursor.fetchall()]
-            logger.info(f"Found {len(top_article_ids)} articles with score >= {min_score}.")
-            for article_id in top_article_ids:
-                cursor.execute(sql_update, (article_id,))
-            conn.commit()
-            return top_article_ids
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                logger.info(f"Executing select_top_articles_for_summary with params: category={category}, date_str={date_str}, limit={limit}, min_score={min_score}")
+                cursor.execute(sql_select, (category, date_str, min_score, limit))
+                top_article_ids = [row['id'] for row in cursor.fetchall()]
+                logger.info(f"Found {len(top_article_ids)} articles with score >= {min_score}.")
+                for article_id in top_article_ids:
+                    cursor.execute(sql_update, (article_id,))
+                conn.commit()
+                return top_article_ids
+        except self.Error as e:
             logger.error(f"Failed to select top articles for {category}: {e}")
             return []
 
-    def update_article_summary(self, article_id, chinese_title, english_summary, chinese_summary):
+    def invalidate_stale_ratings(self, category, date_str, rating_key):
+        """Send articles back to 'fetched' if their rating was made with another prompt, model or content.
+
+        When any rating is dropped, the category's top-N selection is redone
+        too: selected, summarized and complete articles go back to 'rated',
+        keeping their summaries so unchanged ones can be reused. Ratings
+        without a fingerprint and articles leased to a live worker are left
+        alone. Returns how many ratings were dropped.
+        """
+        now = time.time()
+        stale_sql = """
+            UPDATE articles SET status = 'fetched', score = NULL, rating_reason = NULL, rating_fingerprint = NULL,
+                rating_model = NULL, screening_score = NULL
+            WHERE category = ? AND fetch_date = ?
+              AND status IN ('rated', 'selected_for_summary', 'summarized', 'complete')
+              AND rating_fingerprint IS NOT NULL AND rating_fingerprint <> ? || ':' || COALESCE(content_hash, '')
+              AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        """
+        reselect_sql = """
+            UPDATE articles SET status = 'rated'
+            WHERE category = ? AND fetch_date = ? AND status IN ('selected_for_summary', 'summarized', 'complete')
+              AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(stale_sql, (category, date_str, rating_key, now))
+                stale = cursor.rowcount
+                if stale:
+                    cursor.execute(reselect_sql, (category, date_str, now))
+                conn.commit()
+                return stale
+        except self.Error as e:
+            logger.error(f"Failed to invalidate stale ratings for {category}: {e}")
+            return 0
+
+    def invalidate_stale_summaries(self, category, date_str, summary_key):
+        """Send summarized articles back to 'selected_for_summary' if their summary was made with another prompt, model or content.
+
+        Returns how many summaries were invalidated.
+        """
+        sql = """
+            UPDATE articles SET status = 'selected_for_summary'
+            WHERE category = ? AND fetch_date = ? AND status IN ('summarized', 'complete')
+              AND summary_fingerprint IS NOT NULL AND summary_fingerprint <> ? || ':' || COALESCE(content_hash, '')
+              AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (category, date_str, summary_key, time.time()))
+                conn.commit()
+                return cursor.rowcount
+        except self.Error as e:
+            logger.error(f"Failed to invalidate stale summaries for {category}: {e}")
+            return 0
+
+    def get_article_ids_by_status(self, status, category, date_str):
+        sql = "SELECT id FROM articles WHERE status = ? AND category = ? AND fetch_date = ? ORDER BY id"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (status, category, date_str))
+                return [row['id'] for row in cursor.fetchall()]
+        except self.Error as e:
+            logger.error(f"Failed to get article ids with status {status}: {e}")
+            return []
+
+    def get_selection_scores(self, category, date_str):
+        """(id, score) of every rated article still in the running for the day's top articles.
+
+        Besides articles waiting in 'rated', this includes the ones already
+        selected or summarized, by an earlier run or by another worker, since
+        they hold places in the top N.
+        """
+        sql = """SELECT id, score FROM articles
+                 WHERE status IN ('rated', 'selected_for_summary', 'summarized', 'complete')
+                   AND category = ? AND fetch_date = ? AND score IS NOT NULL"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (category, date_str))
+                return [(row['id'], row['score']) for row in cursor.fetchall()]
+        except self.Error as e:
+            logger.error(f"Failed to get rated scores for {category}: {e}")
+            return []
+
+    def mark_selected_for_summary(self, article_ids):
+        """Move rated articles to 'selected_for_summary'; returns the ids that were updated."""
+        sql = "UPDATE articles SET status = 'selected_for_summary' WHERE id = ? AND status = 'rated' RETURNING id"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                selected = []
+                for article_id in article_ids:
+                    cursor.execute(sql, (article_id,))
+                    if cursor.fetchone():
+                        selected.append(article_id)
+                conn.commit()
+                return selected
+        except self.Error as e:
+            logger.error(f"Failed to mark articles {article_ids} as selected: {e}")
+            return []
+
+    def update_article_summary(self, article_id, chinese_title, english_summary, chinese_summary, fingerprint=None):
         sql = """
             UPDATE articles 
-            SET chinese_title = ?, english_summary = ?, chinese_summary = ?, status = 'summarized' 
+            SET chinese_title = ?, english_summary = ?, chinese_summary = ?, summary_fingerprint = ?, status = 'summarized' 
             WHERE id = ?
         """
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (chinese_title, english_summary, chinese_summary, article_id))
-            conn.commit()
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (chinese_title, english_summary, chinese_summary, fingerprint, article_id))
+                conn.commit()
+        except self.Error as e:
             logger.error(f"Failed to update summary for article {article_id}: {e}")
 
+    def update_article_content(self, url, content):
+        """Replace the extracted content of the article at ``url``; returns True if it changed."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE articles SET content = ?, content_hash = ? WHERE url = ? AND (content IS NULL OR content <> ?)",
+                    (content, fingerprint(content), url, content)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+        except self.Error as e:
+            logger.error(f"Failed to update content for {url}: {e}")
+            return False
+
     def update_article_thumbnail(self, article_id, thumbnail_path):
         sql = "UPDATE articles SET thumbnail_path = ?, status = 'complete' WHERE id = ?"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (thumbnail_path, article_id))
-            conn.commit()
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (thumbnail_path, article_id))
+                conn.commit()
+        except self.Error as e:
             logger.error(f"Failed to update thumbnail for article {article_id}: {e}")
 
     def _row_to_dict(self, row):
         return dict(row) if row else None
 
-    def get_summarized_articles_for_date(self, date_str=None, category_filter=None):
-        """Get all completed or summarized articles, optionally filtered by date and/or category."""
-        sql = "SELECT * FROM articles WHERE status IN ('complete', 'summarized') AND chinese_summary IS NOT NULL AND chinese_summary != ''"
+    def _projection(self, fields, required=()):
+        """Return (columns to select, columns to return) for a field projection."""
+        if fields is None:
+            return '*', None
+        validate_article_fields(fields)
+        selected = list(dict.fromkeys(list(fields) + list(required)))
+        return ', '.join(selected), list(fields)
+
+    def iter_summarized_articles(self, date_str=None, category_filter=None, fields=None, after=None, limit=None):
+        """Iterate completed or summarized articles newest first, streaming rows from the cursor.
+
+        ``fields`` limits the returned columns, ``after`` is a (fetch_date, score, id)
+        key from a previous page and ``limit`` bounds the number of rows. Rows are
+        ordered by the same key, so pages never overlap or skip rows.
+        """
+        # Validate the projection eagerly so bad fields fail at call time, not on first iteration.
+        columns, returned = self._projection(fields, required=('id', 'fetch_date', 'score'))
+        return self._iter_rows(columns, returned, date_str, category_filter, after, limit)
+
+    def _iter_rows(self, columns, returned, date_str, category_filter, after, limit):
+        sql = f"SELECT {columns} FROM articles WHERE status IN ('complete', 'summarized') AND chinese_summary IS NOT NULL AND chinese_summary != ''"
         params = []
 
         if date_str:
@@ -155,105 +857,451 @@ class DatabaseManager:
             sql += " AND category = ?"
             params.append(category_filter)
 
-        sql += " ORDER BY fetch_date DESC, score DESC"
-
-        try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, tuple(params))
-            articles_by_date = {}
-            for row in cursor.fetchall():
-                article_dict = self._row_to_dict(row)
-                fetch_date = article_dict['fetch_date']
-                if fetch_date not in articles_by_date:
-                    articles_by_date[fetch_date] = {}
-                category = article_dict['category']
-                if category not in articles_by_date[fetch_date]:
-                    articles_by_date[fetch_date][category] = []
-                articles_by_date[fetch_date][category].append(article_dict)
-            return articles_by_date
-        except sqlite3.Error as e:
-            logger.error(f"Failed to get summarized articles: {e}")
-            return {}
+        if after:
+            sql += " AND (fetch_date, COALESCE(score, -1), id) < (?, ?, ?)"
+            params.extend(after)
+
+        sql += " ORDER BY fetch_date DESC, COALESCE(score, -1) DESC, id DESC"
+
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, tuple(params))
+                for row in cursor:
+                    article = dict(row)
+                    if returned is not None:
+                        article = {key: article[key] for key in returned}
+                    yield article
+        except self.Error as e:
+            logger.error(f"Failed to iterate summarized articles: {e}")
+
+    def get_summarized_articles_page(self, date_str=None, category_filter=None, fields=None, after=None, limit=50):
+        """Return one page of summarized articles and the key to continue after, if any."""
+        key_fields = None if fields is None else list(dict.fromkeys(list(fields) + ['id', 'fetch_date', 'score']))
+        rows = list(self.iter_summarized_articles(date_str, category_filter, key_fields, after, limit + 1))
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_key = (last['fetch_date'], last['score'] if last['score'] is not None else -1, last['id'])
+        if fields is not None:
+            rows = [{key: row[key] for key in fields} for row in rows]
+        return rows, next_key
+
+    def get_summarized_articles_for_date(self, date_str=None, category_filter=None, fields=None):
+        """Get all completed or summarized articles, optionally filtered by date and/or category."""
+        key_fields = None if fields is None else list(dict.fromkeys(list(fields) + ['fetch_date', 'category']))
+        articles_by_date = {}
+        for article_dict in self.iter_summarized_articles(date_str, category_filter, key_fields):
+            fetch_date = article_dict['fetch_date']
+            category = article_dict['category']
+            if fields is not None:
+                article_dict = {key: article_dict[key] for key in fields}
+            articles_by_date.setdefault(fetch_date, {}).setdefault(category, []).append(article_dict)
+        return articles_by_date
+
+    def _search_queries(self, cursor, terms, filters, filter_params, limit):
+        """Return (sql, params) pairs that each yield (id, rank, snippet) rows, lower rank first.
+
+        Every term must match, but not necessarily in the same index, so mixed
+        English and Chinese queries work. Each ranked query matches the terms
+        its FTS index can handle and requires the rest through the other index.
+        The trigram index cannot match terms shorter than three characters, so
+        short CJK terms are matched with LIKE. That LIKE is only added to an
+        indexed match, unless every term is a short CJK one. Without the trigram
+        index, all CJK terms fall back to LIKE the same way. A term counts as CJK
+        if it has Han, Kana or Hangul characters, so accented Latin words still
+        go to the English index.
+        """
+        start_mark, end_mark = SNIPPET_MARKS
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts_cjk'")
+        cjk_index = cursor.fetchone() is not None
+
+        def match(group):
+            return ' '.join('"{}"'.format(t.replace('"', '""')) for t in group)
+
+        english_terms = [t for t in terms if not is_cjk(t)]
+        trigram_terms = [t for t in terms if cjk_index and len(t) >= 3]
+        like_terms = [t for t in terms if is_cjk(t) and t not in trigram_terms]
+
+        def require(others):
+            """SQL conditions, and their params, that the ``others`` terms also match."""
+            clauses, params = '', []
+            for index, group in (('articles_fts', [t for t in others if not is_cjk(t)]),
+                                 ('articles_fts_cjk', [t for t in others if is_cjk(t) and t in trigram_terms])):
+                if group:
+                    clauses += f" AND a.id IN (SELECT rowid FROM {index} WHERE {index} MATCH ?)"
+                    params.append(match(group))
+            for t in others:
+                if t in like_terms:
+                    clauses += " AND (a.chinese_title LIKE ? ESCAPE '\\' OR a.chinese_summary LIKE ? ESCAPE '\\')"
+                    params += [like_pattern(t), like_pattern(t)]
+            return clauses, params
+
+        queries = []
+        if english_terms:
+            clauses, params = require([t for t in terms if t not in english_terms])
+            queries.append((f"""SELECT a.id, bm25(articles_fts, 10.0, 5.0, 1.0) AS rank,
+                       snippet(articles_fts, -1, '{start_mark}', '{end_mark}', '…', 16) AS snippet
+                FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+                WHERE articles_fts MATCH ?{clauses} AND {filters}
+                ORDER BY rank LIMIT ?""", [match(english_terms)] + params + filter_params + [limit]))
+        if trigram_terms:
+            clauses, params = require([t for t in terms if t not in trigram_terms])
+            queries.append((f"""SELECT a.id, bm25(articles_fts_cjk, 10.0, 5.0) AS rank,
+                       snippet(articles_fts_cjk, -1, '{start_mark}', '{end_mark}', '…', 16) AS snippet
+                FROM articles_fts_cjk JOIN articles a ON a.id = articles_fts_cjk.rowid
+                WHERE articles_fts_cjk MATCH ?{clauses} AND {filters}
+                ORDER BY rank LIMIT ?""", [match(trigram_terms)] + params + filter_params + [limit]))
+        if not queries:
+            # Only short CJK terms: nothing indexed can match them.
+            clauses, params = require(terms)
+            queries.append((f"""SELECT a.id, 0.0 AS rank, NULL AS snippet FROM articles a
+                WHERE 1 = 1{clauses} AND {filters} ORDER BY a.fetch_date DESC LIMIT ?""", params + filter_params + [limit]))
+        return queries
+
+    def search_articles(self, query, limit=20, category_filter=None):
+        """Full-text search over summarized articles, best matches first.
+
+        Every whitespace-separated term must match (in any indexed column). Each
+        result carries its BM25 rank and an HTML-escaped snippet with matches
+        wrapped in <mark>.
+        """
+        terms = [t for t in query.split() if t]
+        if not terms:
+            return []
+        start_mark, end_mark = SNIPPET_MARKS
+
+        filters = "a.status IN ('complete', 'summarized') AND a.chinese_summary IS NOT NULL AND a.chinese_summary != ''"
+        filter_params = []
+        if category_filter and category_filter != 'all':
+            filters += " AND a.category = ?"
+            filter_params.append(category_filter)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                queries = self._search_queries(cursor, terms, filters, filter_params, limit)
+                best = {}
+                for sql, params in queries:
+                    cursor.execute(sql, tuple(params))
+                    for row in cursor.fetchall():
+                        previous = best.get(row['id'])
+                        if previous is None or row['rank'] < previous['rank']:
+                            best[row['id']] = {'rank': row['rank'], 'snippet': row['snippet'] or (previous or {}).get('snippet')}
+
+                ranked = sorted(best.items(), key=lambda item: item[1]['rank'])[:limit]
+                if not ranked:
+                    return []
+                placeholders = ', '.join('?' for _ in ranked)
+                cursor.execute(
+                    f"SELECT {', '.join(SEARCH_RESULT_FIELDS)} FROM articles WHERE id IN ({placeholders})",
+                    tuple(article_id for article_id, _ in ranked)
+                )
+                articles = {row['id']: dict(row) for row in cursor.fetchall()}
+                results = []
+                for article_id, hit in ranked:
+                    article = articles[article_id]
+                    snippet = hit['snippet'] or (article['chinese_summary'] or '')[:160]
+                    snippet = html.escape(snippet).replace(start_mark, '<mark>').replace(end_mark, '</mark>')
+                    article['snippet'] = snippet
+                    article['rank'] = hit['rank']
+                    results.append(article)
+                return results
+        except self.Error as e:
+            logger.error(f"Failed to search articles for {query!r}: {e}")
+            return []
 
     def get_summarized_articles_for_category_and_date(self, category, date_str):
         sql = "SELECT * FROM articles WHERE fetch_date = ? AND category = ? AND status IN ('complete', 'summarized') AND chinese_summary IS NOT NULL AND chinese_summary != '' ORDER BY score DESC"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (date_str, category))
-            return [self._row_to_dict(row) for row in cursor.fetchall()]
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (date_str, category))
+                return [self._row_to_dict(row) for row in cursor.fetchall()]
+        except self.Error as e:
             logger.error(f"Failed to get summarized articles for {category} on {date_str}: {e}")
             return []
 
     def get_available_dates(self):
         sql = "SELECT DISTINCT fetch_date FROM articles WHERE status IN ('complete', 'summarized') AND chinese_summary IS NOT NULL AND chinese_summary != '' ORDER BY fetch_date DESC"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            return [row['fetch_date'] for row in cursor.fetchall()]
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return [row['fetch_date'] for row in cursor.fetchall()]
+        except self.Error as e:
             logger.error(f"Failed to get available dates: {e}")
             return []
 
     def get_all_categories(self):
         sql = "SELECT DISTINCT category FROM articles ORDER BY category ASC"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            return [row['category'] for row in cursor.fetchall()]
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                return [row['category'] for row in cursor.fetchall()]
+        except self.Error as e:
             logger.error(f"Failed to get all categories: {e}")
             return []
 
     def get_article_by_id(self, article_id):
         sql = "SELECT * FROM articles WHERE id = ?"
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (article_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (article_id,))
+                row = cursor.fetchone()
+                return dict(row) if row else None
+        except self.Error as e:
             logger.error(f"Failed to get article by ID {article_id}: {e}")
             return None
 
     def get_stats(self):
+        """Dashboard statistics, read from the stats rollups rather than the articles table."""
         stats = {}
         try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            
-            # Total articles per category
-            cursor.execute("SELECT category, COUNT(*) as count FROM articles GROUP BY category")
-            stats['articles_per_category'] = {row['category']: row['count'] for row in cursor.fetchall()}
-            
-            # Average score per category
-            cursor.execute("SELECT category, AVG(score) as avg_score FROM articles WHERE score IS NOT NULL GROUP BY category")
-            stats['avg_score_per_category'] = {row['category']: row['avg_score'] for row in cursor.fetchall()}
-            
-            # Articles per day
-            cursor.execute("SELECT fetch_date, COUNT(*) as count FROM articles GROUP BY fetch_date ORDER BY fetch_date DESC")
-            stats['articles_per_day'] = {row['fetch_date']: row['count'] for row in cursor.fetchall()}
-            
-            return stats
-        except sqlite3.Error as e:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+
+                # Total articles and average score per category
+                cursor.execute("""
+                    SELECT category, SUM(article_count) as count, SUM(score_sum) as score_sum, SUM(scored_count) as scored
+                    FROM stats_daily GROUP BY category HAVING SUM(article_count) > 0 ORDER BY category
+                """)
+                rows = cursor.fetchall()
+                stats['articles_per_category'] = {row['category']: row['count'] for row in rows}
+                stats['avg_score_per_category'] = {row['category']: row['score_sum'] / row['scored'] for row in rows if row['scored']}
+
+                # Articles per day
+                cursor.execute("""
+                    SELECT fetch_date, SUM(article_count) as count FROM stats_daily
+                    GROUP BY fetch_date HAVING SUM(article_count) > 0 ORDER BY fetch_date DESC
+                """)
+                stats['articles_per_day'] = {row['fetch_date']: row['count'] for row in cursor.fetchall()}
+
+                # Current status breakdown per category
+                cursor.execute("""
+                    SELECT category, status, SUM(article_count) as count FROM stats_daily
+                    GROUP BY category, status HAVING SUM(article_count) > 0 ORDER BY category, status
+                """)
+                status_breakdown = {}
+                for row in cursor.fetchall():
+                    status_breakdown.setdefault(row['category'], {})[row['status']] = row['count']
+                stats['status_breakdown'] = status_breakdown
+
+                # Funnel: how many articles reached each stage
+                cursor.execute("""
+                    SELECT
+                        COALESCE(SUM(article_count), 0) as fetched,
+                        COALESCE(SUM(scored_count), 0) as rated,
+                        COALESCE(SUM(CASE WHEN status IN ('selected_for_summary', 'summarized', 'complete') THEN article_count END), 0) as selected,
+                        COALESCE(SUM(CASE WHEN status IN ('summarized', 'complete') THEN article_count END), 0) as summarized,
+                        COALESCE(SUM(CASE WHEN status = 'complete' THEN article_count END), 0) as complete
+                    FROM stats_daily
+                """)
+                row = cursor.fetchone()
+                funnel = []
+                previous = None
+                for stage in FUNNEL_STAGES:
+                    count = row[stage]
+                    conversion = (count / previous) if previous else None
+                    funnel.append({'stage': stage, 'count': count, 'conversion': conversion})
+                    previous = count
+                stats['funnel'] = funnel
+
+                # LLM spend per day
+                cursor.execute("""
+                    SELECT day, SUM(calls) as calls, SUM(prompt_tokens) as prompt_tokens,
+                           SUM(completion_tokens) as completion_tokens, SUM(cost) as cost
+                    FROM llm_usage_daily GROUP BY day ORDER BY day DESC
+                """)
+                stats['llm_spend_per_day'] = {row['day']: dict(row) for row in cursor.fetchall()}
+
+                return stats
+        except self.Error as e:
             logger.error(f"Failed to get stats: {e}")
             return {}
 
     def finalize_stuck_articles(self, category, date_str):
-        sql = "UPDATE articles SET status = 'failed' WHERE category = ? AND fetch_date < ? AND status IN ('fetched', 'rated')"
-        try:
-            conn = self.get_conn()
-            cursor = conn.cursor()
-            cursor.execute(sql, (category, date_str))
-            conn.commit()
-            logger.info(f"Finalized {cursor.rowcount} stuck articles for category '{category}' before {date_str}.")
-        except sqlite3.Error as e:
+        sql = """UPDATE articles SET status = 'failed'
+                 WHERE category = ? AND fetch_date < ? AND status IN ('fetched', 'rated')
+                   AND (lease_expires_at IS NULL OR lease_expires_at < ?)"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (category, date_str, time.time()))
+                conn.commit()
+                logger.info(f"Finalized {cursor.rowcount} stuck articles for category '{category}' before {date_str}.")
+        except self.Error as e:
             logger.error(f"Failed to finalize stuck articles for category {category}: {e}")
 
+    def force_finalize_all_articles(self):
+        """Mark every article stuck before summarization as failed, on all dates.
+
+        Articles a live worker currently holds a lease on are left alone.
+        """
+        sql = """UPDATE articles SET status = 'failed'
+                 WHERE status IN ('fetched', 'rated', 'selected_for_summary')
+                   AND (lease_expires_at IS NULL OR lease_expires_at < ?)"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (time.time(),))
+                conn.commit()
+                logger.info(f"Force-finalized {cursor.rowcount} stuck articles across all dates.")
+                return cursor.rowcount
+        except self.Error as e:
+            logger.error(f"Failed to force-finalize stuck articles: {e}")
+            return 0
+
+    def get_generation(self, counter='generation'):
+        """Return the current data generation; it changes whenever articles are written.
+
+        ``counter='metrics_generation'`` reads the separate counter that LLM
+        usage and pipeline runs bump instead.
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT value FROM db_meta WHERE key = ?", (counter,))
+                row = cursor.fetchone()
+                return row['value'] if row else 0
+        except self.Error as e:
+            logger.error(f"Failed to get data generation: {e}")
+            return None
+
+    def bump_generation(self):
+        """Invalidate read caches after a write that the article triggers do not cover."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE db_meta SET value = value + 1 WHERE key = 'generation'")
+                conn.commit()
+        except self.Error as e:
+            logger.error(f"Failed to bump data generation: {e}")
+
+    def enqueue_render_job(self, article_id, cache_key, image_relpath):
+        """Queue a render job, returning the id of the live job for this cache key."""
+        sql_insert = """
+            INSERT INTO render_jobs(article_id, cache_key, status, image_relpath, enqueued_at)
+            VALUES(?, ?, 'queued', ?, ?) ON CONFLICT DO NOTHING
+        """
+        sql_select = "SELECT id FROM render_jobs WHERE cache_key = ? AND status IN ('queued', 'running')"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql_insert, (article_id, cache_key, image_relpath, time.time()))
+                conn.commit()
+                cursor.execute(sql_select, (cache_key,))
+                row = cursor.fetchone()
+                return row['id'] if row else None
+        except self.Error as e:
+            logger.error(f"Failed to enqueue render job for article {article_id}: {e}")
+            return None
+
+    def claim_next_render_job(self, stale_after=600):
+        """Atomically claim the oldest queued job, or a running job abandoned by a dead worker."""
+        now = time.time()
+        sql = f"""
+            UPDATE render_jobs SET status = 'running', started_at = ?
+            WHERE id = (
+                SELECT id FROM render_jobs
+                WHERE status = 'queued' OR (status = 'running' AND started_at < ?)
+                ORDER BY id LIMIT 1{self.LOCK_CLAIMED_ROWS}
+            )
+            RETURNING *
+        """
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (now, now - stale_after))
+                row = cursor.fetchone()
+                conn.commit()
+                return self._row_to_dict(row)
+        except self.Error as e:
+            logger.error(f"Failed to claim render job: {e}")
+            return None
+
+    def finish_render_job(self, job_id, error=None):
+        sql = "UPDATE render_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, ('failed' if error else 'done', error, time.time(), job_id))
+                conn.commit()
+        except self.Error as e:
+            logger.error(f"Failed to finish render job {job_id}: {e}")
+
+    def get_render_job(self, job_id):
+        sql = "SELECT * FROM render_jobs WHERE id = ?"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql, (job_id,))
+                return self._row_to_dict(cursor.fetchone())
+        except self.Error as e:
+            logger.error(f"Failed to get render job {job_id}: {e}")
+            return None
+
+    def get_render_queue_metrics(self, window_seconds=3600):
+        """Queue depth plus wait and run latencies for jobs finished in the recent window."""
+        metrics = {}
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT status, COUNT(*) as count FROM render_jobs GROUP BY status")
+                counts = {row['status']: row['count'] for row in cursor.fetchall()}
+                metrics['queue_depth'] = counts.get('queued', 0)
+                metrics['running'] = counts.get('running', 0)
+                metrics['done'] = counts.get('done', 0)
+                metrics['failed'] = counts.get('failed', 0)
+
+                cursor.execute(
+                    """SELECT started_at - enqueued_at AS wait, finished_at - started_at AS run
+                       FROM render_jobs WHERE finished_at >= ? AND started_at IS NOT NULL""",
+                    (time.time() - window_seconds,)
+                )
+                rows = cursor.fetchall()
+                metrics['window_seconds'] = window_seconds
+                metrics['recent_jobs'] = len(rows)
+                for name in ('wait', 'run'):
+                    values = sorted(row[name] for row in rows)
+                    metrics[f'{name}_seconds_avg'] = sum(values) / len(values) if values else 0.0
+                    metrics[f'{name}_seconds_p95'] = values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0.0
+                return metrics
+        except self.Error as e:
+            logger.error(f"Failed to get render queue metrics: {e}")
+            return {}
+
+    def get_fetch_tiers(self, max_age=None):
+        """{domain: tier} for every learned domain, skipping entries older than ``max_age`` seconds."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT domain, tier FROM fetch_tiers WHERE updated_at >= ?",
+                               (time.time() - max_age if max_age else 0,))
+                return {row['domain']: row['tier'] for row in cursor.fetchall()}
+        except self.Error as e:
+            logger.error(f"Failed to get fetch tiers: {e}")
+            return {}
+
+    def set_fetch_tier(self, domain, tier):
+        """Remember the fetch tier that worked for ``domain``."""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """INSERT INTO fetch_tiers(domain, tier, updated_at) VALUES (?, ?, ?)
+                       ON CONFLICT(domain) DO UPDATE SET tier = excluded.tier, updated_at = excluded.updated_at""",
+                    (domain, tier, time.time())
+                )
+                conn.commit()
+        except self.Error as e:
+            logger.error(f"Failed to set fetch tier for {domain}: {e}")
+
     def close(self):
         self.close_conn()
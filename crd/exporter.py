@@ -0,0 +1,205 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from .database import ARTICLE_LIST_FIELDS
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; without it only .gz files are written.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'web', 'templates')
+STYLESHEET_PATH = os.path.join(os.path.dirname(__file__), 'web', 'static', 'style.css')
+TEMPLATE_NAMES = ('static_digest.html', 'static_archive.html')
+MANIFEST_NAME = 'export_manifest.json'
+COMPRESSIBLE_EXTENSIONS = ('.html', '.json', '.css')
+
+class StaticSiteExporter:
+    """Exports the digest as a static site that nginx or a CDN can serve directly.
+
+    The tree is written into the output directory next to the per-date asset
+    folders the renderer already produces:
+
+        index.html, archive.html, static/style.css
+        <date>/index.html, <date>/<category>/index.html
+        api/available_dates.json, api/categories.json
+        api/articles/<date>.json, api/articles/<date>/<category>.json
+
+    Every text file gets precompressed .gz (and .br when Brotli is installed)
+    siblings. A manifest of per-date content hashes makes reruns incremental.
+    """
+
+    def __init__(self, db_manager, output_dir, stats_manager=None, title="Content Research Digest"):
+        self.db_manager = db_manager
+        self.output_dir = output_dir
+        self.stats_manager = stats_manager
+        self.title = title
+        self.env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape(['html']))
+
+    @staticmethod
+    def category_slug(category):
+        slug = re.sub(r'[^a-z0-9]+', '-', category.lower()).strip('-')
+        return slug or 'category'
+
+    @classmethod
+    def category_slugs(cls, categories):
+        """Map each category to a URL slug that is unique among ``categories``.
+
+        Names that reduce to the same slug ("AI & Tech", "AI Tech") each get
+        a short hash of the name appended, so no category's pages overwrite
+        another's. Other categories keep their plain slug.
+        """
+        by_slug = {}
+        for name in categories:
+            by_slug.setdefault(cls.category_slug(name), []).append(name)
+        slugs = {}
+        for slug, names in by_slug.items():
+            for name in names:
+                slugs[name] = slug if len(names) == 1 else f"{slug}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:6]}"
+        return slugs
+
+    def _template_hash(self):
+        """Hash of everything besides the data that affects generated pages."""
+        digest = hashlib.sha256()
+        for name in TEMPLATE_NAMES:
+            with open(os.path.join(TEMPLATES_DIR, name), 'rb') as f:
+                digest.update(f.read())
+        digest.update(self.title.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load_manifest(self):
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, relpath, content):
+        """Atomically write a file and its precompressed variants."""
+        path = os.path.join(self.output_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        variants = [(path, data)]
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            variants.append((path + '.gz', gzip.compress(data, compresslevel=9)))
+            if brotli is not None:
+                variants.append((path + '.br', brotli.compress(data)))
+        for variant_path, variant_data in variants:
+            tmp_path = variant_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(variant_data)
+            os.replace(tmp_path, variant_path)
+        if self.stats_manager:
+            self.stats_manager.increment('static_files_written', len(variants))
+
+    def _remove(self, relpath):
+        for suffix in ('', '.gz', '.br'):
+            path = os.path.join(self.output_dir, relpath + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _json(self, data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    def _render_date_page(self, date_str, articles_by_category, categories, category=None):
+        depth = 2 if category else 1
+        template = self.env.get_template('static_digest.html')
+        return template.render(
+            title=self.title,
+            date=date_str,
+            category=category,
+            categories=categories,
+            articles_by_category=articles_by_category,
+            root='../' * depth
+        )
+
+    def export_date(self, date_str, articles_by_category):
+        """Write the pages and JSON for one date."""
+        slugs = self.category_slugs(articles_by_category)
+        categories = [(name, slugs[name]) for name in sorted(articles_by_category)]
+        self._write(f'{date_str}/index.html', self._render_date_page(date_str, articles_by_category, categories))
+        self._write(f'api/articles/{date_str}.json', self._json({date_str: articles_by_category}))
+        for name, slug in categories:
+            subset = {name: articles_by_category[name]}
+            self._write(f'{date_str}/{slug}/index.html', self._render_date_page(date_str, subset, categories, category=name))
+            self._write(f'api/articles/{date_str}/{slug}.json', self._json({date_str: subset}))
+
+    def remove_categories(self, date_str, slugs):
+        for slug in slugs:
+            self._remove(f'{date_str}/{slug}/index.html')
+            self._remove(f'api/articles/{date_str}/{slug}.json')
+
+    def remove_date(self, date_str, previous_categories):
+        """Remove the generated files of a date that no longer has articles (assets are kept)."""
+        self._remove(f'{date_str}/index.html')
+        self._remove(f'api/articles/{date_str}.json')
+        self.remove_categories(date_str, previous_categories)
+
+    def export(self, full=False):
+        """Export all dates, rewriting only those whose content changed unless ``full`` is set."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = {} if full else self._load_manifest()
+        template_hash = self._template_hash()
+        if manifest.get('template') != template_hash:
+            manifest = {}
+        previous_dates = manifest.get('dates', {})
+        new_dates = {}
+        written, skipped = 0, 0
+
+        dates = self.db_manager.get_available_dates()
+        latest_articles = {}
+        for date_str in dates:
+            articles_by_category = self.db_manager.get_summarized_articles_for_date(
+                date_str=date_str, fields=ARTICLE_LIST_FIELDS
+            ).get(date_str, {})
+            if date_str == dates[0]:
+                latest_articles = articles_by_category
+            content_hash = hashlib.sha256(self._json(articles_by_category).encode('utf-8')).hexdigest()
+            slugs = list(self.category_slugs(articles_by_category).values())
+            new_dates[date_str] = {'hash': content_hash, 'categories': slugs}
+
+            previous = previous_dates.get(date_str)
+            if previous and previous['hash'] == content_hash:
+                skipped += 1
+                continue
+            if previous:
+                # Drop pages of categories that disappeared from this date.
+                self.remove_categories(date_str, [s for s in previous['categories'] if s not in slugs])
+            self.export_date(date_str, articles_by_category)
+            written += 1
+
+        for date_str, previous in previous_dates.items():
+            if date_str not in new_dates:
+                self.remove_date(date_str, previous['categories'])
+
+        # Site-wide files are small; regenerate them on every run.
+        self._write('api/available_dates.json', self._json(dates))
+        self._write('api/categories.json', self._json(self.db_manager.get_all_categories()))
+        self._write('archive.html', self.env.get_template('static_archive.html').render(title=self.title, dates=dates))
+        if dates:
+            latest = dates[0]
+            slugs = self.category_slugs(latest_articles)
+            categories = [(name, slugs[name]) for name in sorted(latest_articles)]
+            page = self.env.get_template('static_digest.html').render(
+                title=self.title, date=latest, category=None, categories=categories,
+                articles_by_category=latest_articles, root=''
+            )
+            self._write('index.html', page)
+        with open(STYLESHEET_PATH, 'rb') as f:
+            self._write('static/style.css', f.read())
+
+        manifest = {'template': template_hash, 'dates': new_dates}
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(f"Static export complete: {written} dates written, {skipped} unchanged, to {self.output_dir}")
+        if self.stats_manager:
+            self.stats_manager.increment('static_dates_written', written)
+            self.stats_manager.increment('static_dates_unchanged', skipped)
+        return {'written': written, 'unchanged': skipped, 'dates': len(dates)}
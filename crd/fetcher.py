@@ -2,24 +2,145 @@ import xml.etree.ElementTree as ET
 import feedparser
 import requests
 from playwright.sync_api import sync_playwright, Error as PlaywrightError
-from concurrent.futures import ThreadPoolExecutor
+from .utils.streaming import bounded_map
+from .utils.keywords import KeywordFilter, REJECT, CHECK_BODY
+from .utils.archive import read_record, decode_body
 from bs4 import BeautifulSoup
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timedelta
 import time
 import os
+import re
 import logging
 import csv
 import json
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 logger = logging.getLogger(__name__)
 
+# Where article text comes from: 'feed' uses the text the RSS entry carries, 'page'
+# always downloads the article page, and 'auto' uses the feed text when it is long enough.
+CONTENT_STRATEGIES = ('auto', 'feed', 'page')
+
+# In 'auto' mode, feed text at least this long is taken as the full article.
+MIN_FEED_CONTENT_CHARS = 500
+
+# Pages are fetched over plain HTTP first. Extracted text shorter than this means the
+# page probably needs JavaScript, so it is retried in the headless browser.
+MIN_PAGE_CONTENT_CHARS = 500
+
+# Learned tiers are probed again after this many seconds, in case a site changes how it renders.
+FETCH_TIER_MAX_AGE = 30 * 24 * 3600
+
+# Where article text usually lives, most specific first.
+ARTICLE_SELECTORS = (
+    'article',
+    'main',
+    '[role="main"]',
+    '.post-content',
+    '.entry-content',
+    '.td-post-content',
+    '#content',
+    '.content',
+    '#main-content',
+    '.main-content',
+    '#article-body',
+    '.article-body'
+)
+
+# Page chrome dropped when no article container is found and the whole body is used.
+BOILERPLATE_SELECTORS = ('nav', 'header', 'footer', 'aside', 'script', 'style', '.sidebar', '#sidebar')
+
+# Browser requests that cannot change the extracted text: they are aborted before they load.
+BLOCKED_RESOURCE_TYPES = frozenset(('image', 'media', 'font'))
+TRACKER_DOMAINS = (
+    'doubleclick.net', 'googlesyndication.com', 'googletagmanager.com', 'google-analytics.com',
+    'googleadservices.com', 'amazon-adsystem.com', 'facebook.net', 'connect.facebook.com',
+    'scorecardresearch.com', 'chartbeat.com', 'hotjar.com', 'segment.io', 'taboola.com', 'outbrain.com',
+    'criteo.com', 'quantserve.com', 'adnxs.com'
+)
+
+# Browser timeouts in milliseconds: loading the document, then waiting for an article container.
+PLAYWRIGHT_NAVIGATION_TIMEOUT = 30000
+PLAYWRIGHT_SELECTOR_TIMEOUT = 10000
+
+# Runs in the page: the same container choice as extract_article_content, returning only the text.
+EXTRACT_TEXT_SCRIPT = """([selectors, boilerplate]) => {
+    for (const selector of selectors) {
+        const element = document.querySelector(selector);
+        if (element) return element.innerText;
+    }
+    if (!document.body) return null;
+    document.body.querySelectorAll(boilerplate.join(',')).forEach(element => element.remove());
+    return document.body.innerText;
+}"""
+
+# Empty mount points of single-page apps: the HTML carries no article text at all.
+JS_SHELL_PATTERN = re.compile(r'<(?:div|main)\s+id=["\'](?:root|app|__next|__nuxt)["\']\s*>\s*</(?:div|main)>|<app-root>\s*</app-root>', re.IGNORECASE)
+
+def extract_article_text(html):
+    """Extract article content from HTML"""
+    if not html:
+        return None
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
+        content_element = None
+        for selector in ARTICLE_SELECTORS:
+            content_element = soup.select_one(selector)
+            if content_element:
+                logger.debug(f"Found content with selector: '{selector}'")
+                break
+        if not content_element:
+            content_element = soup.body
+            if not content_element:
+                return None
+            logger.debug("No specific content container found, falling back to body.")
+            for tag_name in BOILERPLATE_SELECTORS:
+                for tag in content_element.select(tag_name):
+                    tag.decompose()
+        return content_element.get_text(separator='\n', strip=True)
+    except Exception as e:
+        logger.error(f"Error extracting article content: {e}")
+        return None
+
+def extract_archived_page(location):
+    """Re-extract one archived page; returns (url, text). Module-level so a process pool can run it."""
+    try:
+        response = read_record(location.path, location.offset, location.length)
+    except Exception as e:
+        logger.error(f"Error reading archived page {location.url} from {location.path}: {e}")
+        return location.url, None
+    return location.url, extract_article_text(decode_body(response))
+
+def reextract_archive(archive, db_manager, date_str=None, max_workers=None, stats_manager=None):
+    """Re-run extraction over archived pages and update the stored content of their articles.
+
+    Works entirely offline. Extraction is CPU-bound, so pages are parsed in a
+    process pool; only the database updates run in this process. Returns the
+    number of articles whose content changed.
+    """
+    locations = archive.locations(date_str)
+    logger.info(f"Re-extracting {len(locations)} archived pages")
+    updated = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for url, content in pool.map(extract_archived_page, locations, chunksize=16):
+            if not content:
+                if stats_manager:
+                    stats_manager.increment('reextract_empty')
+                continue
+            if db_manager.update_article_content(url, content):
+                updated += 1
+                if stats_manager:
+                    stats_manager.increment('articles_reextracted')
+    logger.info(f"Updated the content of {updated} articles from the archive")
+    return updated
+
 class ArticleFetcher:
     """Fetches articles from RSS feeds"""
 
-    def __init__(self, db_manager, feeds_path, stats_manager=None, http_client=None, target_date=None, max_workers=10, keywords=None):
+    def __init__(self, db_manager, feeds_path, stats_manager=None, http_client=None, target_date=None, max_workers=10, keywords=None, archive=None, refresh=False):
         self.http_client = http_client or requests
         self.db_manager = db_manager
         self.feeds_path = feeds_path
@@ -27,6 +148,12 @@ class ArticleFetcher:
         self.max_workers = max_workers
         self.stats_manager = stats_manager
         self.keywords = keywords or []
+        self.archive = archive
+        # Update the content of articles already stored, instead of skipping them.
+        self.refresh = refresh
+        self.keyword_filters = {}
+        self.feed_options = {}
+        self.domain_tiers = {}
         self.feeds = self._load_feeds()
 
     def _load_feeds(self):
@@ -41,6 +168,45 @@ class ArticleFetcher:
             logger.error(f"Error decoding JSON from {self.feeds_path}")
             return {}
 
+    def keyword_filter(self, category):
+        """The compiled keyword rule for ``category``: its ``keywords`` in feeds.json, or the global KEYWORDS."""
+        if category not in self.keyword_filters:
+            config = self.feeds.get(category, {}).get('keywords')
+            self.keyword_filters[category] = KeywordFilter.from_config(config, default_include=self.keywords)
+        return self.keyword_filters[category]
+
+    def category_feed_options(self, category_info):
+        """Map each feed URL of a category to its content strategy and minimum feed text length.
+
+        A feed is either a URL or an object with ``url`` and optionally ``content``
+        and ``min_content_chars``; the category's own ``content`` and
+        ``min_content_chars`` are the defaults.
+        """
+        defaults = {
+            'content': category_info.get('content', 'auto'),
+            'min_content_chars': category_info.get('min_content_chars', MIN_FEED_CONTENT_CHARS),
+        }
+        options = {}
+        for feed in category_info.get('feeds', []):
+            feed = {'url': feed} if isinstance(feed, str) else feed
+            feed_options = {key: feed.get(key, value) for key, value in defaults.items()}
+            if feed_options['content'] not in CONTENT_STRATEGIES:
+                raise ValueError(f"Unknown content strategy {feed_options['content']!r} for {feed['url']}; "
+                                 f"expected one of: {', '.join(CONTENT_STRATEGIES)}")
+            options[feed['url']] = feed_options
+        return options
+
+    def extract_feed_text(self, html):
+        """Plain text of an HTML fragment from a feed entry."""
+        if not html:
+            return ''
+        return BeautifulSoup(html, 'html.parser').get_text(separator='\n', strip=True)
+
+    def extract_feed_content(self, entry):
+        """Text of the fullest body a feed entry carries: content:encoded, Atom content or the summary."""
+        bodies = [content.get('value', '') for content in entry.get('content', [])] + [entry.get('summary', '')]
+        return self.extract_feed_text(max(bodies, key=len))
+
     def fetch_articles_from_rss(self, url):
         """Fetch articles from a single RSS feed"""
         articles = []
@@ -62,7 +228,10 @@ class ArticleFetcher:
                         article = {
                             'title': entry.title,
                             'link': entry.link,
-                            'date': published_date.strftime('%Y-%m-%d')
+                            'date': published_date.strftime('%Y-%m-%d'),
+                            'summary': self.extract_feed_text(entry.get('summary', '')),
+                            'feed_content': self.extract_feed_content(entry),
+                            'feed': url
                         }
                         articles.append(article)
                 except AttributeError:
@@ -76,17 +245,23 @@ class ArticleFetcher:
         return articles
     
     def fetch_all_articles(self, urls):
-        """Fetch articles from multiple RSS feeds concurrently"""
-        articles = []
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            results = list(executor.map(self.fetch_articles_from_rss, tqdm(urls, desc="Fetching RSS feeds")))
-            for result in results:
-                articles.extend(result)
-        logger.info(f"Fetched a total of {len(articles)} articles")
-        return articles
+        """Fetch articles from multiple RSS feeds concurrently, yielding entries as each feed completes."""
+        total = 0
+        for result in bounded_map(self.fetch_articles_from_rss, tqdm(urls, desc="Fetching RSS feeds"), self.max_workers):
+            total += len(result)
+            yield from result
+        logger.info(f"Fetched a total of {total} articles")
     
     def fetch_html_content(self, url):
-        """Fetch HTML content from a URL"""
+        """Fetch HTML content from a URL, keeping the raw response in the archive if there is one"""
+        response = self.fetch_html_response(url)
+        if response is None:
+            return None
+        self.archive_response(url, response)
+        return response.text
+
+    def fetch_html_response(self, url):
+        """Fetch a URL over plain HTTP; returns the response, or None if it failed"""
         try:
             if url.startswith('//'):
                 url = 'https:' + url
@@ -99,72 +274,142 @@ class ArticleFetcher:
                 self.stats_manager.increment('http_fetches_success')
             response.raise_for_status()
             logger.info(f"Response status code: {response.status_code}")
-            return response.text
+            return response
         except Exception as e:
             if self.stats_manager:
                 self.stats_manager.increment('http_fetches_failed')
             logger.error(f"Error fetching HTML content from {url}: {e}, URL: {url}")
             return None
     
-    def fetch_html_with_playwright(self, url):
-        """Fetch HTML content from a URL using Playwright for JS-heavy sites."""
+    def archive_response(self, url, response):
+        """Keep the raw response in the archive, if there is one."""
+        if not self.archive:
+            return
+        try:
+            self.archive.write(url, response.status_code, response.headers, response.content,
+                               self.target_date.strftime('%Y-%m-%d'))
+            if self.stats_manager:
+                self.stats_manager.increment('pages_archived')
+        except OSError as e:
+            logger.error(f"Error archiving {url}: {e}")
+
+    def is_tracker(self, url):
+        host = urlparse(url).hostname or ''
+        return any(host == domain or host.endswith('.' + domain) for domain in TRACKER_DOMAINS)
+
+    def fetch_text_with_playwright(self, url):
+        """Render a JS-heavy page in a lean headless browser and return its article text.
+
+        Images, media, fonts and tracker requests are aborted. The text is read
+        in the page as soon as an article container appears, so no full HTML
+        snapshot crosses to Python.
+        """
         with self.stats_manager.time_block('fetcher_playwright_fetch') if self.stats_manager else open(os.devnull, 'w'):
+            blocked = 0
+
+            def route_request(route):
+                nonlocal blocked
+                request = route.request
+                if request.resource_type in BLOCKED_RESOURCE_TYPES or self.is_tracker(request.url):
+                    blocked += 1
+                    route.abort()
+                else:
+                    route.continue_()
+
             try:
-                logger.info(f"Fetching HTML with Playwright from {url}")
+                logger.info(f"Fetching text with Playwright from {url}")
                 with sync_playwright() as p:
                     browser = p.chromium.launch()
-                    page = browser.new_page()
-                    page.goto(url, wait_until='domcontentloaded', timeout=60000)
-                    content = page.content()
-                    browser.close()
-                    if self.stats_manager:
-                        self.stats_manager.increment('playwright_fetches_success')
-                    return content
+                    try:
+                        page = browser.new_page()
+                        page.route('**/*', route_request)
+                        page.goto(url, wait_until='domcontentloaded', timeout=PLAYWRIGHT_NAVIGATION_TIMEOUT)
+                        try:
+                            page.wait_for_selector(', '.join(ARTICLE_SELECTORS), timeout=PLAYWRIGHT_SELECTOR_TIMEOUT)
+                        except PlaywrightError:
+                            logger.debug(f"No article container appeared on {url}; using the page body")
+                        text = page.evaluate(EXTRACT_TEXT_SCRIPT, [list(ARTICLE_SELECTORS), list(BOILERPLATE_SELECTORS)])
+                    finally:
+                        browser.close()
+                if self.stats_manager:
+                    self.stats_manager.increment('playwright_fetches_success')
+                    self.stats_manager.increment('playwright_requests_blocked', blocked)
+                # Match the line layout of extract_article_content.
+                return '\n'.join(line.strip() for line in (text or '').splitlines() if line.strip()) or None
             except PlaywrightError as e:
                 if self.stats_manager:
                     self.stats_manager.increment('playwright_fetches_failed')
-                logger.error(f"Error fetching HTML with Playwright from {url}: {e}")
+                logger.error(f"Error fetching text with Playwright from {url}: {e}")
                 return None
 
+    def url_domain(self, url):
+        """The host of ``url`` without a leading ``www.``, as fetch tiers are keyed."""
+        domain = urlparse(url if '//' in url else '//' + url).netloc.lower()
+        return domain[4:] if domain.startswith('www.') else domain
+
+    def _fetch_with(self, url, tier):
+        """Fetch ``url`` in one tier; returns (response, extracted text). The browser extracts in the page, so its response is None."""
+        with self.stats_manager.span('fetch') if self.stats_manager else open(os.devnull, 'w'):
+            if tier == 'browser':
+                return None, self.fetch_text_with_playwright(url)
+            response = self.fetch_html_response(url)
+        with self.stats_manager.span('extract') if self.stats_manager else open(os.devnull, 'w'):
+            content = self.extract_article_content(response.text) if response is not None else None
+        return response, content
+
+    def _keep_http_content(self, url, response, content):
+        """Archive the response the returned text was extracted from; browser text has no response to re-extract."""
+        if response is not None and content:
+            self.archive_response(url, response)
+        return content
+
+    def remember_fetch_tier(self, domain, tier):
+        self.domain_tiers[domain] = tier
+        self.db_manager.set_fetch_tier(domain, tier)
+        if self.stats_manager:
+            self.stats_manager.increment(f'fetch_tier_learned_{tier}')
+
+    def fetch_page_content(self, url, use_playwright=False):
+        """Fetch a page and extract its text, using the headless browser only where it is needed.
+
+        Domains with a learned tier go straight to it. Otherwise the page is
+        fetched over plain HTTP, and retried in the browser if that gives too
+        little text or an empty JavaScript shell. Whichever tier worked is then
+        stored for the domain. ``use_playwright`` forces the browser.
+
+        Only pages whose text came from the HTTP tier are archived, so an
+        offline re-extraction never replaces browser text with the text of
+        an HTTP probe.
+        """
+        if use_playwright:
+            return self._fetch_with(url, 'browser')[1]
+        domain = self.url_domain(url)
+        tier = self.domain_tiers.get(domain)
+        if tier:
+            return self._keep_http_content(url, *self._fetch_with(url, tier))
+
+        response, content = self._fetch_with(url, 'http')
+        if content and len(content) >= MIN_PAGE_CONTENT_CHARS and not JS_SHELL_PATTERN.search(response.text):
+            self.remember_fetch_tier(domain, 'http')
+            return self._keep_http_content(url, response, content)
+
+        logger.info(f"Too little text over HTTP from {url}; retrying in the browser")
+        if self.stats_manager:
+            self.stats_manager.increment('fetch_escalations')
+        browser_content = self._fetch_with(url, 'browser')[1]
+        if browser_content and len(browser_content) > len(content or '') and len(browser_content) >= MIN_PAGE_CONTENT_CHARS:
+            self.remember_fetch_tier(domain, 'browser')
+            return browser_content
+        if content:
+            # The browser found nothing more, so this site's pages are just short.
+            self.remember_fetch_tier(domain, 'http')
+            return self._keep_http_content(url, response, content)
+        return browser_content
+
     def extract_article_content(self, html):
         """Extract article content from HTML"""
-        if not html:
-            return None
-        try:
-            soup = BeautifulSoup(html, 'html.parser')
-            selectors = [
-                'article',
-                'main',
-                '[role="main"]',
-                '.post-content',
-                '.entry-content',
-                '.td-post-content',
-                '#content',
-                '.content',
-                '#main-content',
-                '.main-content',
-                '#article-body',
-                '.article-body'
-            ]
-            content_element = None
-            for selector in selectors:
-                content_element = soup.select_one(selector)
-                if content_element:
-                    logger.debug(f"Found content with selector: '{selector}'")
-                    break
-            if not content_element:
-                content_element = soup.body
-                if not content_element:
-                    return None
-                logger.debug("No specific content container found, falling back to body.")
-                for tag_name in ['nav', 'header', 'footer', 'aside', 'script', 'style', '.sidebar', '#sidebar']:
-                    for tag in content_element.select(tag_name):
-                        tag.decompose()
-            return content_element.get_text(separator='\n', strip=True)
-        except Exception as e:
-            logger.error(f"Error extracting article content: {e}")
-            return None
-    
+        return extract_article_text(html)
+
     def get_youtube_video_id(self, url):
         """Extract YouTube video ID from URL"""
         parsed_url = urlparse(url)
@@ -185,6 +430,11 @@ class ArticleFetcher:
 
     def process_single_article(self, article_info, use_playwright=False):
         """Process a single article"""
+        article = article_info[0]
+        with self.stats_manager.span('article', url=article.get('link')) if self.stats_manager else open(os.devnull, 'w'):
+            return self._process_single_article(article_info, use_playwright)
+
+    def _process_single_article(self, article_info, use_playwright=False):
         article, category = article_info
         title = article.get('title')
         url = article.get('link')
@@ -194,22 +444,44 @@ class ArticleFetcher:
             logger.warning(f"Skipping article with missing data: {article}")
             return False
 
+        # Screen the RSS title and summary first, so articles that cannot match are never downloaded.
+        keyword_filter = self.keyword_filter(category)
+        outcome, included = keyword_filter.screen(title, article.get('summary')) if keyword_filter else (None, False)
+        if outcome == REJECT:
+            logger.info(f"Skipping article before fetch: {title} (keyword rules)")
+            if self.stats_manager:
+                self.stats_manager.increment('articles_screened_before_fetch')
+            return False
+
         logger.info(f"Processing article: {title} from {url}")
 
         content = None
+        options = self.feed_options.get(article.get('feed'), {})
+        strategy = options.get('content', 'auto')
+        feed_content = article.get('feed_content') or ''
         video_id = self.get_youtube_video_id(url)
         if video_id:
-            content = self.fetch_youtube_subtitles(video_id)
+            # A video's feed text is only its description; the transcript is the content.
+            with self.stats_manager.span('fetch') if self.stats_manager else open(os.devnull, 'w'):
+                content = self.fetch_youtube_subtitles(video_id)
+            if not content and feed_content:
+                content = feed_content
+        elif feed_content and (strategy == 'feed' or strategy == 'auto' and
+                               len(feed_content) >= options.get('min_content_chars', MIN_FEED_CONTENT_CHARS)):
+            content = feed_content
+            if self.stats_manager:
+                self.stats_manager.increment('articles_from_feed_content')
         else:
-            if use_playwright:
-                html = self.fetch_html_with_playwright(url)
-            else:
-                html = self.fetch_html_content(url)
-            content = self.extract_article_content(html) if html else None
+            content = self.fetch_page_content(url, use_playwright)
+            if not content and feed_content:
+                # The page could not be fetched or parsed; a short feed excerpt beats dropping the article.
+                content = feed_content
 
         if content:
-            if self.keywords and not any(keyword.lower() in content.lower() for keyword in self.keywords):
-                logger.info(f"Skipping article: {title} (none of the keywords found)")
+            if outcome == CHECK_BODY and keyword_filter.screen(content, included=included, final=True)[0] == REJECT:
+                logger.info(f"Skipping article: {title} (keyword rules)")
+                if self.stats_manager:
+                    self.stats_manager.increment('articles_screened_after_fetch')
                 return False
 
             article_data = {
@@ -225,18 +497,28 @@ class ArticleFetcher:
                 if self.stats_manager:
                     self.stats_manager.increment('articles_saved_to_db')
                 return True
+            if self.refresh and self.db_manager.update_article_content(url, content):
+                # Later stages see the new content hash and redo only this article.
+                logger.info(f"Updated changed content in DB: {title}")
+                if self.stats_manager:
+                    self.stats_manager.increment('articles_content_changed')
+                return True
         return False
 
     def process_articles(self, articles_with_category, use_playwright=False):
-        """Process multiple articles concurrently"""
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            results = list(executor.map(
-                lambda article_info: self.process_single_article(article_info, use_playwright),
-                articles_with_category
-            ))
-
-        processed_count = sum(1 for result in results if result)
-        logger.info(f"Processed and saved {processed_count} articles to DB out of {len(articles_with_category)}")
+        """Process articles concurrently, with a bounded number in flight.
+
+        ``articles_with_category`` may be any iterable, including a generator;
+        it is consumed lazily, so page bodies are only held while in flight.
+        """
+        processed_count = 0
+        total = 0
+        for result in bounded_map(lambda article_info: self.process_single_article(article_info, use_playwright),
+                                  articles_with_category, self.max_workers):
+            total += 1
+            if result:
+                processed_count += 1
+        logger.info(f"Processed and saved {processed_count} articles to DB out of {total}")
         return processed_count
 
     def process(self, category, date_str):
@@ -246,15 +528,21 @@ class ArticleFetcher:
             return
 
         category_info = self.feeds[category]
-        urls = category_info.get('feeds', [])
+        try:
+            self.keyword_filter(category)
+            self.feed_options.update(self.category_feed_options(category_info))
+        except ValueError as e:
+            logger.error(f"Invalid feed configuration for category '{category}': {e}")
+            return
+        urls = [feed if isinstance(feed, str) else feed['url'] for feed in category_info.get('feeds', [])]
         use_playwright = category_info.get('use_playwright', False)
 
         if not urls:
             logger.warning(f"No feeds found for category '{category}'.")
             return
+        self.domain_tiers = self.db_manager.get_fetch_tiers(max_age=FETCH_TIER_MAX_AGE)
 
-        articles = self.fetch_all_articles(urls)
-        articles_with_category = [(article, category) for article in articles]
+        articles_with_category = ((article, category) for article in self.fetch_all_articles(urls))
         self.process_articles(articles_with_category, use_playwright)
 
     def save_articles_to_csv(self, articles, csv_file):
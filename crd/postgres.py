@@ -0,0 +1,327 @@
+import re
+import logging
+from contextlib import contextmanager
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:  # PostgreSQL support is optional; install psycopg[pool] to use it.
+    psycopg = None
+
+from .database import DatabaseManager, ARTICLE_FIELDS, SNIPPET_MARKS, is_cjk, like_pattern
+
+logger = logging.getLogger(__name__)
+
+POOL_MIN_SIZE = 1
+# Enough for a stage's worker threads, a lease keeper and a few web requests at once.
+POOL_MAX_SIZE = 20
+
+# Serialises concurrent create_tables calls; CREATE OR REPLACE FUNCTION is not safe to race.
+SCHEMA_LOCK_ID = 0x637264
+
+# Weighted like the SQLite FTS5 ranking: title, then English summary, then body.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(english_summary, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'D')"
+)
+
+_QUOTED = re.compile(r"('(?:[^']|'')*')")
+
+def translate_placeholders(sql):
+    """Rewrite qmark placeholders as psycopg's %s, escaping literal percent signs."""
+    parts = _QUOTED.split(sql)
+    for i, part in enumerate(parts):
+        part = part.replace('%', '%%')
+        parts[i] = part if i % 2 else part.replace('?', '%s')
+    return ''.join(parts)
+
+class _Cursor:
+    """A psycopg cursor that accepts the qmark SQL shared with the SQLite implementation."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(translate_placeholders(sql), params)
+        return self
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(translate_placeholders(sql), rows)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _Connection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+class PostgresDatabaseManager(DatabaseManager):
+    """PostgreSQL implementation of ``ArticleRepository`` over a connection pool.
+
+    Each unit of work borrows a pooled connection and hands it back when it
+    finishes, so many threads and processes can write concurrently. Queries
+    come from ``DatabaseManager``. This class supplies the schema: plpgsql
+    triggers for the generation counter, the stats rollups and lease release,
+    plus a weighted tsvector index that replaces FTS5. Chinese text is matched
+    with LIKE.
+    """
+
+    LOCK_CLAIMED_ROWS = ' FOR UPDATE SKIP LOCKED'
+
+    def __init__(self, dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE):
+        if psycopg is None:
+            raise RuntimeError("PostgreSQL support requires psycopg: pip install 'psycopg[binary,pool]'")
+        self.Error = psycopg.Error
+        self.dsn = dsn
+        self.pool = ConnectionPool(dsn, min_size=min_size, max_size=max_size,
+                                   kwargs={'row_factory': dict_row}, open=True)
+
+    def get_conn(self):
+        """Not available here: a pooled connection must go back to the pool when its unit of work ends."""
+        raise TypeError("PostgresDatabaseManager has no per-thread connection; "
+                        "borrow a pooled one with 'with db.connection() as conn:'")
+
+    def close_conn(self):
+        # Connections go back to the pool at the end of every unit of work.
+        pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; it commits on success and rolls back if the block raises."""
+        with self.pool.connection() as conn:
+            yield _Connection(conn)
+
+    def close(self):
+        self.pool.close()
+
+    def create_tables(self):
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT pg_advisory_xact_lock(?)", (SCHEMA_LOCK_ID,))
+                cursor.execute("SELECT to_regclass('stats_daily') IS NULL AS missing")
+                new_rollups = cursor.fetchone()['missing']
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS articles (
+                        id SERIAL PRIMARY KEY,
+                        url TEXT UNIQUE NOT NULL,
+                        title TEXT NOT NULL,
+                        publication_date TEXT NOT NULL,
+                        fetch_date TEXT NOT NULL,
+                        category TEXT NOT NULL,
+                        content TEXT,
+                        score DOUBLE PRECISION,
+                        status TEXT NOT NULL DEFAULT 'fetched',
+                        chinese_title TEXT,
+                        english_summary TEXT,
+                        chinese_summary TEXT,
+                        thumbnail_path TEXT,
+                        rating_reason TEXT,
+                        source TEXT,
+                        lease_owner TEXT,
+                        lease_expires_at DOUBLE PRECISION,
+                        content_hash TEXT,
+                        rating_fingerprint TEXT,
+                        summary_fingerprint TEXT,
+                        rating_model TEXT,
+                        screening_score DOUBLE PRECISION
+                    )
+                """)
+                cursor.execute("SELECT count(*) AS n FROM information_schema.columns "
+                               "WHERE table_name = 'articles' AND column_name = 'content_hash' AND table_schema = current_schema()")
+                if not cursor.fetchone()['n']:
+                    for column in ('content_hash', 'rating_fingerprint', 'summary_fingerprint'):
+                        cursor.execute(f"ALTER TABLE articles ADD COLUMN {column} TEXT")
+                    self._backfill_content_hashes(cursor)
+                cursor.execute("ALTER TABLE articles ADD COLUMN IF NOT EXISTS rating_model TEXT")
+                cursor.execute("ALTER TABLE articles ADD COLUMN IF NOT EXISTS screening_score DOUBLE PRECISION")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_articles_stage ON articles(category, fetch_date, status, id)")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_articles_search ON articles USING GIN (({SEARCH_VECTOR}))")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS db_meta (
+                        key TEXT PRIMARY KEY,
+                        value BIGINT NOT NULL
+                    )
+                """)
+                cursor.execute("INSERT INTO db_meta(key, value) VALUES ('generation', 0), ('metrics_generation', 0) ON CONFLICT DO NOTHING")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS render_jobs (
+                        id SERIAL PRIMARY KEY,
+                        article_id INTEGER NOT NULL,
+                        cache_key TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'queued',
+                        image_relpath TEXT NOT NULL,
+                        error TEXT,
+                        enqueued_at DOUBLE PRECISION NOT NULL,
+                        started_at DOUBLE PRECISION,
+                        finished_at DOUBLE PRECISION
+                    )
+                """)
+                cursor.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_render_jobs_live_key
+                    ON render_jobs(cache_key) WHERE status IN ('queued', 'running')
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs(status, id)")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS stats_daily (
+                        fetch_date TEXT NOT NULL,
+                        category TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        article_count INTEGER NOT NULL DEFAULT 0,
+                        score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        scored_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (fetch_date, category, status)
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_usage_daily (
+                        day TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        calls INTEGER NOT NULL DEFAULT 0,
+                        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                        completion_tokens INTEGER NOT NULL DEFAULT 0,
+                        cost DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        PRIMARY KEY (day, model)
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS pipeline_runs (
+                        id SERIAL PRIMARY KEY,
+                        command TEXT NOT NULL,
+                        category TEXT,
+                        target_date TEXT,
+                        status TEXT NOT NULL,
+                        started_at DOUBLE PRECISION NOT NULL,
+                        duration DOUBLE PRECISION NOT NULL
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS pipeline_metrics (
+                        run_id INTEGER NOT NULL REFERENCES pipeline_runs(id) ON DELETE CASCADE,
+                        name TEXT NOT NULL,
+                        kind TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        total DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        p50 DOUBLE PRECISION,
+                        p95 DOUBLE PRECISION,
+                        p99 DOUBLE PRECISION,
+                        max DOUBLE PRECISION,
+                        PRIMARY KEY (run_id, kind, name)
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_metrics_name ON pipeline_metrics(kind, name, run_id)")
+                # The fetch tier each site needs ('http' or 'browser'), learned by the fetcher.
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS fetch_tiers (
+                        domain TEXT PRIMARY KEY,
+                        tier TEXT NOT NULL,
+                        updated_at DOUBLE PRECISION NOT NULL
+                    )
+                """)
+                self._create_triggers(cursor)
+                if new_rollups:
+                    self._backfill_stats(cursor)
+                conn.commit()
+                logger.info("Tables created or already exist.")
+        except self.Error as e:
+            logger.error(f"Error creating tables: {e}")
+
+    def _create_triggers(self, cursor):
+        """Create the trigger functions that the SQLite schema expresses as inline triggers."""
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION crd_release_lease() RETURNS trigger AS $$
+            BEGIN
+                NEW.lease_owner := NULL;
+                NEW.lease_expires_at := NULL;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION crd_bump_generation() RETURNS trigger AS $$
+            BEGIN
+                UPDATE db_meta SET value = value + 1 WHERE key = 'generation';
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION crd_stats_daily() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    UPDATE stats_daily SET
+                        article_count = article_count - 1,
+                        score_sum = score_sum - COALESCE(OLD.score, 0),
+                        scored_count = scored_count - (OLD.score IS NOT NULL)::int
+                    WHERE fetch_date = OLD.fetch_date AND category = OLD.category AND status = OLD.status;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO stats_daily(fetch_date, category, status, article_count, score_sum, scored_count)
+                    VALUES (NEW.fetch_date, NEW.category, NEW.status, 1, COALESCE(NEW.score, 0), (NEW.score IS NOT NULL)::int)
+                    ON CONFLICT (fetch_date, category, status) DO UPDATE SET
+                        article_count = stats_daily.article_count + 1,
+                        score_sum = stats_daily.score_sum + excluded.score_sum,
+                        scored_count = stats_daily.scored_count + excluded.scored_count;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # Lease bookkeeping does not change what readers see, so it does not bump the generation.
+        data_columns = ', '.join(f for f in ARTICLE_FIELDS if f != 'id')
+        triggers = {
+            'articles_lease_release': "BEFORE UPDATE OF status ON articles FOR EACH ROW "
+                                      "WHEN (NEW.lease_owner IS NOT NULL) EXECUTE FUNCTION crd_release_lease()",
+            'articles_generation': f"AFTER INSERT OR DELETE OR UPDATE OF {data_columns} ON articles "
+                                   "FOR EACH ROW EXECUTE FUNCTION crd_bump_generation()",
+            'stats_daily_rollup': "AFTER INSERT OR DELETE OR UPDATE OF status, score, fetch_date, category ON articles "
+                                  "FOR EACH ROW EXECUTE FUNCTION crd_stats_daily()",
+        }
+        for name, definition in triggers.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name} ON articles")
+            cursor.execute(f"CREATE TRIGGER {name} {definition}")
+
+    def _search_queries(self, cursor, terms, filters, filter_params, limit):
+        start_mark, end_mark = SNIPPET_MARKS
+        headline_options = f"StartSel={start_mark}, StopSel={end_mark}, MaxWords=16, MinWords=8"
+        english_terms = [t for t in terms if not is_cjk(t)]
+        # Chinese text is not in the search vector, so CJK terms are matched with LIKE,
+        # narrowed by the indexed English match whenever the query has English terms.
+        cjk_terms = [t for t in terms if is_cjk(t)]
+        like_clauses = ''.join(" AND (a.chinese_title LIKE ? ESCAPE '\\' OR a.chinese_summary LIKE ? ESCAPE '\\')"
+                               for _ in cjk_terms)
+        like_params = [like_pattern(t) for t in cjk_terms for _ in range(2)]
+        if not english_terms:
+            return [(f"""SELECT a.id, CAST(0 AS DOUBLE PRECISION) AS rank, NULL AS snippet FROM articles a
+                WHERE 1 = 1{like_clauses} AND {filters} ORDER BY a.fetch_date DESC LIMIT ?""", like_params + filter_params + [limit])]
+        # Ranks are negated so that, as with BM25, lower is better. Headlines are
+        # built only for the rows that survive the LIMIT.
+        english = f"""
+            SELECT hits.id, hits.rank,
+                   ts_headline('simple', concat_ws(' ', a.title, a.english_summary), hits.query, ?) AS snippet
+            FROM (
+                SELECT a.id, -ts_rank({SEARCH_VECTOR}, query) AS rank, query
+                FROM articles a, plainto_tsquery('simple', ?) AS query
+                WHERE {SEARCH_VECTOR} @@ query{like_clauses} AND {filters}
+                ORDER BY rank LIMIT ?
+            ) hits JOIN articles a ON a.id = hits.id
+        """
+        return [(english, [headline_options, ' '.join(english_terms)] + like_params + filter_params + [limit])]
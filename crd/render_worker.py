@@ -0,0 +1,74 @@
+import os
+import time
+import logging
+from playwright.sync_api import sync_playwright
+from .renderer import NewsletterRenderer
+from .utils.render_cache import RenderCache, READY
+
+logger = logging.getLogger(__name__)
+
+class RenderWorker:
+    """Background worker that drains the render job queue with one long-lived browser."""
+
+    def __init__(self, db_manager, output_dir, stats_manager=None, title="Research Digest", font="Arial, sans-serif", width=600, poll_interval=1.0):
+        self.db_manager = db_manager
+        self.output_dir = output_dir
+        self.stats_manager = stats_manager
+        self.title = title
+        self.font = font
+        self.width = width
+        self.poll_interval = poll_interval
+        self.render_cache = RenderCache(output_dir)
+
+    def run_job(self, job, renderer):
+        """Render the card for a single claimed job and record the outcome."""
+        article = self.db_manager.get_article_by_id(job['article_id'])
+        if not article:
+            self.db_manager.finish_render_job(job['id'], error='Article not found')
+            return False
+
+        if self.render_cache.relpath_for(article) != job['image_relpath']:
+            # The summary changed after the job was queued; render the current version.
+            logger.info(f"Render job {job['id']} is stale, rendering current content of article {article['id']}.")
+
+        status, _ = self.render_cache.get_or_render(
+            article, lambda a, path: renderer.generate_article_analysis_image(dict(a), path)
+        )
+        if status == READY:
+            self.db_manager.finish_render_job(job['id'])
+            if self.stats_manager:
+                self.stats_manager.increment('render_jobs_done')
+            return True
+
+        self.db_manager.finish_render_job(job['id'], error='Render failed')
+        if self.stats_manager:
+            self.stats_manager.increment('render_jobs_failed')
+        return False
+
+    def run(self, once=False):
+        """Process jobs until interrupted. With ``once``, exit when the queue is empty."""
+        logger.info(f"Render worker started (pid {os.getpid()}), writing to {self.output_dir}")
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            renderer = NewsletterRenderer(
+                db_manager=self.db_manager,
+                stats_manager=self.stats_manager,
+                title=self.title,
+                font=self.font,
+                width=self.width,
+                browser=browser
+            )
+            try:
+                while True:
+                    job = self.db_manager.claim_next_render_job()
+                    if job is None:
+                        if once:
+                            break
+                        time.sleep(self.poll_interval)
+                        continue
+                    logger.info(f"Rendering job {job['id']} for article {job['article_id']}")
+                    self.run_job(job, renderer)
+            except KeyboardInterrupt:
+                logger.info("Render worker interrupted, shutting down.")
+            finally:
+                browser.close()
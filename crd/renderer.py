@@ -2,24 +2,41 @@ import os
 import logging
 import re
 import requests
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs, urljoin
 from bs4 import BeautifulSoup
 from jinja2 import Environment, FileSystemLoader
 from playwright.sync_api import sync_playwright
 from PIL import Image
 from .utils.io import write_file
+from .utils.render_cache import RenderCache
 
 logger = logging.getLogger(__name__)
 
 class NewsletterRenderer:
     """Renders newsletter from article summaries"""
 
-    def __init__(self, db_manager, stats_manager=None, title="Research Digest", font="Arial, sans-serif", width=800):
+    def __init__(self, db_manager, stats_manager=None, title="Research Digest", font="Arial, sans-serif", width=800, browser=None):
         self.db_manager = db_manager
         self.title = title
         self.font = font
         self.stats_manager = stats_manager
         self.width = width
+        # An already-launched Playwright browser to reuse instead of launching one per render.
+        self.browser = browser
+
+    @contextmanager
+    def _browser(self):
+        """Yield the shared browser if one was given, otherwise launch a short-lived one."""
+        if self.browser is not None:
+            yield self.browser
+            return
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            try:
+                yield browser
+            finally:
+                browser.close()
 
     def _render_html_to_png(self, html_file_path, output_png_path):
         """Renders an HTML file to a PNG image using Playwright with dynamic height."""
@@ -28,47 +45,52 @@ class NewsletterRenderer:
         max_height = 1200
         padding = 40 * device_pixel_ratio # 40px padding
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
+        with self._browser() as browser:
             page = browser.new_page(device_scale_factor=device_pixel_ratio)
-            
-            # Set a default viewport to load the page
-            page.set_viewport_size({"width": self.width, "height": 1000})
-            
-            page.goto(f"file://{os.path.abspath(html_file_path)}", wait_until='networkidle', timeout=60000)
-
-            # Calculate dynamic height based on the content-wrapper div
+            # The page is closed even if navigation fails, so a shared browser never accumulates pages.
             try:
-                element_handle = page.query_selector('#content-wrapper')
-                if not element_handle:
-                    raise ValueError("Content wrapper element not found")
-                
-                bounding_box = element_handle.bounding_box()
-                if not bounding_box:
-                    raise ValueError("Could not get bounding box of content wrapper")
+                # Set a default viewport to load the page
+                page.set_viewport_size({"width": self.width, "height": 1000})
 
-                content_height = bounding_box['height']
-                
-                # Add some vertical padding to the height
-                final_height = int(content_height) + 80 # 40px padding top + 40px bottom
-
-                page.set_viewport_size({"width": self.width, "height": final_height})
-                
-                screenshot = page.screenshot()
-            except Exception as e:
-                logger.error(f"Failed to calculate dynamic height or take screenshot: {e}")
-                # Fallback to a default size screenshot if dynamic calculation fails
-                page.set_viewport_size({"width": self.width, "height": 600})
-                screenshot = page.screenshot()
-            
-            browser.close()
+                page.goto(f"file://{os.path.abspath(html_file_path)}", wait_until='networkidle', timeout=60000)
+                screenshot, final_height = self._screenshot_content(page)
+            finally:
+                page.close()
         
         with open(output_png_path, 'wb') as f:
             f.write(screenshot)
         
         # No need to crop if viewport is set correctly
         logger.info(f"Rendered {html_file_path} to {output_png_path} with dynamic height: {final_height}px")
-    
+
+    def _screenshot_content(self, page):
+        """Screenshot a loaded page sized to its content wrapper; returns (png bytes, height)."""
+        # Calculate dynamic height based on the content-wrapper div
+        try:
+            element_handle = page.query_selector('#content-wrapper')
+            if not element_handle:
+                raise ValueError("Content wrapper element not found")
+            
+            bounding_box = element_handle.bounding_box()
+            if not bounding_box:
+                raise ValueError("Could not get bounding box of content wrapper")
+
+            content_height = bounding_box['height']
+            
+            # Add some vertical padding to the height
+            final_height = int(content_height) + 80 # 40px padding top + 40px bottom
+
+            page.set_viewport_size({"width": self.width, "height": final_height})
+            
+            screenshot = page.screenshot()
+        except Exception as e:
+            logger.error(f"Failed to calculate dynamic height or take screenshot: {e}")
+            # Fallback to a default size screenshot if dynamic calculation fails
+            final_height = 600
+            page.set_viewport_size({"width": self.width, "height": final_height})
+            screenshot = page.screenshot()
+        return screenshot, final_height
+
     def get_youtube_thumbnail(self, url):
         """Get thumbnail URL for a YouTube video"""
         parsed_url = urlparse(url)
@@ -169,10 +191,16 @@ class NewsletterRenderer:
     def process_thumbnails(self, category, date_str, thumbnails_dir):
         """Finds, downloads, or screenshots thumbnails for articles."""
         os.makedirs(thumbnails_dir, exist_ok=True)
-        articles_to_process = self.db_manager.get_articles_by_status('summarized', category, date_str)
+        articles_to_process = self.db_manager.iter_articles_by_status('summarized', category, date_str)
 
         for article in articles_to_process:
             try:
+                # Re-summarized articles keep the thumbnail found on an earlier run.
+                if article.get('thumbnail_path') and os.path.exists(os.path.join(os.path.dirname(thumbnails_dir), article['thumbnail_path'])):
+                    self.db_manager.update_article_thumbnail(article['id'], article['thumbnail_path'])
+                    if self.stats_manager:
+                        self.stats_manager.increment('thumbnails_reused')
+                    continue
                 thumbnail_rel_path = None
                 safe_filename = self.sanitize_filename(article['title'])
 
@@ -344,11 +372,15 @@ class NewsletterRenderer:
         if summaries_data:
             thumbnails_dir = os.path.join(output_dir_for_date, 'thumbnails')
             os.makedirs(thumbnails_dir, exist_ok=True)
+            # Use the render cache naming so the web app serves these images directly.
+            render_cache = RenderCache(os.path.dirname(os.path.normpath(output_dir_for_date)))
             for article in summaries_data:
-                safe_filename = self.sanitize_filename(article['title'])
-                image_filename = f"analysis_{safe_filename}.png"
-                image_path = os.path.join(output_dir_for_date, image_filename)
-                self.generate_article_analysis_image(article, image_path)
+                image_path = os.path.join(output_dir_for_date, render_cache.filename_for(article))
+                if not os.path.exists(image_path):
+                    with self.stats_manager.span('article', article_id=article['id']) if self.stats_manager else open(os.devnull, 'w'):
+                        with self.stats_manager.span('render') if self.stats_manager else open(os.devnull, 'w'):
+                            render_cache.invalidate_stale(article)
+                            self.generate_article_analysis_image(article, image_path)
             self.process_thumbnails(category, date_str, thumbnails_dir)
             return True
         return False
\ No newline at end of file
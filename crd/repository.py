@@ -0,0 +1,226 @@
+from abc import ABC, abstractmethod
+
+class ArticleRepository(ABC):
+    """Storage interface used by the pipeline, the render worker and the web app.
+
+    ``DatabaseManager`` (SQLite) and ``PostgresDatabaseManager`` implement it;
+    ``open_database`` picks one from a path or DSN. Methods log and swallow
+    storage errors and return an empty result (``[]``, ``{}``, ``None``,
+    ``False`` or ``0``), so callers never handle driver exceptions.
+    Article rows come back as mappings keyed by column name.
+    """
+
+    # --- Connections and schema ---
+
+    @abstractmethod
+    def connection(self):
+        """Context manager yielding a DB-API connection for one unit of work."""
+
+    @abstractmethod
+    def close_conn(self):
+        """Release the calling thread's connection, if it holds one."""
+
+    @abstractmethod
+    def close(self):
+        """Release every connection held by this repository."""
+
+    @abstractmethod
+    def create_tables(self):
+        """Create or migrate the schema, including triggers, indexes and rollups."""
+
+    # --- Articles through the pipeline ---
+
+    @abstractmethod
+    def add_article(self, article_data):
+        """Insert a fetched article; returns False if its URL is already stored."""
+
+    @abstractmethod
+    def get_articles_by_status(self, status, category, date_str):
+        """All articles with ``status`` for one category and date."""
+
+    @abstractmethod
+    def iter_articles_by_status(self, status, category, date_str, batch_size=100):
+        """Stream articles with ``status`` as dicts in id order, one batch at a time."""
+
+    @abstractmethod
+    def get_article_ids_by_status(self, status, category, date_str):
+        """Ids of the articles with ``status``, in id order."""
+
+    @abstractmethod
+    def get_article_by_id(self, article_id):
+        """One article as a dict, or None."""
+
+    @abstractmethod
+    def update_article_score_and_reason(self, article_id, score, reason, fingerprint=None, model=None, screening_score=None):
+        """Store a rating, with the fingerprint of its inputs, and move the article to 'rated'.
+
+        ``model`` is the model that gave ``score``. When a rating cascade
+        escalated the article, ``screening_score`` is the first model's score.
+        """
+
+    @abstractmethod
+    def select_top_articles_for_summary(self, category, date_str, limit, min_score):
+        """Move the best ``limit`` rated articles scoring at least ``min_score`` to 'selected_for_summary'."""
+
+    @abstractmethod
+    def get_selection_scores(self, category, date_str):
+        """(id, score) of every rated article still competing for the day's top articles."""
+
+    @abstractmethod
+    def mark_selected_for_summary(self, article_ids):
+        """Move rated articles to 'selected_for_summary'; returns the ids updated."""
+
+    @abstractmethod
+    def update_article_summary(self, article_id, chinese_title, english_summary, chinese_summary, fingerprint=None):
+        """Store the summaries, with the fingerprint of their inputs, and move the article to 'summarized'."""
+
+    @abstractmethod
+    def update_article_content(self, url, content):
+        """Replace an article's extracted content, found by URL; returns True if it changed."""
+
+    @abstractmethod
+    def update_article_thumbnail(self, article_id, thumbnail_path):
+        """Store the rendered thumbnail and move the article to 'complete'."""
+
+    @abstractmethod
+    def invalidate_stale_ratings(self, category, date_str, rating_key):
+        """Return articles rated with other inputs to 'fetched' and redo the selection; returns how many."""
+
+    @abstractmethod
+    def invalidate_stale_summaries(self, category, date_str, summary_key):
+        """Return articles summarized with other inputs to 'selected_for_summary'; returns how many."""
+
+    @abstractmethod
+    def finalize_stuck_articles(self, category, date_str):
+        """Fail unleased articles of ``category`` left in 'fetched' or 'rated' before ``date_str``."""
+
+    @abstractmethod
+    def force_finalize_all_articles(self):
+        """Fail every unleased article stuck before summarization; returns how many."""
+
+    # --- Leases shared by concurrent workers ---
+
+    @abstractmethod
+    def claim_articles(self, status, category, date_str, worker_id, limit=10, lease_seconds=300, after_id=0):
+        """Atomically lease up to ``limit`` free articles to ``worker_id``; returns them as dicts."""
+
+    @abstractmethod
+    def claim_article(self, article_id, status, worker_id, lease_seconds=300):
+        """Lease one article if it still has ``status`` and is free; returns it or None."""
+
+    @abstractmethod
+    def iter_claimed_articles(self, status, category, date_str, worker_id, batch_size=10, lease_seconds=300):
+        """Claim and yield articles batch by batch until none are left."""
+
+    @abstractmethod
+    def renew_leases(self, worker_id, lease_seconds=300):
+        """Extend ``worker_id``'s unexpired leases; returns how many."""
+
+    @abstractmethod
+    def release_leases(self, worker_id, article_ids=None):
+        """Drop ``worker_id``'s leases, all or only on ``article_ids``; returns how many."""
+
+    @abstractmethod
+    def get_leased_article_ids(self, status, category, date_str):
+        """Ids of articles with ``status`` under an unexpired lease."""
+
+    # --- Reading summarized articles ---
+
+    @abstractmethod
+    def iter_summarized_articles(self, date_str=None, category_filter=None, fields=None, after=None, limit=None):
+        """Stream summarized articles newest first, optionally projected and keyset-paginated."""
+
+    @abstractmethod
+    def get_summarized_articles_page(self, date_str=None, category_filter=None, fields=None, after=None, limit=50):
+        """One page of summarized articles and the key to continue after, if any."""
+
+    @abstractmethod
+    def get_summarized_articles_for_date(self, date_str=None, category_filter=None, fields=None):
+        """Summarized articles grouped as {fetch_date: {category: [articles]}}."""
+
+    @abstractmethod
+    def get_summarized_articles_for_category_and_date(self, category, date_str):
+        """Summarized articles of one category and date, best score first."""
+
+    @abstractmethod
+    def search_articles(self, query, limit=20, category_filter=None):
+        """Full-text search over summarized articles, best matches first, with highlighted snippets."""
+
+    @abstractmethod
+    def get_available_dates(self):
+        """Dates that have summarized articles, newest first."""
+
+    @abstractmethod
+    def get_all_categories(self):
+        """Every category with stored articles, alphabetically."""
+
+    # --- Cache invalidation ---
+
+    @abstractmethod
+    def get_generation(self, counter='generation'):
+        """Counter that changes whenever articles are written, or None on error.
+
+        ``counter='metrics_generation'`` selects the counter for LLM usage and pipeline runs.
+        """
+
+    @abstractmethod
+    def bump_generation(self):
+        """Invalidate read caches after a write the article triggers do not cover."""
+
+    # --- Statistics and metrics ---
+
+    @abstractmethod
+    def get_stats(self):
+        """Dashboard statistics from the daily rollups."""
+
+    @abstractmethod
+    def rebuild_stats(self):
+        """Recompute the daily rollups from the articles table."""
+
+    @abstractmethod
+    def record_llm_usage(self, model, prompt_tokens, completion_tokens, cost=0.0, day=None):
+        """Add one API call to the daily LLM usage rollup."""
+
+    @abstractmethod
+    def record_pipeline_run(self, command, category, target_date, status, snapshot):
+        """Store one run's StatsManager snapshot; returns the run id."""
+
+    @abstractmethod
+    def get_stage_duration_history(self, limit=30):
+        """Per-block total time for the latest ``limit`` runs, oldest first."""
+
+    @abstractmethod
+    def get_pipeline_metrics_summary(self):
+        """Run counts, summed counters and latest timings for the /metrics endpoint."""
+
+    # --- Fetching ---
+
+    @abstractmethod
+    def get_fetch_tiers(self, max_age=None):
+        """{domain: 'http' or 'browser'} as learned by the fetcher, optionally only entries newer than ``max_age`` seconds."""
+
+    @abstractmethod
+    def set_fetch_tier(self, domain, tier):
+        """Remember which fetch tier works for ``domain``."""
+
+    # --- Render jobs ---
+
+    @abstractmethod
+    def enqueue_render_job(self, article_id, cache_key, image_relpath):
+        """Queue a render job; returns the id of the live job for ``cache_key``."""
+
+    @abstractmethod
+    def claim_next_render_job(self, stale_after=600):
+        """Claim the oldest queued job, or one abandoned for ``stale_after`` seconds."""
+
+    @abstractmethod
+    def finish_render_job(self, job_id, error=None):
+        """Mark a job done, or failed with ``error``."""
+
+    @abstractmethod
+    def get_render_job(self, job_id):
+        """One render job as a dict, or None."""
+
+    @abstractmethod
+    def get_render_queue_metrics(self, window_seconds=3600):
+        """Queue depth and recent wait and run latencies."""
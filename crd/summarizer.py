@@ -1,18 +1,37 @@
+import os
 import logging
+from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor
+from .utils.streaming import bounded_map
+from .utils.leases import LeaseKeeper, make_worker_id, DEFAULT_LEASE_SECONDS
+from .utils.fingerprints import fingerprint, stage_fingerprint
 import pangu
 
 logger = logging.getLogger(__name__)
 
+TITLE_PROMPT = "You are a translator. Translate the given title to Chinese (zh-CN). Output only the translated title without any additional text."
+TITLE_REQUEST = "Translate this title to Chinese:\n\n{title}"
+ZH_SUMMARY_PROMPT = "You are an AI assistant that summarizes articles in Chinese (zh-CN). Provide a concise summary in about 3-5 sentences in Chinese."
+ZH_SUMMARY_REQUEST = "Summarize the following article in Chinese (zh-CN),Do not output anything that is irrelevant to the article.:\n\nTitle: {title}\n\nContent:\n{content}"
+EN_SUMMARY_PROMPT = "You are an AI assistant that summarizes articles. Provide a concise summary in about 3-5 sentences."
+EN_SUMMARY_REQUEST = "Summarize the following article:\n\nTitle: {title}\n\nContent:\n{content}"
+
+# Every prompt a summary depends on; editing any of them makes stored summaries stale.
+SUMMARY_PROMPTS = (TITLE_PROMPT, TITLE_REQUEST, ZH_SUMMARY_PROMPT, ZH_SUMMARY_REQUEST, EN_SUMMARY_PROMPT, EN_SUMMARY_REQUEST)
+
 class ArticleSummarizer:
     """Summarizes articles using an AI API and updates the database."""
     
-    def __init__(self, db_manager, api_client, stats_manager=None, model="gpt-4o", max_workers=10):
+    def __init__(self, db_manager, api_client, stats_manager=None, model="gpt-4o", max_workers=10, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS):
         self.db_manager = db_manager
         self.api_client = api_client
         self.model = model
         self.max_workers = max_workers
         self.stats_manager = stats_manager
+        # Identifies this process's leases when several workers summarize the same category.
+        self.worker_id = worker_id or make_worker_id()
+        self.lease_seconds = lease_seconds
+        self.summary_key = fingerprint(self.model, *SUMMARY_PROMPTS)
     
     def get_chinese_title_and_summary(self, title, content, url):
         """Get Chinese title and summary for an article"""
@@ -20,8 +39,8 @@ class ArticleSummarizer:
         title_payload = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "You are a translator. Translate the given title to Chinese (zh-CN). Output only the translated title without any additional text."},
-                {"role": "user", "content": f"Translate this title to Chinese:\n\n{title}"}
+                {"role": "system", "content": TITLE_PROMPT},
+                {"role": "user", "content": TITLE_REQUEST.format(title=title)}
             ]
         }
         
@@ -29,8 +48,8 @@ class ArticleSummarizer:
         content_payload = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "You are an AI assistant that summarizes articles in Chinese (zh-CN). Provide a concise summary in about 3-5 sentences in Chinese."},
-                {"role": "user", "content": f"Summarize the following article in Chinese (zh-CN),Do not output anything that is irrelevant to the article.:\n\nTitle: {title}\n\nContent:\n{content}"}
+                {"role": "system", "content": ZH_SUMMARY_PROMPT},
+                {"role": "user", "content": ZH_SUMMARY_REQUEST.format(title=title, content=content)}
             ]
         }
         
@@ -60,8 +79,8 @@ class ArticleSummarizer:
         content_payload = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "You are an AI assistant that summarizes articles. Provide a concise summary in about 3-5 sentences."},
-                {"role": "user", "content": f"Summarize the following article:\n\nTitle: {title}\n\nContent:\n{content}"}
+                {"role": "system", "content": EN_SUMMARY_PROMPT},
+                {"role": "user", "content": EN_SUMMARY_REQUEST.format(title=title, content=content)}
             ]
         }
 
@@ -88,17 +107,29 @@ class ArticleSummarizer:
                 logger.warning(f"Article {title} (ID: {article_id}) has no content to summarize, skipping.")
                 return
 
+            summary_fingerprint = stage_fingerprint(self.summary_key, article.get('content_hash'))
+            if article.get('summary_fingerprint') == summary_fingerprint:
+                # Selected again after a re-rating, with the same content and prompts: keep the summary.
+                self.db_manager.update_article_summary(article_id, article['chinese_title'], article['english_summary'],
+                                                       article['chinese_summary'], summary_fingerprint)
+                if self.stats_manager: self.stats_manager.increment('summaries_reused')
+                logger.info(f"Reused the existing summary of article ID {article_id}: {title}")
+                return
+
             logger.info(f"Summarizing article ID {article_id}: {title}")
             
-            chinese_title, chinese_summary = self.get_chinese_title_and_summary(title, content, url)
-            english_summary = self.get_english_summary(title, content)
+            with self.stats_manager.span('article', article_id=article_id) if self.stats_manager else open(os.devnull, 'w'):
+                with self.stats_manager.span('summarize') if self.stats_manager else open(os.devnull, 'w'):
+                    chinese_title, chinese_summary = self.get_chinese_title_and_summary(title, content, url)
+                    english_summary = self.get_english_summary(title, content)
 
             if chinese_title or chinese_summary or english_summary:
                 self.db_manager.update_article_summary(
                     article_id,
                     chinese_title,
                     english_summary,
-                    chinese_summary
+                    chinese_summary,
+                    summary_fingerprint
                 )
                 if self.stats_manager: self.stats_manager.increment('articles_summarized_in_db')
                 logger.info(f"Successfully summarized (possibly partially) and saved to DB: {title}")
@@ -107,20 +138,45 @@ class ArticleSummarizer:
         except Exception as e:
             logger.error(f"An unexpected error occurred while summarizing article ID {article.get('id')}: {e}", exc_info=True)
 
+    @contextmanager
+    def early_summaries(self):
+        """Summarize articles in the background as they are selected.
+
+        Yields an ``enqueue(article_ids)`` callable, suitable as the analyzer's
+        ``on_selected`` hook; leaving the block waits for queued summaries.
+        """
+        with LeaseKeeper(self.db_manager, self.worker_id, self.lease_seconds):
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                def enqueue(article_ids):
+                    for article_id in article_ids:
+                        executor.submit(self._summarize_by_id, article_id)
+                yield enqueue
+
+    def _summarize_by_id(self, article_id):
+        # Another worker may already be summarizing it.
+        article = self.db_manager.claim_article(article_id, 'selected_for_summary', self.worker_id, self.lease_seconds)
+        if article:
+            self.summarize_article(article)
+
     def process(self, category, date_str):
         """
         Fetches articles marked for summarization from the DB, summarizes them,
-        and updates the results back to the DB.
+        and updates the results back to the DB. Summaries made with a different
+        model, prompt or article content are redone first.
         """
-        articles_to_summarize = self.db_manager.get_articles_by_status('selected_for_summary', category, date_str)
-        
-        if not articles_to_summarize:
+        stale = self.db_manager.invalidate_stale_summaries(category, date_str, self.summary_key)
+        if stale:
+            logger.info(f"Re-summarizing {stale} articles whose summary inputs changed for '{category}' on {date_str}.")
+            if self.stats_manager:
+                self.stats_manager.increment('summaries_invalidated', stale)
+        with LeaseKeeper(self.db_manager, self.worker_id, self.lease_seconds):
+            articles_to_summarize = self.db_manager.iter_claimed_articles(
+                'selected_for_summary', category, date_str, self.worker_id, self.max_workers, self.lease_seconds
+            )
+            summarized = sum(1 for _ in bounded_map(self.summarize_article, articles_to_summarize, self.max_workers))
+
+        if not summarized:
             logger.info(f"No articles to summarize for category '{category}' on {date_str}.")
             return
 
-        logger.info(f"Found {len(articles_to_summarize)} articles to summarize for '{category}' on {date_str}.")
-
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            list(executor.map(self.summarize_article, articles_to_summarize))
-        
-        logger.info(f"Finished summarizing articles for '{category}' on {date_str}.")
\ No newline at end of file
+        logger.info(f"Finished summarizing {summarized} articles for '{category}' on {date_str}.")
\ No newline at end of file
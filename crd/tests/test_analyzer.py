@@ -0,0 +1,228 @@
+import unittest
+import os
+import re
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import MagicMock, call
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+from crd.analyzer import ArticleAnalyzer, parse_json_reply, parse_rating_reply
+
+DATE = '2024-05-01'
+
+def reply(content):
+    return {'choices': [{'message': {'content': content}}]}
+
+class TestListwiseRating(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        criteria_path = os.path.join(self.test_dir, 'criteria.json')
+        with open(criteria_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': {'Relevance': 10}}, f)
+        self.scores = [9, 4, 7, 8, 2]
+        for i, score in enumerate(self.scores):
+            self.db.add_article({'link': f'http://example.com/{i}', 'title': f'A{i}', 'date': DATE,
+                                 'fetch_date': DATE, 'category': 'Test', 'content': f'body {"x" * 50} score {score}'})
+        self.api_client = MagicMock()
+        self.api_client.request.side_effect = self.answer
+        self.batch_replies = []
+        self.analyzer = ArticleAnalyzer(self.db, self.api_client, criteria_path, top_articles=2,
+                                        min_score_map={'Test': 5}, max_workers=1, batch_size=5, excerpt_chars=40)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def answer(self, payload):
+        prompt = payload['messages'][1]['content']
+        if 'several articles' not in payload['messages'][0]['content']:
+            return reply(f"Fine. Rating: {prompt.split()[-1]}/10")
+        ids = [int(i) for i in re.findall(r'^Article (\d+):', prompt, re.MULTILINE)]
+        if self.batch_replies:
+            return reply(self.batch_replies.pop(0)(ids))
+        return reply(json.dumps({'ratings': [{'id': i, 'relevant': True, 'reason': 'ok', 'score': self.scores[i - 1]}
+                                             for i in ids]}))
+
+    def rated_scores(self):
+        return {a['id']: a['score'] for a in self.db.get_articles_by_status('rated', 'Test', DATE)} | \
+               {a['id']: a['score'] for a in self.db.get_articles_by_status('selected_for_summary', 'Test', DATE)}
+
+    def test_one_request_rates_the_whole_batch(self):
+        self.assertEqual(sorted(self.analyzer.process('Test', DATE)), [1, 4])
+        self.assertEqual(self.api_client.request.call_count, 1)
+        self.assertEqual(self.rated_scores(), {i + 1: score for i, score in enumerate(self.scores)})
+        # Articles are sent as truncated excerpts.
+        prompt = self.api_client.request.call_args[0][0]['messages'][1]['content']
+        self.assertNotIn('score 9', prompt)
+
+    def test_missing_and_invalid_entries_are_retried_individually(self):
+        self.batch_replies.append(lambda ids: '```json\n' + json.dumps({'ratings': [
+            {'id': 1, 'score': 9, 'reason': 'ok'}, {'id': 2, 'score': 'high'}, {'id': 3, 'score': 7, 'reason': 'ok'},
+            {'id': 4, 'score': 8, 'reason': 'ok'}, {'id': 99, 'score': 10}]}) + '\n```')
+        self.analyzer.process('Test', DATE)
+        # One batch request, then articles 2 (bad score) and 5 (left out) one by one.
+        self.assertEqual(self.api_client.request.call_count, 3)
+        self.assertEqual(self.rated_scores(), {i + 1: score for i, score in enumerate(self.scores)})
+
+    def test_malformed_reply_falls_back_to_single_ratings(self):
+        self.batch_replies.append(lambda ids: 'Sorry, I cannot produce JSON today.')
+        self.analyzer.process('Test', DATE)
+        self.assertEqual(self.api_client.request.call_count, 1 + len(self.scores))
+        self.assertEqual(len(self.rated_scores()), len(self.scores))
+
+    def test_irrelevant_articles_are_not_rated(self):
+        self.batch_replies.append(lambda ids: json.dumps({'ratings': [
+            {'id': i, 'relevant': i != 3, 'score': self.scores[i - 1], 'reason': 'ok'} for i in ids]}))
+        self.analyzer.process('Test', DATE)
+        self.assertEqual(self.api_client.request.call_count, 1)
+        self.assertNotIn(3, self.rated_scores())
+        self.assertEqual(self.db.get_article_ids_by_status('fetched', 'Test', DATE), [3])
+
+    def test_listwise_mode_has_its_own_rating_key(self):
+        pointwise = ArticleAnalyzer(self.db, self.api_client, self.analyzer.criteria_path)
+        pointwise.model = self.analyzer.model
+        self.assertNotEqual(pointwise.rating_key('Test'), self.analyzer.rating_key('Test'))
+
+    def test_parse_json_reply(self):
+        self.assertEqual(parse_json_reply('Here you go: {"ratings": []} Enjoy!'), {'ratings': []})
+        with self.assertRaises(ValueError):
+            parse_json_reply('no json')
+
+class TestRatingCascade(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        criteria_path = os.path.join(self.test_dir, 'criteria.json')
+        with open(criteria_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': {'Relevance': 10}}, f)
+        # Cheap scores; the strong model adds one point to every article it sees.
+        for i, score in enumerate([9, 6, 2, 7, 5]):
+            self.db.add_article({'link': f'http://example.com/{i}', 'title': f'A{i}', 'date': DATE,
+                                 'fetch_date': DATE, 'category': 'Test', 'content': f'score {score}'})
+        self.api_client = MagicMock()
+        self.api_client.request.side_effect = self.answer
+        self.stats = MagicMock()
+        self.analyzer = ArticleAnalyzer(self.db, self.api_client, criteria_path, stats_manager=self.stats, top_articles=10,
+                                        min_score_map={'Test': 6}, max_workers=1, model='cheap', escalation_model='strong',
+                                        escalation_band=1, cost_fn=lambda model, prompt, completion: (prompt + completion) / 1000)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def answer(self, payload):
+        score = int(payload['messages'][1]['content'].split()[-1])
+        if payload['model'] == 'strong':
+            return dict(reply(f"Closer look. Rating: {score + 1}/10"), usage={'prompt_tokens': 100, 'completion_tokens': 20})
+        return reply(f"Fine. Rating: {score}/10")
+
+    def test_only_articles_near_the_threshold_are_escalated(self):
+        selected = self.analyzer.process('Test', DATE)
+        models = [call[0][0]['model'] for call in self.api_client.request.call_args_list]
+        # Scores 6, 7 and 5 are within one point of the minimum score of 6; 9 and 2 are not.
+        self.assertEqual((models.count('cheap'), models.count('strong')), (5, 3))
+        articles = {a['id']: a for a in self.db.get_articles_by_status('selected_for_summary', 'Test', DATE)}
+        self.assertEqual(sorted(selected), [1, 2, 4, 5])
+        self.assertEqual((articles[1]['score'], articles[1]['rating_model'], articles[1]['screening_score']), (9, 'cheap', None))
+        self.assertEqual((articles[5]['score'], articles[5]['rating_model'], articles[5]['screening_score']), (6, 'strong', 5))
+        self.stats.increment.assert_any_call('ratings_escalated')
+        self.stats.increment.assert_any_call('escalation_cost_micro_usd', 120000)
+
+    def test_band_follows_the_current_cut_line(self):
+        # With the top-N cut line at 8, only scores from 7 to 9 are escalated.
+        for article in self.db.get_articles_by_status('fetched', 'Test', DATE):
+            self.analyzer.rate_single_article(dict(article), threshold=lambda: 8)
+        models = [call[0][0]['model'] for call in self.api_client.request.call_args_list]
+        self.assertEqual(models, ['cheap', 'strong', 'cheap', 'cheap', 'cheap', 'strong', 'cheap'])
+
+    def test_failed_escalation_keeps_the_first_score(self):
+        self.api_client.request.side_effect = lambda payload: (reply('I cannot tell.') if payload['model'] == 'strong'
+                                                               else self.answer(payload))
+        self.analyzer.process('Test', DATE)
+        article = self.db.get_article_by_id(2)
+        self.assertEqual((article['score'], article['rating_model']), (6, 'cheap'))
+        self.stats.increment.assert_any_call('ratings_escalation_failed')
+
+    def test_escalated_irrelevant_verdict_drops_the_article(self):
+        self.api_client.request.side_effect = lambda payload: (reply('{"relevant": false}') if payload['model'] == 'strong'
+                                                               else self.answer(payload))
+        self.assertEqual(self.analyzer.process('Test', DATE), [1])
+        article = self.db.get_article_by_id(2)
+        self.assertEqual((article['status'], article['score'], article['rating_model'], article['screening_score']),
+                         ('rated', None, 'strong', 6))
+        self.stats.increment.assert_any_call('ratings_escalated_irrelevant')
+        self.assertNotIn(call('ratings_escalation_failed'), self.stats.increment.call_args_list)
+
+class TestStructuredRating(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        criteria_path = os.path.join(self.test_dir, 'criteria.json')
+        with open(criteria_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': {'Relevance': 10}}, f)
+        self.api_client = MagicMock()
+        self.stats = MagicMock()
+        self.analyzer = ArticleAnalyzer(MagicMock(), self.api_client, criteria_path, stats_manager=self.stats, max_tokens=60)
+
+    def test_json_reply_within_a_token_budget(self):
+        self.api_client.request.return_value = reply('{"relevant": true, "score": 8, "reason": "On topic."}')
+        self.assertEqual(self.analyzer.get_article_rating('text', 'Test'), (8.0, 'On topic.'))
+        payload = self.api_client.request.call_args[0][0]
+        self.assertEqual((payload['max_tokens'], payload['response_format']), (60, {'type': 'json_object'}))
+
+    def test_unparseable_reply_gets_one_repair_request(self):
+        self.api_client.request.side_effect = [reply('I would say it is quite good.'),
+                                               reply('{"relevant": true, "score": "7/10", "reason": "Fine."}')]
+        self.assertEqual(self.analyzer.get_article_rating('text', 'Test'), (7.0, 'Fine.'))
+        repair = self.api_client.request.call_args[0][0]['messages']
+        self.assertEqual(repair[2], {'role': 'assistant', 'content': 'I would say it is quite good.'})
+        self.assertIn('not a JSON object', repair[3]['content'])
+        self.stats.increment.assert_any_call('ratings_repaired')
+
+    def test_failed_repair_and_errors_return_no_rating(self):
+        self.api_client.request.side_effect = [reply('{"score": 42}'), reply('{"score": 42}')]
+        self.assertEqual(self.analyzer.get_article_rating('text', 'Test'), (None, None))
+        self.assertEqual(self.api_client.request.call_count, 2)
+        self.stats.increment.assert_any_call('articles_rated_failed_format')
+        self.api_client.request.side_effect = RuntimeError('API down')
+        self.assertEqual(self.analyzer.rate_single_article({'id': 1, 'title': 'A', 'category': 'Test', 'content': 'text'}),
+                         (1, None, None))
+
+    def test_streamed_reply_stops_when_the_object_is_complete(self):
+        pulled = []
+
+        def pieces(payload):
+            for piece in ['{"relevant": true, ', '"score": 9, "reason": "Big ', 'news."}', ' Let me also explain...']:
+                pulled.append(piece)
+                yield piece
+
+        self.api_client.stream.side_effect = pieces
+        self.analyzer.stream = True
+        self.assertEqual(self.analyzer.get_article_rating('text', 'Test'), (9.0, 'Big news.'))
+        self.assertEqual(len(pulled), 3)
+        self.api_client.request.assert_not_called()
+        self.stats.increment.assert_any_call('ratings_streamed_unmetered')
+
+    def test_parse_rating_reply(self):
+        self.assertEqual(parse_rating_reply('```json\n{"relevant": false}\n```'), (None, None))
+        self.assertEqual(parse_rating_reply('Not relevant.'), (None, None))
+        self.assertEqual(parse_rating_reply('Solid work. Rating: 6.5/10'), (6.5, 'Solid work.'))
+        for bad in ('{"relevant": true}', '{"score": 0}', '{"score": "high"}', '[7]', 'Rating: 11/10'):
+            with self.assertRaises(ValueError):
+                parse_rating_reply(bad)
+
+if __name__ == '__main__':
+    unittest.main()
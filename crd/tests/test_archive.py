@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import gzip
+import shutil
+import tempfile
+from datetime import date
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.archive import PageArchive, decode_body
+from crd.database import DatabaseManager
+from crd.fetcher import ArticleFetcher, reextract_archive
+
+PAGE = '<html><body><nav>Menu</nav><article>Café opens downtown</article></body></html>'.encode('utf-8')
+
+class TestPageArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.archive = PageArchive(self.test_dir)
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.addCleanup(self.archive.close)
+
+    def test_records_round_trip(self):
+        location = self.archive.write('http://a.example/1', 200, {'Content-Type': 'text/html; charset=utf-8',
+                                                                  'Content-Encoding': 'gzip'}, PAGE, '2024-05-01')
+        response = self.archive.read(location)
+        self.assertEqual((response.url, response.status, response.body), ('http://a.example/1', 200, PAGE))
+        # The body is stored decoded, so transfer headers are replaced by its real length.
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.headers['Content-Length'], str(len(PAGE)))
+        self.assertIn('Café', decode_body(response))
+
+    def test_segments_are_standard_multi_member_gzip(self):
+        location = self.archive.write('http://a.example/1', 200, {}, PAGE, '2024-05-01')
+        self.archive.write('http://a.example/2', 200, {}, PAGE, '2024-05-01')
+        self.archive.close()
+        with gzip.open(location.path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data.count(b'WARC/1.0\r\nWARC-Type: response'), 2)
+
+    def test_latest_record_per_url_and_date_filter(self):
+        self.archive.write('http://a.example/1', 200, {}, b'old', '2024-05-01')
+        self.archive.write('http://a.example/1', 200, {}, b'new', '2024-05-01')
+        self.archive.write('http://a.example/2', 200, {}, b'other day', '2024-05-02')
+        locations = self.archive.locations('2024-05-01')
+        self.assertEqual([location.url for location in locations], ['http://a.example/1'])
+        self.assertEqual(self.archive.read(locations[0]).body, b'new')
+        self.assertEqual(len(self.archive.locations()), 2)
+
+    def test_segments_roll_over_at_size_limit(self):
+        archive = PageArchive(self.test_dir, segment_max_bytes=1)
+        self.addCleanup(archive.close)
+        paths = {archive.write(f'http://a.example/{i}', 200, {}, PAGE, '2024-05-01').path for i in range(3)}
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(len(archive.locations('2024-05-01')), 3)
+
+class TestReextract(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir)
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'crd.db'))
+        self.db.create_tables()
+        self.addCleanup(self.db.close)
+        self.archive = PageArchive(os.path.join(self.test_dir, 'archive'))
+
+    def test_fetched_pages_are_archived_and_reextracted_offline(self):
+        http_client = MagicMock()
+        http_client.get.return_value.status_code = 200
+        http_client.get.return_value.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        http_client.get.return_value.content = PAGE
+        http_client.get.return_value.text = PAGE.decode('utf-8')
+        fetcher = ArticleFetcher(self.db, 'missing-feeds.json', http_client=http_client,
+                                 target_date=date(2024, 5, 1), archive=self.archive)
+        self.assertEqual(fetcher.fetch_html_content('http://a.example/1'), PAGE.decode('utf-8'))
+        self.archive.close()
+
+        self.db.add_article({'link': 'http://a.example/1', 'title': 'Cafe', 'date': '2024-05-01',
+                             'fetch_date': '2024-05-01', 'category': 'Local', 'content': 'stale extraction'})
+        self.assertEqual(reextract_archive(self.archive, self.db, '2024-05-01', max_workers=1), 1)
+        [article] = self.db.get_articles_by_status('fetched', 'Local', '2024-05-01')
+        self.assertEqual(article['content'], 'Café opens downtown')
+        # Unchanged content is not written again.
+        self.assertEqual(reextract_archive(self.archive, self.db, max_workers=1), 0)
+
+    def test_only_pages_kept_from_the_http_tier_are_archived(self):
+        shell = b'<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+        long_page = b'<html><body><article>' + b'Server-rendered text. ' * 30 + b'</article></body></html>'
+        http_client = MagicMock()
+        http_client.get.side_effect = lambda url, **kwargs: MagicMock(
+            status_code=200, headers={}, content=shell if 'spa' in url else long_page,
+            text=(shell if 'spa' in url else long_page).decode('utf-8'))
+        fetcher = ArticleFetcher(self.db, 'missing-feeds.json', http_client=http_client,
+                                 target_date=date(2024, 5, 1), archive=self.archive)
+        browser_text = 'Text rendered by JavaScript. ' * 30
+        with patch.object(fetcher, 'fetch_text_with_playwright', return_value=browser_text):
+            # The HTTP probe of the app shell escalates to the browser, so there is nothing to re-extract.
+            self.assertEqual(fetcher.fetch_page_content('http://spa.example/1'), browser_text)
+            self.assertIn('Server-rendered', fetcher.fetch_page_content('http://news.example/1'))
+        self.archive.close()
+        self.assertEqual([location.url for location in self.archive.locations()], ['http://news.example/1'])
+
+        self.db.add_article({'link': 'http://spa.example/1', 'title': 'App', 'date': '2024-05-01',
+                             'fetch_date': '2024-05-01', 'category': 'Local', 'content': browser_text})
+        reextract_archive(self.archive, self.db, max_workers=1)
+        [article] = self.db.get_articles_by_status('fetched', 'Local', '2024-05-01')
+        self.assertEqual(article['content'], browser_text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import os
+import sys
+import json
+from datetime import date
+
+import feedparser
+import requests
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.bench import FakeServer, BenchmarkRunner, compare_reports
+from crd.utils.api_client import APIClient
+
+class TestFakeServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(date(2024, 5, 1), feeds=2, articles_per_feed=3, article_kb=4, llm_latency=0).start()
+        self.addCleanup(self.server.stop)
+
+    def test_feed_lists_articles_of_the_target_date(self):
+        feed = feedparser.parse(requests.get(self.server.feed_urls()[0], timeout=5).content)
+        self.assertEqual(len(feed.entries), 3)
+        self.assertEqual(tuple(feed.entries[0].published_parsed[:3]), (2024, 5, 1))
+        page = requests.get(feed.entries[0].link, timeout=5)
+        self.assertGreater(len(page.text), 4000)
+        self.assertIn('<article>', page.text)
+
+    def test_llm_answers_in_the_rating_format(self):
+        payload = {'model': 'm', 'messages': [{'role': 'system', 'content': 'You are an AI assistant that rates articles'},
+                                              {'role': 'user', 'content': 'text'}]}
+        result = requests.post(self.server.api_url, json=payload, timeout=5).json()
+        self.assertRegex(result['choices'][0]['message']['content'], r'Rating: \d+/10')
+        self.assertIn('prompt_tokens', result['usage'])
+
+    def test_llm_streams_json_ratings(self):
+        payload = {'model': 'm', 'messages': [{'role': 'system', 'content': 'You are an AI assistant that rates articles. Reply with JSON.'},
+                                              {'role': 'user', 'content': 'text'}]}
+        usage = []
+        client = APIClient(self.server.api_url, 'bench', usage_callback=lambda model, u: usage.append(model))
+        reply = json.loads(''.join(client.stream(payload)))
+        self.assertTrue(1 <= reply['score'] <= 10)
+        self.assertEqual(usage, ['m'])
+
+    def test_streams_closed_early_report_estimated_usage(self):
+        payload = {'model': 'm', 'messages': [{'role': 'system', 'content': 'You are an AI assistant that rates articles. Reply with JSON.'},
+                                              {'role': 'user', 'content': 'text ' * 100}]}
+        usage = []
+        client = APIClient(self.server.api_url, 'bench', usage_callback=lambda model, u: usage.append((model, u)))
+        pieces = client.stream(payload)
+        next(pieces)
+        pieces.close()
+        [(model, estimate)] = usage
+        self.assertEqual(model, 'm')
+        self.assertTrue(estimate['estimated'])
+        self.assertGreater(estimate['prompt_tokens'], 100)
+        self.assertGreater(estimate['completion_tokens'], 0)
+
+    def test_rate_limited_calls_return_429(self):
+        self.server.rate_429 = 1.0
+        response = requests.post(self.server.api_url, json={'messages': []}, timeout=5)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.server.request_counts['llm_429'], 1)
+
+class TestBenchmarkRunner(unittest.TestCase):
+
+    def test_run_reports_every_stage(self):
+        report = BenchmarkRunner(feeds=2, articles_per_feed=4, article_kb=2, llm_latency=0,
+                                 max_workers=4, top_articles=3, skip_render=True).run()
+        self.assertEqual(list(report['stages']), ['fetch', 'analyze', 'summarize'])
+        self.assertEqual(report['stages']['fetch']['items'], 8)
+        self.assertEqual(report['counters']['articles_saved_to_db'], 8)
+        self.assertEqual(report['server_requests']['feed'], 2)
+
+    def test_compare_flags_slower_stages(self):
+        baseline = {'stages': {'fetch': {'seconds': 1.0}, 'analyze': {'seconds': 2.0}}}
+        current = {'stages': {'fetch': {'seconds': 1.5}, 'analyze': {'seconds': 2.1}}}
+        rows = {row['stage']: row for row in compare_reports(baseline, current, threshold=0.1)}
+        self.assertTrue(rows['fetch']['regression'])
+        self.assertAlmostEqual(rows['fetch']['change'], 0.5)
+        self.assertFalse(rows['analyze']['regression'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 import os
 from datetime import datetime, date, timedelta
 import tempfile
+import shutil
 import sys
 
 # Add project root to path to allow importing crd
@@ -289,5 +290,25 @@ class TestCli(unittest.TestCase):
         self.assertEqual(mock_analyzer.call_count, 3)
         self.assertEqual(mock_summarizer.call_count, 3)
 
+class TestBenchCommand(unittest.TestCase):
+
+    @patch('crd.cli.setup_logger')
+    @patch('crd.cli.Config')
+    @patch('crd.cli.format_report', create=True)
+    @patch('crd.cli.BenchmarkRunner', create=True)
+    @patch('crd.cli.open_database')
+    def test_bench_leaves_the_configured_database_alone(self, mock_open_database, mock_runner, mock_format_report,
+                                                        mock_config, mock_setup_logger):
+        mock_config.return_value.threads = 1
+        mock_config.return_value.top_articles = 5
+        mock_runner.return_value.run.return_value = {'stages': {}}
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        with patch('sys.argv', ['crd', '--output-dir', output_dir, '--db-path', os.path.join(output_dir, 'real.db'), 'bench']):
+            self.assertEqual(crd_main(), 0)
+        mock_runner.return_value.run.assert_called_once()
+        mock_open_database.assert_not_called()
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'real.db')))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
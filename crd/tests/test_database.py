@@ -0,0 +1,223 @@
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+
+class DatabaseTestCase(unittest.TestCase):
+    """Gives each test a fresh database in a temporary directory."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def add_article(self, url, title, content='body', date_str='2024-05-01', category='Test'):
+        self.db.add_article({
+            'link': url, 'title': title, 'date': date_str,
+            'fetch_date': date_str, 'category': category, 'content': content
+        })
+        return [a for a in self.db.get_articles_by_status('fetched', category, date_str) if a['url'] == url][0]['id']
+
+class TestSearch(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.llm_id = self.add_article('http://example.com/llm', 'Scaling laws for language models',
+                                       content='We study transformer scaling and compute budgets.')
+        self.db.update_article_summary(self.llm_id, '语言模型的扩展定律', 'Scaling laws summary.', '本文研究大型语言模型的扩展规律与计算预算。')
+        self.btc_id = self.add_article('http://example.com/btc', 'Bitcoin ETF inflows',
+                                       content='Spot bitcoin funds saw record inflows.', category='Crypto')
+        self.db.update_article_summary(self.btc_id, '比特币ETF资金流入', 'ETF summary.', '现货比特币基金出现创纪录的资金流入。')
+        # Not summarized, so never returned.
+        self.add_article('http://example.com/draft', 'Draft about language models')
+
+    def test_english_terms_are_ranked_with_snippets(self):
+        results = self.db.search_articles('language models')
+        self.assertEqual([r['id'] for r in results], [self.llm_id])
+        self.assertIn('<mark>', results[0]['snippet'])
+
+    def test_content_terms_match(self):
+        results = self.db.search_articles('record inflows')
+        self.assertEqual([r['id'] for r in results], [self.btc_id])
+
+    def test_chinese_terms_match_with_trigram_and_short_fallback(self):
+        self.assertEqual([r['id'] for r in self.db.search_articles('扩展定律')], [self.llm_id])
+        # Two-character words are below the trigram length.
+        self.assertEqual([r['id'] for r in self.db.search_articles('基金')], [self.btc_id])
+
+    def test_index_follows_updates_and_category_filter(self):
+        self.db.update_article_summary(self.btc_id, '以太坊升级', 'Ethereum summary.', '以太坊网络完成升级。')
+        self.assertEqual(self.db.search_articles('比特币ETF'), [])
+        self.assertEqual([r['id'] for r in self.db.search_articles('以太坊网络')], [self.btc_id])
+        self.assertEqual(self.db.search_articles('以太坊网络', category_filter='Test'), [])
+
+    def test_query_syntax_is_treated_as_text(self):
+        self.assertEqual(self.db.search_articles('"unbalanced AND ('), [])
+
+    def test_mixed_english_and_chinese_terms_match(self):
+        self.assertEqual([r['id'] for r in self.db.search_articles('bitcoin 基金')], [self.btc_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('scaling 扩展定律')], [self.llm_id])
+        self.assertEqual(self.db.search_articles('bitcoin 扩展定律'), [])
+
+    def test_accented_latin_terms_use_the_english_index(self):
+        cafe_id = self.add_article('http://example.com/cafe', 'Café culture in Lisbon', content='Coffee houses and pastries.')
+        self.db.update_article_summary(cafe_id, '里斯本的咖啡馆文化', 'Café summary.', '里斯本咖啡馆的历史。')
+        self.assertEqual([r['id'] for r in self.db.search_articles('café')], [cafe_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('Café culture')], [cafe_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('café 咖啡馆')], [cafe_id])
+
+    def test_like_fallback_treats_wildcards_as_text(self):
+        self.assertEqual(self.db.search_articles('基%'), [])
+        self.assertEqual(self.db.search_articles('_金'), [])
+
+    def test_short_english_terms_never_scan_with_like(self):
+        with self.db.connection() as conn:
+            queries = self.db._search_queries(conn.cursor(), ['AI', 'Go'], '1 = 1', [], 20)
+        self.assertFalse(any('LIKE' in sql for sql, _ in queries))
+
+    def test_search_without_trigram_index_falls_back_to_like(self):
+        with self.db.connection() as conn:
+            for trigger in ('ai', 'ad', 'au'):
+                conn.execute(f"DROP TRIGGER articles_fts_cjk_{trigger}")
+            conn.execute("DROP TABLE articles_fts_cjk")
+            conn.commit()
+        self.assertEqual([r['id'] for r in self.db.search_articles('language models')], [self.llm_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('扩展定律')], [self.llm_id])
+
+class TestArticleStreaming(DatabaseTestCase):
+
+    def test_batches_survive_status_updates_during_iteration(self):
+        ids = [self.add_article(f'http://example.com/{i}', f'Article {i}') for i in range(7)]
+        seen = []
+        for article in self.db.iter_articles_by_status('fetched', 'Test', '2024-05-01', batch_size=3):
+            seen.append(article['id'])
+            # Rating moves the row out of the 'fetched' status while we iterate.
+            self.db.update_article_score_and_reason(article['id'], 5.0, 'ok')
+        self.assertEqual(seen, ids)
+        self.assertEqual(list(self.db.iter_articles_by_status('fetched', 'Test', '2024-05-01')), [])
+
+class TestLeases(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.add_article(f'http://example.com/{i}', f'Article {i}') for i in range(6)]
+
+    def claim(self, worker, limit=10, lease_seconds=300):
+        return [a['id'] for a in self.db.claim_articles('fetched', 'Test', '2024-05-01', worker, limit, lease_seconds)]
+
+    def test_workers_claim_disjoint_rows(self):
+        self.assertEqual(self.claim('a', limit=4), self.ids[:4])
+        self.assertEqual(self.claim('b'), self.ids[4:])
+        self.assertEqual(self.claim('c'), [])
+
+    def test_concurrent_workers_never_share_a_row(self):
+        claimed = {}
+
+        def work(worker):
+            # A separate manager per worker, like separate processes.
+            db = DatabaseManager(self.db.db_path)
+            claimed[worker] = [a['id'] for a in db.iter_claimed_articles('fetched', 'Test', '2024-05-01', worker, batch_size=1)]
+            db.close()
+
+        threads = [threading.Thread(target=work, args=(f'w{i}',)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        all_claimed = [article_id for ids in claimed.values() for article_id in ids]
+        self.assertEqual(sorted(all_claimed), self.ids)
+
+    def test_expired_leases_are_reclaimed_and_renewal_keeps_them(self):
+        self.assertEqual(self.claim('dead', limit=1, lease_seconds=-1), [self.ids[0]])
+        # The crashed worker's row is claimed again.
+        self.assertEqual(self.claim('alive', limit=1), [self.ids[0]])
+        self.assertEqual(self.db.renew_leases('dead'), 0)
+        self.assertEqual(self.db.renew_leases('alive'), 1)
+        self.assertEqual(self.claim('b', limit=1), [self.ids[1]])
+
+    def test_status_change_and_release_end_the_lease(self):
+        self.claim('a', limit=2)
+        self.db.update_article_score_and_reason(self.ids[0], 7.0, 'ok')
+        self.assertEqual(self.db.get_leased_article_ids('fetched', 'Test', '2024-05-01'), [self.ids[1]])
+        self.assertIsNone(self.db.get_article_by_id(self.ids[0])['lease_owner'])
+        self.assertEqual(self.db.release_leases('a'), 1)
+        self.assertEqual(self.db.get_leased_article_ids('fetched', 'Test', '2024-05-01'), [])
+
+    def test_force_finalize_skips_leased_rows(self):
+        self.claim('a', limit=1)
+        self.assertEqual(self.db.force_finalize_all_articles(), 5)
+        self.assertEqual(self.db.get_article_by_id(self.ids[0])['status'], 'fetched')
+
+    def test_lease_columns_are_added_to_existing_databases(self):
+        path = os.path.join(self.test_dir, 'old.db')
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE articles (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL,
+            title TEXT NOT NULL, publication_date TEXT NOT NULL, fetch_date TEXT NOT NULL, category TEXT NOT NULL,
+            content TEXT, score REAL, status TEXT NOT NULL DEFAULT 'fetched', chinese_title TEXT, english_summary TEXT,
+            chinese_summary TEXT, thumbnail_path TEXT, rating_reason TEXT, source TEXT)""")
+        conn.close()
+        db = DatabaseManager(path)
+        db.create_tables()
+        columns = {row['name'] for row in db.get_conn().execute("PRAGMA table_info(articles)")}
+        db.close()
+        self.assertTrue({'lease_owner', 'lease_expires_at'} <= columns)
+
+class TestStatsRollups(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.add_article(f'http://example.com/{i}', f'Article {i}') for i in range(4)]
+        self.add_article('http://example.com/other', 'Other', date_str='2024-05-02', category='Crypto')
+        self.db.update_article_score_and_reason(self.ids[0], 8.0, 'good')
+        self.db.update_article_score_and_reason(self.ids[1], 6.0, 'ok')
+        self.db.update_article_score_and_reason(self.ids[2], 2.0, 'weak')
+        self.db.select_top_articles_for_summary('Test', '2024-05-01', 2, 5.0)
+        self.db.update_article_summary(self.ids[0], 't', 'e', 'c')
+        self.db.update_article_thumbnail(self.ids[0], 'thumbnails/a.jpg')
+
+    def test_rollups_track_inserts_and_status_changes(self):
+        stats = self.db.get_stats()
+        self.assertEqual(stats['articles_per_category'], {'Crypto': 1, 'Test': 4})
+        self.assertAlmostEqual(stats['avg_score_per_category']['Test'], 16.0 / 3)
+        self.assertEqual(stats['articles_per_day'], {'2024-05-02': 1, '2024-05-01': 4})
+        self.assertEqual(stats['status_breakdown']['Test'],
+                         {'complete': 1, 'fetched': 1, 'rated': 1, 'selected_for_summary': 1})
+
+    def test_funnel_counts_each_stage_reached(self):
+        funnel = {step['stage']: step for step in self.db.get_stats()['funnel']}
+        self.assertEqual([funnel[s]['count'] for s in ('fetched', 'rated', 'selected', 'summarized', 'complete')],
+                         [5, 3, 2, 1, 1])
+        self.assertAlmostEqual(funnel['selected']['conversion'], 2 / 3)
+        self.assertIsNone(funnel['fetched']['conversion'])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        before = self.db.get_stats()
+        self.db.get_conn().execute("DELETE FROM stats_daily")
+        self.assertEqual(self.db.get_stats()['articles_per_category'], {})
+        self.assertTrue(self.db.rebuild_stats())
+        self.assertEqual(self.db.get_stats(), before)
+
+    def test_llm_spend_per_day(self):
+        self.db.record_llm_usage('gpt-4o', 1000, 200, 0.01, day='2024-05-01')
+        self.db.record_llm_usage('gpt-4o-mini', 500, 50, 0.001, day='2024-05-01')
+        spend = self.db.get_stats()['llm_spend_per_day']['2024-05-01']
+        self.assertEqual(spend['calls'], 2)
+        self.assertEqual(spend['prompt_tokens'], 1500)
+        self.assertAlmostEqual(spend['cost'], 0.011)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+from crd.exporter import StaticSiteExporter
+
+class TestStaticSiteExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.test_dir, 'output')
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        self.first_id = self._add_summarized('http://example.com/a', 'A', '2024-05-01', 'AI & Tech')
+        self._add_summarized('http://example.com/b', 'B', '2024-05-02', 'Crypto')
+        self.exporter = StaticSiteExporter(self.db, self.output_dir)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def _add_summarized(self, url, title, date_str, category):
+        self.db.add_article({
+            'link': url, 'title': title, 'date': date_str,
+            'fetch_date': date_str, 'category': category, 'content': 'full body'
+        })
+        article_id = self.db.get_articles_by_status('fetched', category, date_str)[0]['id']
+        self.db.update_article_summary(article_id, title, 'summary', f'{title} 摘要')
+        return article_id
+
+    def _mtime(self, relpath):
+        return os.stat(os.path.join(self.output_dir, relpath)).st_mtime_ns
+
+    def test_export_writes_pages_json_and_compressed_variants(self):
+        result = self.exporter.export()
+
+        self.assertEqual(result['written'], 2)
+        for relpath in ('index.html', 'archive.html', '2024-05-01/index.html', '2024-05-01/ai-tech/index.html',
+                        'api/available_dates.json', 'api/articles/2024-05-02/crypto.json', 'static/style.css'):
+            self.assertTrue(os.path.exists(os.path.join(self.output_dir, relpath)), relpath)
+            self.assertTrue(os.path.exists(os.path.join(self.output_dir, relpath + '.gz')), relpath)
+
+        with gzip.open(os.path.join(self.output_dir, 'api', 'articles', '2024-05-01.json.gz')) as f:
+            data = json.load(f)
+        article = data['2024-05-01']['AI & Tech'][0]
+        self.assertEqual(article['title'], 'A')
+        self.assertNotIn('content', article)
+
+        with open(os.path.join(self.output_dir, 'index.html'), encoding='utf-8') as f:
+            self.assertIn('B 摘要', f.read())
+
+    def test_rerun_rewrites_only_changed_dates(self):
+        self.exporter.export()
+        unchanged_before = self._mtime('2024-05-02/index.html')
+        changed_before = self._mtime('2024-05-01/index.html')
+
+        self.db.update_article_summary(self.first_id, 'A', 'summary', 'A 新摘要')
+        result = self.exporter.export()
+
+        self.assertEqual(result['written'], 1)
+        self.assertEqual(result['unchanged'], 1)
+        self.assertEqual(self._mtime('2024-05-02/index.html'), unchanged_before)
+        self.assertNotEqual(self._mtime('2024-05-01/index.html'), changed_before)
+        with open(os.path.join(self.output_dir, '2024-05-01', 'index.html'), encoding='utf-8') as f:
+            self.assertIn('A 新摘要', f.read())
+
+    def test_full_export_ignores_manifest(self):
+        self.exporter.export()
+        self.assertEqual(self.exporter.export(full=True)['written'], 2)
+
+    def test_categories_with_the_same_slug_get_separate_pages(self):
+        self._add_summarized('http://example.com/c', 'C', '2024-05-01', 'AI Tech')
+        slugs = StaticSiteExporter.category_slugs(['AI & Tech', 'AI Tech', 'Crypto'])
+        self.assertEqual(len(set(slugs.values())), 3)
+        self.assertEqual(slugs['Crypto'], 'crypto')
+        self.exporter.export()
+        for name, title in (('AI & Tech', 'A'), ('AI Tech', 'C')):
+            with open(os.path.join(self.output_dir, 'api', 'articles', '2024-05-01', slugs[name] + '.json'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['2024-05-01'][name][0]['title'], title)
+
+if __name__ == '__main__':
+    unittest.main()
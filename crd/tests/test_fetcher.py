@@ -2,6 +2,9 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import sys
+import json
+import shutil
+import tempfile
 from datetime import datetime, date
 
 # Add project root to path
@@ -85,5 +88,202 @@ class TestArticleFetcher(unittest.TestCase):
             self.assertEqual(len(articles), 1)
             self.assertEqual(articles[0]['title'], 'Article 2')
 
+class TestKeywordScreening(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.feeds_path = os.path.join(self.test_dir, 'feeds.json')
+        with open(self.feeds_path, 'w', encoding='utf-8') as f:
+            json.dump({'Crypto': {'feeds': [], 'keywords': {'include': ['bitcoin', 'ether*'], 'exclude': ['sponsored']}}}, f)
+        self.http_client = MagicMock()
+        self.http_client.get.return_value.text = '<html><body><article>Body text about markets</article></body></html>'
+        self.db_manager = MagicMock()
+        self.fetcher = ArticleFetcher(self.db_manager, self.feeds_path, http_client=self.http_client,
+                                      target_date=date(2024, 5, 1))
+        # Short test pages would otherwise be retried in a real browser.
+        self.fetcher.domain_tiers = {'example.com': 'http'}
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def process(self, title, summary=''):
+        article = {'title': title, 'link': 'http://example.com/a', 'date': '2024-05-01', 'summary': summary}
+        return self.fetcher.process_single_article((article, 'Crypto'))
+
+    def test_excluded_headlines_are_never_downloaded(self):
+        self.assertFalse(self.process('Sponsored: Bitcoin giveaway'))
+        self.http_client.get.assert_not_called()
+
+    def test_headline_include_saves_article_without_body_match(self):
+        self.assertTrue(self.process('Ethereum upgrade ships'))
+        self.assertEqual(self.db_manager.add_article.call_args[0][0]['content'], 'Body text about markets')
+
+    def test_body_decides_when_headline_is_inconclusive(self):
+        self.assertFalse(self.process('Weekly market wrap', 'Prices moved.'))
+        self.http_client.get.assert_called_once()
+        self.db_manager.add_article.assert_not_called()
+
+class TestFeedContent(unittest.TestCase):
+
+    LONG_TEXT = 'Full article text from the feed. ' * 30
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.feeds_path = os.path.join(self.test_dir, 'feeds.json')
+        with open(self.feeds_path, 'w', encoding='utf-8') as f:
+            json.dump({'Papers': {'feeds': ['http://feeds.example/auto',
+                                            {'url': 'http://feeds.example/page', 'content': 'page'},
+                                            {'url': 'http://feeds.example/feed', 'content': 'feed'}]}}, f)
+        self.http_client = MagicMock()
+        self.db_manager = MagicMock()
+        self.fetcher = ArticleFetcher(self.db_manager, self.feeds_path, http_client=self.http_client,
+                                      target_date=date(2024, 5, 1))
+        # Short test pages would otherwise be retried in a real browser.
+        self.fetcher.domain_tiers = {'example.com': 'http'}
+        self.fetcher.feed_options = self.fetcher.category_feed_options(self.fetcher.feeds['Papers'])
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def process(self, feed, feed_content):
+        article = {'title': 'Paper', 'link': 'http://example.com/paper', 'date': '2024-05-01',
+                   'summary': '', 'feed_content': feed_content, 'feed': feed}
+        return self.fetcher.process_single_article((article, 'Papers'))
+
+    def saved_content(self):
+        return self.db_manager.add_article.call_args[0][0]['content']
+
+    def test_feed_text_is_extracted_from_encoded_content(self):
+        entry = {'summary': '<p>Short teaser</p>', 'content': [{'value': '<p>Full <b>body</b></p><p>More</p>'}]}
+        self.assertEqual(self.fetcher.extract_feed_content(entry), 'Full\nbody\nMore')
+        self.assertEqual(self.fetcher.extract_feed_content({'summary': '<p>Abstract</p>'}), 'Abstract')
+
+    def test_auto_uses_long_feed_content_without_fetching(self):
+        self.assertTrue(self.process('http://feeds.example/auto', self.LONG_TEXT))
+        self.http_client.get.assert_not_called()
+        self.assertEqual(self.saved_content(), self.LONG_TEXT)
+
+    def test_auto_fetches_page_for_short_feed_content(self):
+        self.http_client.get.return_value.text = '<html><body><article>Page body</article></body></html>'
+        self.assertTrue(self.process('http://feeds.example/auto', 'Teaser'))
+        self.http_client.get.assert_called_once()
+        self.assertEqual(self.saved_content(), 'Page body')
+
+    def test_page_strategy_always_fetches(self):
+        self.http_client.get.return_value.text = '<html><body><article>Page body</article></body></html>'
+        self.assertTrue(self.process('http://feeds.example/page', self.LONG_TEXT))
+        self.assertEqual(self.saved_content(), 'Page body')
+
+    def test_feed_strategy_uses_short_feed_content(self):
+        self.assertTrue(self.process('http://feeds.example/feed', 'Short abstract'))
+        self.http_client.get.assert_not_called()
+        self.assertEqual(self.saved_content(), 'Short abstract')
+
+    def test_failed_page_falls_back_to_feed_content(self):
+        self.http_client.get.side_effect = Exception('403 Forbidden')
+        self.assertTrue(self.process('http://feeds.example/auto', 'Teaser'))
+        self.assertEqual(self.saved_content(), 'Teaser')
+
+    def test_videos_use_the_transcript_over_the_feed_description(self):
+        article = {'title': 'Talk', 'link': 'https://www.youtube.com/watch?v=abcdefghijk', 'date': '2024-05-01',
+                   'summary': '', 'feed_content': self.LONG_TEXT, 'feed': 'http://feeds.example/feed'}
+        with patch.object(self.fetcher, 'fetch_youtube_subtitles', return_value='Transcript') as subtitles:
+            self.assertTrue(self.fetcher.process_single_article((article, 'Papers')))
+            subtitles.assert_called_once_with('abcdefghijk')
+            self.assertEqual(self.saved_content(), 'Transcript')
+            # Without a transcript the description is still better than nothing.
+            subtitles.return_value = None
+            self.assertTrue(self.fetcher.process_single_article((article, 'Papers')))
+            self.assertEqual(self.saved_content(), self.LONG_TEXT)
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.fetcher.category_feed_options({'feeds': [{'url': 'http://x', 'content': 'rss'}]})
+
+class TestTieredFetch(unittest.TestCase):
+
+    LONG_PAGE = '<html><body><article>' + 'Server-rendered article text. ' * 30 + '</article></body></html>'
+    SHELL_PAGE = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+    BROWSER_TEXT = 'Text rendered by JavaScript. ' * 30
+
+    def setUp(self):
+        self.db_manager = MagicMock()
+        self.http_client = MagicMock()
+        self.fetcher = ArticleFetcher(self.db_manager, 'missing-feeds.json', http_client=self.http_client)
+        self.browser = patch.object(self.fetcher, 'fetch_text_with_playwright', return_value=self.BROWSER_TEXT).start()
+        self.addCleanup(patch.stopall)
+
+    def test_http_is_tried_first_and_remembered(self):
+        self.http_client.get.return_value.text = self.LONG_PAGE
+        self.assertIn('Server-rendered', self.fetcher.fetch_page_content('https://www.news.example/a'))
+        self.browser.assert_not_called()
+        self.db_manager.set_fetch_tier.assert_called_once_with('news.example', 'http')
+
+    def test_js_shell_escalates_to_browser_and_is_remembered(self):
+        self.http_client.get.return_value.text = self.SHELL_PAGE
+        self.assertIn('JavaScript', self.fetcher.fetch_page_content('https://spa.example/a'))
+        self.db_manager.set_fetch_tier.assert_called_once_with('spa.example', 'browser')
+
+        self.http_client.get.reset_mock()
+        self.fetcher.fetch_page_content('https://spa.example/b')
+        self.http_client.get.assert_not_called()
+        self.assertEqual(self.browser.call_count, 2)
+
+    def test_short_pages_stay_on_http_when_browser_adds_nothing(self):
+        self.http_client.get.return_value.text = '<html><body><article>Brief note</article></body></html>'
+        self.browser.return_value = 'Brief note'
+        self.assertEqual(self.fetcher.fetch_page_content('https://short.example/a'), 'Brief note')
+        self.db_manager.set_fetch_tier.assert_called_once_with('short.example', 'http')
+
+    def test_failed_fetches_learn_nothing(self):
+        self.http_client.get.side_effect = Exception('timeout')
+        self.browser.return_value = None
+        self.assertIsNone(self.fetcher.fetch_page_content('https://down.example/a'))
+        self.db_manager.set_fetch_tier.assert_not_called()
+
+    def test_category_flag_forces_browser(self):
+        self.fetcher.fetch_page_content('https://news.example/a', use_playwright=True)
+        self.http_client.get.assert_not_called()
+        self.browser.assert_called_once()
+
+class TestLeanPlaywrightFetch(unittest.TestCase):
+
+    def setUp(self):
+        self.fetcher = ArticleFetcher(MagicMock(), 'missing-feeds.json', stats_manager=MagicMock())
+        playwright = patch('crd.fetcher.sync_playwright').start()
+        self.addCleanup(patch.stopall)
+        self.browser = playwright.return_value.__enter__.return_value.chromium.launch.return_value
+        self.page = self.browser.new_page.return_value
+        self.page.evaluate.return_value = '  Headline \n\n  First paragraph.\n'
+
+    def route(self, url, resource_type):
+        route = MagicMock()
+        route.request.url = url
+        route.request.resource_type = resource_type
+        handler = self.page.route.call_args[0][1]
+        handler(route)
+        return 'aborted' if route.abort.called else 'continued'
+
+    def test_text_is_extracted_in_the_page(self):
+        self.assertEqual(self.fetcher.fetch_text_with_playwright('https://spa.example/a'), 'Headline\nFirst paragraph.')
+        self.page.content.assert_not_called()
+        self.page.wait_for_selector.assert_called_once()
+        self.assertIn('article', self.page.wait_for_selector.call_args[0][0])
+        self.browser.close.assert_called_once()
+
+    def test_heavy_and_tracking_requests_are_aborted(self):
+        self.fetcher.fetch_text_with_playwright('https://spa.example/a')
+        self.assertEqual(self.route('https://spa.example/photo.jpg', 'image'), 'aborted')
+        self.assertEqual(self.route('https://spa.example/font.woff2', 'font'), 'aborted')
+        self.assertEqual(self.route('https://www.googletagmanager.com/gtm.js', 'script'), 'aborted')
+        self.assertEqual(self.route('https://spa.example/app.js', 'script'), 'continued')
+        self.assertEqual(self.route('https://spa.example/api/article', 'fetch'), 'continued')
+
+    def test_missing_article_container_falls_back_to_body(self):
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+        self.page.wait_for_selector.side_effect = PlaywrightTimeoutError('timeout')
+        self.assertEqual(self.fetcher.fetch_text_with_playwright('https://spa.example/a'), 'Headline\nFirst paragraph.')
+        self.page.evaluate.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from unittest.mock import patch
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Pipeline dependencies that short commands and the web app must not load.
+HEAVY_MODULES = ('playwright', 'feedparser', 'bs4', 'youtube_transcript_api', 'tqdm', 'pangu', 'PIL', 'requests')
+
+# Cumulative import time allowed for crd.cli; raise it with CRD_IMPORT_BUDGET_MS on slow machines.
+CLI_IMPORT_BUDGET_MS = float(os.environ.get('CRD_IMPORT_BUDGET_MS', 250))
+
+def import_profile(code, cwd=project_root):
+    """Run ``code`` in a fresh interpreter under ``-X importtime``; returns {module: cumulative ms}."""
+    env = dict(os.environ, PYTHONPATH=project_root)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative) / 1000
+    return profile
+
+class TestImportTime(unittest.TestCase):
+
+    def assertNotLoaded(self, profile, modules):
+        loaded = sorted(m for m in modules if m in profile)
+        self.assertEqual(loaded, [], f"Imported at startup: {', '.join(loaded)}")
+
+    def test_cli_import_skips_pipeline_dependencies(self):
+        self.assertNotLoaded(import_profile('import crd.cli'), HEAVY_MODULES)
+
+    def test_cli_import_fits_startup_budget(self):
+        # Best of three, so a busy machine does not fail the check by itself.
+        best = min(import_profile('import crd.cli')['crd.cli'] for _ in range(3))
+        self.assertLess(best, CLI_IMPORT_BUDGET_MS)
+
+    def test_web_app_import_skips_pipeline_dependencies(self):
+        self.assertNotLoaded(import_profile('import crd.web.app'), HEAVY_MODULES)
+
+    def test_lightweight_subcommand_loads_no_pipeline_stage(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        argv = ['crd', '--config', 'missing.env', '--feeds-config', os.path.join(project_root, 'feeds.json'),
+                '--db-path', 'crd.db', '--output-dir', 'out', 'finalize', '--all-stuck']
+        profile = import_profile(f'import sys; from crd.cli import main; sys.argv = {argv!r}; main()', cwd=work_dir)
+        self.assertNotLoaded(profile, HEAVY_MODULES + ('crd.fetcher', 'crd.analyzer', 'crd.summarizer', 'crd.renderer'))
+
+    def test_lazy_names_resolve_and_stay_patchable(self):
+        import crd.cli
+        from crd.fetcher import ArticleFetcher
+        self.assertIs(crd.cli.ArticleFetcher, ArticleFetcher)
+        self.assertIs(crd.cli.lazy('ArticleFetcher'), ArticleFetcher)
+        with patch('crd.cli.ArticleFetcher') as mock_fetcher:
+            self.assertIs(crd.cli.lazy('ArticleFetcher'), mock_fetcher)
+        with self.assertRaises(AttributeError):
+            crd.cli.NoSuchStage
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+from crd.analyzer import ArticleAnalyzer
+from crd.summarizer import ArticleSummarizer
+from crd.utils import render_cache
+
+DATE = '2024-05-01'
+
+def rating_client():
+    """An API client that rates an article with the number at the end of its content."""
+    client = MagicMock()
+    client.request.side_effect = lambda payload: {'choices': [{'message': {
+        'content': f"Fine. Rating: {payload['messages'][1]['content'].split()[-1]}/10"}}]}
+    return client
+
+def summary_client():
+    client = MagicMock()
+    client.request.return_value = {'choices': [{'message': {'content': 'Summary'}}]}
+    return client
+
+class TestStageInvalidation(unittest.TestCase):
+
+    def setUp(self):
+        pangu = patch('crd.summarizer.pangu').start()
+        pangu.spacing_text.side_effect = lambda text: text
+        self.addCleanup(patch.stopall)
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        self.criteria_path = os.path.join(self.test_dir, 'criteria.json')
+        self.write_criteria({'Relevance': 10})
+        for i, score in enumerate([9, 8, 3]):
+            self.db.add_article({'link': f'http://example.com/{i}', 'title': f'A{i}', 'date': DATE,
+                                 'fetch_date': DATE, 'category': 'Test', 'content': f'score {score}'})
+        self.run_pipeline()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def write_criteria(self, criteria):
+        with open(self.criteria_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': criteria}, f)
+
+    def run_pipeline(self, rating_model='rater-1', summary_model='writer-1'):
+        """Rate and summarize; returns the number of rating and summary API calls made."""
+        rater, writer = rating_client(), summary_client()
+        ArticleAnalyzer(self.db, rater, self.criteria_path, top_articles=2, min_score_map={'Test': 5},
+                        max_workers=1, model=rating_model).process('Test', DATE)
+        ArticleSummarizer(self.db, writer, model=summary_model, max_workers=1).process('Test', DATE)
+        return rater.request.call_count, writer.request.call_count
+
+    def summarized(self):
+        return sorted(a['title'] for a in self.db.get_summarized_articles_for_category_and_date('Test', DATE))
+
+    def test_unchanged_inputs_make_no_api_calls(self):
+        self.assertEqual(self.summarized(), ['A0', 'A1'])
+        self.assertEqual(self.run_pipeline(), (0, 0))
+        self.assertEqual(self.summarized(), ['A0', 'A1'])
+
+    def test_new_criteria_re_rate_but_reuse_unchanged_summaries(self):
+        self.write_criteria({'Relevance': 10, 'Novelty': 5})
+        # Every rating is redone; the same two articles win again, so their summaries are kept.
+        self.assertEqual(self.run_pipeline(), (3, 0))
+        self.assertEqual(self.summarized(), ['A0', 'A1'])
+
+    def test_new_summary_model_re_summarizes_without_re_rating(self):
+        rating_calls, summary_calls = self.run_pipeline(summary_model='writer-2')
+        self.assertEqual(rating_calls, 0)
+        # Title, Chinese summary and English summary for each of the two articles.
+        self.assertEqual(summary_calls, 6)
+
+    def test_changed_content_redoes_only_that_article(self):
+        self.assertTrue(self.db.update_article_content('http://example.com/0', 'rewritten score 9'))
+        self.assertEqual(self.run_pipeline(), (1, 3))
+        self.assertEqual(self.summarized(), ['A0', 'A1'])
+
+    def test_card_template_version_changes_render_key(self):
+        article = self.db.get_summarized_articles_for_category_and_date('Test', DATE)[0]
+        before = render_cache.article_content_hash(article)
+        with patch.object(render_cache, 'CARD_TEMPLATE_VERSION', render_cache.CARD_TEMPLATE_VERSION + 1):
+            self.assertNotEqual(render_cache.article_content_hash(article), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.keywords import KeywordFilter, REJECT, ACCEPT, CHECK_BODY
+
+class TestKeywordFilter(unittest.TestCase):
+
+    def test_terms_match_whole_words_case_insensitively(self):
+        rule = KeywordFilter(include=['AI', 'large language model', 'token*'])
+        self.assertEqual(rule.scan('New ai chips'), (True, False))
+        self.assertEqual(rule.scan('She said so'), (False, False))
+        self.assertEqual(rule.scan('A Large  Language\nModel'), (True, False))
+        self.assertEqual(rule.scan('Better tokenizers'), (True, False))
+
+    def test_cjk_terms_match_inside_running_text(self):
+        rule = KeywordFilter(include=['比特币'], exclude=['广告'])
+        self.assertEqual(rule.scan('现货比特币基金'), (True, False))
+        self.assertEqual(rule.scan('比特币广告'), (True, True))
+
+    def test_overlapping_exclude_is_found(self):
+        rule = KeywordFilter(include=['open source'], exclude=['source code leak'])
+        self.assertEqual(rule.scan('An open source code leak'), (True, True))
+
+    def test_headline_screening_before_fetch(self):
+        rule = KeywordFilter(include=['bitcoin'], exclude=['sponsored'])
+        self.assertEqual(rule.screen('Sponsored: buy now', '')[0], REJECT)
+        # An include term in the title still needs the body checked for exclude terms.
+        self.assertEqual(rule.screen('Bitcoin ETF inflows', ''), (CHECK_BODY, True))
+        self.assertEqual(rule.screen('Market wrap', 'Prices moved'), (CHECK_BODY, False))
+
+        self.assertEqual(rule.screen('Body text', included=True, final=True)[0], ACCEPT)
+        self.assertEqual(rule.screen('Body about bitcoin', final=True)[0], ACCEPT)
+        self.assertEqual(rule.screen('Body about stocks', final=True)[0], REJECT)
+        self.assertEqual(rule.screen('Sponsored body', included=True, final=True)[0], REJECT)
+
+    def test_headline_scope_decides_without_the_body(self):
+        rule = KeywordFilter(include=['arxiv'], scope='headline')
+        self.assertEqual(rule.screen('Paper', 'Posted on arXiv')[0], ACCEPT)
+        self.assertEqual(rule.screen('Blog post', 'Opinion')[0], REJECT)
+
+    def test_include_only_rules_accept_on_the_headline(self):
+        self.assertEqual(KeywordFilter(include=['rust']).screen('Rust 2.0 released')[0], ACCEPT)
+
+    def test_config_forms(self):
+        self.assertEqual(KeywordFilter.from_config(None, default_include=['x']).include, ['x'])
+        self.assertEqual(KeywordFilter.from_config(['a', ' ', 'b ']).include, ['a', 'b'])
+        rule = KeywordFilter.from_config({'exclude': ['ad'], 'scope': 'headline'})
+        self.assertEqual((rule.include, rule.exclude, rule.scope), ([], ['ad'], 'headline'))
+        self.assertFalse(KeywordFilter.from_config(None))
+        with self.assertRaises(ValueError):
+            KeywordFilter(scope='body')
+
+if __name__ == '__main__':
+    unittest.main()
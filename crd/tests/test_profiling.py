@@ -0,0 +1,67 @@
+import unittest
+import os
+import sys
+import pstats
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.profiling import StageProfiler
+
+def busy_worker_function(n):
+    return sum(i * i for i in range(n))
+
+class TestStageProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_cpu_profile_includes_worker_threads(self):
+        profiler = StageProfiler('cpu', ['analyze'], self.test_dir)
+        with profiler.profile('analyze'):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(busy_worker_function, [10000] * 4))
+
+        path = os.path.join(self.test_dir, 'analyze.pstats')
+        functions = {func[2] for func in pstats.Stats(path).stats}
+        self.assertIn('busy_worker_function', functions)
+        self.assertTrue(profiler.results[0]['summary'])
+
+    def test_unselected_stage_is_not_profiled(self):
+        profiler = StageProfiler('cpu', ['fetch'], self.test_dir)
+        with profiler.profile('render'):
+            busy_worker_function(10)
+        self.assertEqual(os.listdir(self.test_dir), [])
+
+    def test_mem_profile_reports_peak_and_allocation_sites(self):
+        profiler = StageProfiler('mem', ['fetch'], self.test_dir)
+        with profiler.profile('fetch'):
+            kept = [bytearray(1024) for _ in range(2000)]
+        self.assertGreater(profiler.results[0]['peak_bytes'], 2000 * 1024)
+        with open(os.path.join(self.test_dir, 'fetch.mem.txt'), encoding='utf-8') as f:
+            self.assertIn('test_profiling.py', f.read())
+        del kept
+
+    def test_combined_step_is_profiled_under_its_own_label(self):
+        profiler = StageProfiler('cpu', ['summarize'], self.test_dir)
+        with profiler.profile('analyze_summarize'):
+            busy_worker_function(10)
+        self.assertEqual(os.listdir(self.test_dir), ['analyze_summarize.pstats'])
+        with profiler.profile('analyze'):
+            busy_worker_function(10)
+        self.assertEqual(len(profiler.results), 1)
+
+    def test_unknown_stage_is_rejected(self):
+        with self.assertRaises(ValueError):
+            StageProfiler('cpu', ['fetchh'], self.test_dir)
+
+if __name__ == '__main__':
+    unittest.main()
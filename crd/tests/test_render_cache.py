@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.render_cache import RenderCache, READY, PENDING, FAILED
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache = RenderCache(self.test_dir)
+        self.article = {
+            'id': 7, 'fetch_date': '2024-05-01', 'title': 'Title', 'chinese_title': '标题',
+            'chinese_summary': '摘要', 'url': 'http://example.com', 'source': 'example.com',
+            'thumbnail_path': None
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write_image(self, article, path):
+        with open(path, 'wb') as f:
+            f.write(b'png')
+
+    def test_renders_once_then_serves_from_cache(self):
+        calls = []
+        def render(article, path):
+            calls.append(path)
+            self._write_image(article, path)
+
+        status, relpath = self.cache.get_or_render(self.article, render)
+        self.assertEqual(status, READY)
+        self.assertTrue(relpath.startswith('2024-05-01/analysis_7_'))
+        status, _ = self.cache.get_or_render(self.article, render)
+        self.assertEqual(status, READY)
+        self.assertEqual(len(calls), 1)
+
+    def test_summary_change_invalidates_stale_image(self):
+        self.cache.get_or_render(self.article, self._write_image)
+        old_path = self.cache.path_for(self.article)
+
+        updated = dict(self.article, chinese_summary='新的摘要')
+        self.assertIsNone(self.cache.lookup(updated))
+        status, _ = self.cache.get_or_render(updated, self._write_image)
+
+        self.assertEqual(status, READY)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(self.cache.path_for(updated)))
+
+    def test_concurrent_requests_render_single_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        def slow_render(article, path):
+            calls.append(path)
+            started.set()
+            release.wait(5)
+            self._write_image(article, path)
+
+        results = {}
+        leader = threading.Thread(target=lambda: results.update(leader=self.cache.get_or_render(self.article, slow_render)))
+        leader.start()
+        started.wait(5)
+
+        self.assertTrue(self.cache.is_rendering(self.article))
+        self.assertEqual(self.cache.get_or_render(self.article, slow_render, wait=False)[0], PENDING)
+
+        waiter = threading.Thread(target=lambda: results.update(waiter=self.cache.get_or_render(self.article, slow_render)))
+        waiter.start()
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results['leader'][0], READY)
+        self.assertEqual(results['waiter'][0], READY)
+
+    def test_failed_render_reports_failure(self):
+        def broken_render(article, path):
+            raise RuntimeError("browser crashed")
+
+        status, _ = self.cache.get_or_render(self.article, broken_render)
+        self.assertEqual(status, FAILED)
+        self.assertFalse(self.cache.is_rendering(self.article))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import shutil
+import tempfile
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+from crd.render_worker import RenderWorker
+from crd.renderer import NewsletterRenderer
+
+class TestRenderQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        self.db.add_article({
+            'link': 'http://example.com/a', 'title': 'A', 'date': '2024-05-01',
+            'fetch_date': '2024-05-01', 'category': 'Test', 'content': 'body'
+        })
+        self.article_id = self.db.get_articles_by_status('fetched', 'Test', '2024-05-01')[0]['id']
+        self.db.update_article_summary(self.article_id, '标题', 'summary', '摘要')
+        self.output_dir = os.path.join(self.test_dir, 'output')
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_enqueue_deduplicates_live_jobs(self):
+        first = self.db.enqueue_render_job(self.article_id, 'k1', '2024-05-01/a.png')
+        second = self.db.enqueue_render_job(self.article_id, 'k1', '2024-05-01/a.png')
+        self.assertEqual(first, second)
+        self.assertEqual(self.db.get_render_queue_metrics()['queue_depth'], 1)
+
+    def test_claim_and_finish_records_latency(self):
+        job_id = self.db.enqueue_render_job(self.article_id, 'k1', '2024-05-01/a.png')
+        job = self.db.claim_next_render_job()
+        self.assertEqual(job['id'], job_id)
+        self.assertEqual(job['status'], 'running')
+        self.assertIsNone(self.db.claim_next_render_job())
+
+        self.db.finish_render_job(job_id)
+        metrics = self.db.get_render_queue_metrics()
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertEqual(metrics['done'], 1)
+        self.assertEqual(metrics['recent_jobs'], 1)
+        # A finished key can be queued again, e.g. after the image was deleted.
+        self.assertNotEqual(self.db.enqueue_render_job(self.article_id, 'k1', '2024-05-01/a.png'), job_id)
+
+    def test_worker_runs_job_with_shared_renderer(self):
+        worker = RenderWorker(self.db, self.output_dir)
+        article = self.db.get_article_by_id(self.article_id)
+        job_id = self.db.enqueue_render_job(self.article_id, worker.render_cache.cache_key(article), worker.render_cache.relpath_for(article))
+
+        renderer = MagicMock()
+        def fake_render(article_data, path):
+            with open(path, 'wb') as f:
+                f.write(b'png')
+        renderer.generate_article_analysis_image.side_effect = fake_render
+
+        self.assertTrue(worker.run_job(self.db.claim_next_render_job(), renderer))
+        self.assertEqual(self.db.get_render_job(job_id)['status'], 'done')
+        self.assertIsNotNone(worker.render_cache.lookup(article))
+
+    def test_worker_marks_failed_render(self):
+        worker = RenderWorker(self.db, self.output_dir)
+        job_id = self.db.enqueue_render_job(self.article_id, 'k1', '2024-05-01/a.png')
+        renderer = MagicMock()  # Never writes the image
+
+        self.assertFalse(worker.run_job(self.db.claim_next_render_job(), renderer))
+        self.assertEqual(self.db.get_render_job(job_id)['status'], 'failed')
+
+    def test_shared_browser_pages_are_closed_when_navigation_fails(self):
+        browser = MagicMock()
+        page = browser.new_page.return_value
+        page.goto.side_effect = RuntimeError('navigation timeout')
+        renderer = NewsletterRenderer(self.db, browser=browser)
+
+        with self.assertRaises(RuntimeError):
+            renderer._render_html_to_png(os.path.join(self.test_dir, 'card.html'), os.path.join(self.test_dir, 'card.png'))
+        page.close.assert_called_once()
+        browser.close.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,392 @@
+import unittest
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import subprocess
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.repository import ArticleRepository
+from crd.database import DatabaseManager, open_database
+from crd.postgres import PostgresDatabaseManager, translate_placeholders, psycopg
+from crd.utils.fingerprints import stage_fingerprint
+
+# Point this at a disposable PostgreSQL server to run the contract tests against it. Without
+# it, a throwaway server is started if PostgreSQL can be run here (see ThrowawayPostgres).
+POSTGRES_DSN = os.environ.get('CRD_TEST_POSTGRES_DSN')
+
+# Set in CI, where PostgreSQL is expected: the PostgreSQL tests then fail instead of skipping.
+REQUIRE_POSTGRES = os.environ.get('CRD_TEST_REQUIRE_POSTGRES') == '1'
+
+class ThrowawayPostgres:
+    """A PostgreSQL server in a temporary directory that only listens on a Unix socket.
+
+    Uses the pgserver package if it is installed, else ``initdb`` and
+    ``pg_ctl`` from PATH or ``pg_config --bindir``. ``start`` returns a DSN
+    and raises RuntimeError saying why if no server can be started here.
+    """
+
+    def __init__(self):
+        self.data_dir = None
+        self.pgserver = None
+        self.bindir = None
+
+    @staticmethod
+    def find_bindir():
+        initdb = shutil.which('initdb')
+        if initdb:
+            return os.path.dirname(initdb)
+        try:
+            bindir = subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return bindir if os.path.exists(os.path.join(bindir, 'initdb')) else None
+
+    def start(self):
+        if psycopg is None:
+            raise RuntimeError("psycopg[pool] is not installed")
+        self.data_dir = tempfile.mkdtemp(prefix='crd-pg-')
+        try:
+            import pgserver
+        except ImportError:
+            pgserver = None
+        if pgserver:
+            # pgserver also copes with running as root, which initdb refuses.
+            self.pgserver = pgserver.get_server(self.data_dir, cleanup_mode='delete')
+            return self.pgserver.get_uri()
+        self.bindir = self.find_bindir()
+        if not self.bindir:
+            raise RuntimeError("no PostgreSQL binaries found; install pgserver or put initdb on PATH")
+        try:
+            subprocess.run([os.path.join(self.bindir, 'initdb'), '-D', self.data_dir, '-U', 'postgres', '-A', 'trust'],
+                           capture_output=True, text=True, check=True)
+            subprocess.run([os.path.join(self.bindir, 'pg_ctl'), '-D', self.data_dir, '-w',
+                            '-l', os.path.join(self.data_dir, 'server.log'),
+                            '-o', f"-h '' -k {self.data_dir}", 'start'], capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            self.stop()
+            raise RuntimeError(f"could not start PostgreSQL: {(e.stderr or '').strip()}")
+        return f'postgresql://postgres@/postgres?host={self.data_dir}'
+
+    def stop(self):
+        if self.pgserver:
+            self.pgserver.cleanup()
+        elif self.bindir and os.path.exists(os.path.join(self.data_dir, 'postmaster.pid')):
+            subprocess.run([os.path.join(self.bindir, 'pg_ctl'), '-D', self.data_dir, '-m', 'immediate', 'stop'],
+                           capture_output=True)
+        if self.data_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+class RepositoryContract:
+    """Behaviour every ArticleRepository must share; subclasses provide ``make_repository``."""
+
+    def setUp(self):
+        self.db = self.make_repository()
+        self.db.create_tables()
+
+    def add(self, n, category='Test', date_str='2024-05-01', title=None, content='body'):
+        return self.db.add_article({'link': f'http://www.example.com/{category}/{n}', 'title': title or f'Article {n}',
+                                    'date': date_str, 'fetch_date': date_str, 'category': category, 'content': content})
+
+    def ids(self, status, category='Test', date_str='2024-05-01'):
+        return self.db.get_article_ids_by_status(status, category, date_str)
+
+    def summarize(self, article_id, score=8):
+        self.db.update_article_score_and_reason(article_id, score, 'why')
+        self.db.mark_selected_for_summary([article_id])
+        self.db.update_article_summary(article_id, f'标题{article_id}', f'Summary {article_id}', f'摘要{article_id}')
+
+    def test_implements_the_interface(self):
+        self.assertIsInstance(self.db, ArticleRepository)
+
+    def test_add_article_ignores_duplicate_urls(self):
+        self.assertTrue(self.add(1))
+        self.assertFalse(self.add(1))
+        [article] = self.db.get_articles_by_status('fetched', 'Test', '2024-05-01')
+        self.assertEqual(article['source'], 'example.com')
+        self.assertEqual(self.db.get_article_by_id(article['id'])['title'], 'Article 1')
+        self.assertIsNone(self.db.get_article_by_id(article['id'] + 100))
+
+    def test_articles_move_through_the_pipeline(self):
+        for n in range(5):
+            self.add(n)
+        ids = self.ids('fetched')
+        self.assertEqual([row['id'] for row in self.db.iter_articles_by_status('fetched', 'Test', '2024-05-01', batch_size=2)], ids)
+        for article_id, score in zip(ids, [3, 9, 7, 9, 5]):
+            self.db.update_article_score_and_reason(article_id, score, 'why')
+        self.assertEqual(sorted(self.db.get_selection_scores('Test', '2024-05-01')), list(zip(ids, [3, 9, 7, 9, 5])))
+        self.assertEqual(self.db.select_top_articles_for_summary('Test', '2024-05-01', 2, 6), [ids[1], ids[3]])
+        self.assertEqual(self.db.mark_selected_for_summary([ids[2], ids[0]]), [ids[2], ids[0]])
+        self.assertEqual(self.db.mark_selected_for_summary([ids[2]]), [])
+        self.db.update_article_score_and_reason(ids[4], 6, 'why', model='strong', screening_score=5)
+        article = self.db.get_article_by_id(ids[4])
+        self.assertEqual((article['score'], article['rating_model'], article['screening_score']), (6, 'strong', 5))
+
+        self.db.update_article_summary(ids[1], '标题', 'Summary', '摘要')
+        self.db.update_article_thumbnail(ids[1], 'thumb.png')
+        self.assertEqual(self.db.get_article_by_id(ids[1])['status'], 'complete')
+        self.assertEqual([a['id'] for a in self.db.get_summarized_articles_for_category_and_date('Test', '2024-05-01')], [ids[1]])
+        self.assertEqual(self.db.get_available_dates(), ['2024-05-01'])
+
+    def test_summarized_articles_are_paged_and_grouped(self):
+        self.add(1, category='B', date_str='2024-05-02')
+        for n in range(4):
+            self.add(n, category='A')
+        for article_id in self.db.get_article_ids_by_status('fetched', 'A', '2024-05-01') + self.ids('fetched', 'B', '2024-05-02'):
+            self.summarize(article_id, score=article_id)
+
+        seen, after = [], None
+        while True:
+            page, after = self.db.get_summarized_articles_page(fields=['id', 'title'], after=after, limit=2)
+            seen += [row['id'] for row in page]
+            self.assertTrue(all(set(row) == {'id', 'title'} for row in page))
+            if after is None:
+                break
+        self.assertEqual(seen, [1, 5, 4, 3, 2])
+        grouped = self.db.get_summarized_articles_for_date(category_filter='A', fields=['id'])
+        self.assertEqual(grouped, {'2024-05-01': {'A': [{'id': 5}, {'id': 4}, {'id': 3}, {'id': 2}]}})
+        self.assertEqual(self.db.get_all_categories(), ['A', 'B'])
+        with self.assertRaises(ValueError):
+            self.db.iter_summarized_articles(fields=['password'])
+
+    def test_search_finds_english_and_chinese_text(self):
+        self.add(1, title='Scaling laws for language models', content='Transformers and compute budgets.')
+        self.add(2, title='Bitcoin ETF inflows', content='Spot funds saw record inflows.')
+        self.add(3, title='Draft about language models')
+        llm_id, btc_id, _ = self.ids('fetched')
+        self.db.update_article_summary(llm_id, '语言模型的扩展定律', 'Scaling laws summary.', '本文研究大型语言模型的扩展规律。')
+        self.db.update_article_summary(btc_id, '比特币ETF资金流入', 'ETF summary.', '现货比特币基金出现创纪录的资金流入。')
+
+        results = self.db.search_articles('language models')
+        self.assertEqual([r['id'] for r in results], [llm_id])
+        self.assertIn('<mark>', results[0]['snippet'])
+        self.assertEqual([r['id'] for r in self.db.search_articles('record inflows')], [btc_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('基金')], [btc_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('bitcoin 基金')], [btc_id])
+        self.assertEqual(self.db.search_articles('language 基金'), [])
+        self.assertEqual(self.db.search_articles('100% "odd" ? query'), [])
+        self.assertEqual(self.db.search_articles('基%'), [])
+
+    def test_search_matches_accented_latin_terms_in_english_text(self):
+        self.add(1, title='Café culture in Lisbon', content='Coffee houses and pastries.')
+        [cafe_id] = self.ids('fetched')
+        self.db.update_article_summary(cafe_id, '里斯本的咖啡馆文化', 'Café summary.', '里斯本咖啡馆的历史。')
+        self.assertEqual([r['id'] for r in self.db.search_articles('café')], [cafe_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('Café culture')], [cafe_id])
+        self.assertEqual([r['id'] for r in self.db.search_articles('café 咖啡馆')], [cafe_id])
+
+    def test_leases_keep_workers_apart(self):
+        for n in range(4):
+            self.add(n)
+        ids = self.ids('fetched')
+        first = self.db.claim_articles('fetched', 'Test', '2024-05-01', 'a', limit=3)
+        second = self.db.claim_articles('fetched', 'Test', '2024-05-01', 'b', limit=3)
+        self.assertEqual([row['id'] for row in first], ids[:3])
+        self.assertEqual([row['id'] for row in second], ids[3:])
+        self.assertIsNone(self.db.claim_article(ids[0], 'fetched', 'b'))
+        self.assertEqual(self.db.get_leased_article_ids('fetched', 'Test', '2024-05-01'), ids)
+        self.assertEqual(self.db.renew_leases('a'), 3)
+
+        self.db.update_article_score_and_reason(ids[0], 5, 'why')
+        self.assertIsNone(self.db.get_article_by_id(ids[0])['lease_owner'])
+        self.assertEqual(self.db.release_leases('a', [ids[1]]), 1)
+        self.assertEqual(self.db.claim_article(ids[1], 'fetched', 'b')['id'], ids[1])
+        self.assertEqual(self.db.release_leases('b'), 2)
+        self.assertEqual(self.db.force_finalize_all_articles(), 3)
+
+    def test_concurrent_claims_never_overlap(self):
+        for n in range(30):
+            self.add(n)
+        claimed = {}
+
+        def work(worker):
+            claimed[worker] = [a['id'] for a in self.db.iter_claimed_articles('fetched', 'Test', '2024-05-01', worker, batch_size=2)]
+            self.db.close_conn()
+
+        threads = [threading.Thread(target=work, args=(f'w{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(i for ids in claimed.values() for i in ids), self.ids('fetched'))
+
+    def test_generation_tracks_data_writes_only(self):
+        self.add(1)
+        [article_id] = self.ids('fetched')
+        generation = self.db.get_generation()
+        self.db.claim_articles('fetched', 'Test', '2024-05-01', 'a')
+        self.assertEqual(self.db.get_generation(), generation)
+        self.db.update_article_score_and_reason(article_id, 5, 'why')
+        self.assertGreater(self.db.get_generation(), generation)
+        generation = self.db.get_generation()
+        self.db.bump_generation()
+        self.assertGreater(self.db.get_generation(), generation)
+        # LLM usage and pipeline runs move only the metrics counter.
+        generation, metrics = self.db.get_generation(), self.db.get_generation('metrics_generation')
+        self.db.record_llm_usage('m', 100, 20)
+        self.db.record_pipeline_run('process', 'Test', '2024-05-01', 'success',
+                                    {'started_at': 0.0, 'duration': 1.0, 'counters': {}, 'timings': {}})
+        self.assertEqual(self.db.get_generation(), generation)
+        self.assertEqual(self.db.get_generation('metrics_generation'), metrics + 2)
+
+    def test_stats_rollups_and_llm_usage(self):
+        for n in range(3):
+            self.add(n)
+        self.add(9, category='Other')
+        ids = self.ids('fetched')
+        self.summarize(ids[0], score=9)
+        self.db.update_article_score_and_reason(ids[1], 4, 'why')
+        self.db.record_llm_usage('m', 100, 20, cost=0.5, day='2024-05-01')
+        self.db.record_llm_usage('m', 50, 10, cost=0.25, day='2024-05-01')
+
+        stats = self.db.get_stats()
+        self.assertEqual(stats['articles_per_category'], {'Other': 1, 'Test': 3})
+        self.assertAlmostEqual(stats['avg_score_per_category']['Test'], 6.5)
+        self.assertEqual([stage['count'] for stage in stats['funnel']], [4, 2, 1, 1, 0])
+        usage = stats['llm_spend_per_day']['2024-05-01']
+        self.assertEqual((usage['calls'], usage['prompt_tokens'], usage['completion_tokens']), (2, 150, 30))
+        self.assertAlmostEqual(usage['cost'], 0.75)
+        self.assertTrue(self.db.rebuild_stats())
+        self.assertEqual(self.db.get_stats(), stats)
+
+    def test_pipeline_runs_are_recorded(self):
+        for duration in (1.0, 2.0):
+            snapshot = {'started_at': time.time(), 'duration': duration, 'counters': {'fetched': 3},
+                        'timings': {'stage_fetch': {'count': 1, 'total_time': duration, 'p50': duration,
+                                                    'p95': duration, 'p99': duration, 'max': duration}}}
+            self.assertIsNotNone(self.db.record_pipeline_run('fetch', 'Test', '2024-05-01', 'success', snapshot))
+        history = self.db.get_stage_duration_history(limit=5)
+        self.assertEqual(history['series'], {'stage_fetch': [1.0, 2.0]})
+        summary = self.db.get_pipeline_metrics_summary()
+        self.assertEqual(summary['runs'], {('fetch', 'success'): 2})
+        self.assertEqual(summary['counters'], {'fetched': 6})
+        # Percentiles are the latest run's; count and total accumulate.
+        timing = summary['timings']['stage_fetch']
+        self.assertEqual((timing['p50'], timing['count'], timing['total']), (2.0, 2, 3.0))
+
+    def test_render_jobs_are_deduplicated_and_claimed_once(self):
+        job_id = self.db.enqueue_render_job(1, 'key', 'img.png')
+        self.assertEqual(self.db.enqueue_render_job(1, 'key', 'img.png'), job_id)
+        self.assertEqual(self.db.claim_next_render_job()['id'], job_id)
+        self.assertIsNone(self.db.claim_next_render_job())
+        self.db.finish_render_job(job_id)
+        self.assertEqual(self.db.get_render_job(job_id)['status'], 'done')
+        self.assertNotEqual(self.db.enqueue_render_job(1, 'key', 'img.png'), job_id)
+        metrics = self.db.get_render_queue_metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['done'], metrics['recent_jobs']), (1, 1, 1))
+
+    def test_content_updates_only_when_changed(self):
+        self.add(1)
+        url = 'http://www.example.com/Test/1'
+        self.assertTrue(self.db.update_article_content(url, 'better body'))
+        self.assertFalse(self.db.update_article_content(url, 'better body'))
+        self.assertFalse(self.db.update_article_content('http://missing.example', 'x'))
+        self.assertEqual(self.db.get_articles_by_status('fetched', 'Test', '2024-05-01')[0]['content'], 'better body')
+
+    def test_stale_ratings_and_summaries_are_invalidated(self):
+        self.add(1)
+        self.add(2)
+        first, second = self.db.get_articles_by_status('fetched', 'Test', '2024-05-01')
+        for article in (first, second):
+            self.db.update_article_score_and_reason(article['id'], 8, 'why', stage_fingerprint('rate1', article['content_hash']))
+        self.db.mark_selected_for_summary([first['id']])
+        self.db.update_article_summary(first['id'], 't', 'e', 'c', stage_fingerprint('sum1', first['content_hash']))
+
+        self.assertEqual(self.db.invalidate_stale_ratings('Test', '2024-05-01', 'rate1'), 0)
+        self.assertEqual(self.db.invalidate_stale_summaries('Test', '2024-05-01', 'sum1'), 0)
+        self.assertEqual(self.db.invalidate_stale_summaries('Test', '2024-05-01', 'sum2'), 1)
+        self.assertEqual(self.ids('selected_for_summary'), [first['id']])
+
+        self.db.update_article_content(second['url'], 'new body')
+        self.assertEqual(self.db.invalidate_stale_ratings('Test', '2024-05-01', 'rate1'), 1)
+        # Dropping a rating puts the whole selection up for a new decision.
+        self.assertEqual((self.ids('fetched'), self.ids('rated')), ([second['id']], [first['id']]))
+
+    def test_fetch_tiers_are_remembered_per_domain(self):
+        self.db.set_fetch_tier('example.com', 'http')
+        self.db.set_fetch_tier('spa.example', 'http')
+        self.db.set_fetch_tier('spa.example', 'browser')
+        self.assertEqual(self.db.get_fetch_tiers(), {'example.com': 'http', 'spa.example': 'browser'})
+        time.sleep(0.05)
+        self.assertEqual(self.db.get_fetch_tiers(max_age=0.01), {})
+
+    def test_finalize_fails_unleased_leftovers_from_earlier_days(self):
+        self.add(1, date_str='2024-04-30')
+        self.add(2, date_str='2024-04-30')
+        self.add(3)
+        old_ids = self.ids('fetched', date_str='2024-04-30')
+        self.db.claim_article(old_ids[1], 'fetched', 'a')
+        self.db.finalize_stuck_articles('Test', '2024-05-01')
+        self.assertEqual(self.ids('failed', date_str='2024-04-30'), old_ids[:1])
+        self.assertEqual(len(self.ids('fetched')), 1)
+
+class TestSQLiteRepository(RepositoryContract, unittest.TestCase):
+
+    def make_repository(self):
+        self.test_dir = tempfile.mkdtemp()
+        return open_database(os.path.join(self.test_dir, 'test.db'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_paths_open_sqlite(self):
+        self.assertIs(type(self.db), DatabaseManager)
+
+class TestPostgresRepository(RepositoryContract, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = None
+        cls.dsn = POSTGRES_DSN
+        if cls.dsn and psycopg:
+            return
+        try:
+            if cls.dsn:
+                raise RuntimeError("psycopg[pool] is not installed")
+            cls.server = ThrowawayPostgres()
+            cls.dsn = cls.server.start()
+        except RuntimeError as e:
+            if cls.server:
+                cls.server.stop()
+            if REQUIRE_POSTGRES:
+                raise
+            raise unittest.SkipTest(f"PostgreSQL unavailable ({e}); set CRD_TEST_POSTGRES_DSN to test it")
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server:
+            cls.server.stop()
+
+    def make_repository(self):
+        # A throwaway schema per test keeps runs isolated on a shared server.
+        self.schema = f'crd_test_{uuid.uuid4().hex[:12]}'
+        with psycopg.connect(self.dsn, autocommit=True) as conn:
+            conn.execute(f'CREATE SCHEMA {self.schema}')
+        dsn = psycopg.conninfo.make_conninfo(self.dsn, options=f'-c search_path={self.schema}')
+        return PostgresDatabaseManager(dsn, max_size=4)
+
+    def test_connections_are_only_borrowed_from_the_pool(self):
+        with self.assertRaises(TypeError):
+            self.db.get_conn()
+
+    def tearDown(self):
+        self.db.close()
+        with psycopg.connect(self.dsn, autocommit=True) as conn:
+            conn.execute(f'DROP SCHEMA {self.schema} CASCADE')
+
+class TestPlaceholderTranslation(unittest.TestCase):
+
+    def test_qmarks_outside_literals_become_format_placeholders(self):
+        self.assertEqual(translate_placeholders("SELECT '?', 'it''s ?' FROM t WHERE a = ? AND b LIKE '%x'"),
+                         "SELECT '?', 'it''s ?' FROM t WHERE a = %s AND b LIKE '%%x'")
+
+if __name__ == '__main__':
+    unittest.main()
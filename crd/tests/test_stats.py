@@ -0,0 +1,125 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.database import DatabaseManager
+from crd.utils.stats import StatsManager, LatencyHistogram
+from crd.web.metrics import render_metrics
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles_and_buckets(self):
+        hist = LatencyHistogram()
+        for i in range(1, 101):
+            hist.observe(i / 100.0)
+        summary = hist.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['p50'], 0.50)
+        self.assertAlmostEqual(summary['p95'], 0.95)
+        self.assertAlmostEqual(summary['p99'], 0.99)
+        self.assertAlmostEqual(summary['max'], 1.0)
+        self.assertEqual(sum(hist.bucket_counts), 100)
+
+    def test_reservoir_is_bounded(self):
+        hist = LatencyHistogram(max_samples=10)
+        for i in range(1000):
+            hist.observe(0.001 * i)
+        self.assertEqual(len(hist.samples), 10)
+        self.assertEqual(hist.count, 1000)
+
+class TestStatsManagerThreads(unittest.TestCase):
+
+    def test_concurrent_increments_are_not_lost(self):
+        stats = StatsManager()
+
+        def work(_):
+            for _ in range(10000):
+                stats.increment('hits')
+            stats.record_time('work', 0.01)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(work, range(16)))
+        self.assertEqual(stats.counters['hits'], 160000)
+        self.assertEqual(stats.timings['work'].count, 16)
+
+    def test_nested_spans_keep_flat_timer_names_and_are_traced_by_path(self):
+        stats = StatsManager(trace=True)
+        with stats.span('article', article_id=7):
+            with stats.span('fetch'):
+                pass
+            with stats.span('extract'):
+                pass
+        self.assertEqual(set(stats.timings), {'article', 'fetch', 'extract'})
+
+        path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        stats.write_trace(path)
+        with open(path, encoding='utf-8') as f:
+            events = [e for e in json.load(f)['traceEvents'] if e['ph'] == 'X']
+        by_name = {e['name']: e for e in events}
+        self.assertEqual(by_name['fetch']['args'], {'article_id': 7, 'path': 'article/fetch'})
+        article, fetch = by_name['article'], by_name['fetch']
+        self.assertLessEqual(article['ts'], fetch['ts'])
+        self.assertGreaterEqual(article['ts'] + article['dur'], fetch['ts'] + fetch['dur'])
+
+    def test_spans_are_not_kept_without_tracing(self):
+        stats = StatsManager()
+        with stats.span('article'):
+            pass
+        self.assertEqual([e for e in stats.trace_events() if e['ph'] == 'X'], [])
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def _run(self, command, durations, fetched):
+        stats = StatsManager()
+        for duration in durations:
+            stats.record_time('stage_fetch', duration)
+        stats.increment('articles_fetched', fetched)
+        return stats.persist(self.db, command, 'Test', '2024-05-01')
+
+    def test_runs_are_persisted_and_charted(self):
+        first = self._run('fetch', [1.0, 3.0], 4)
+        second = self._run('process', [2.0], 6)
+        history = self.db.get_stage_duration_history()
+        self.assertEqual([run['id'] for run in history['runs']], [first, second])
+        self.assertEqual(history['series']['stage_fetch'], [4.0, 2.0])
+
+    def test_prometheus_text(self):
+        self._run('fetch', [1.0, 3.0], 4)
+        self._run('fetch', [2.0], 6)
+        text = render_metrics(self.db)
+        self.assertIn('# TYPE crd_pipeline_duration_seconds summary', text)
+        self.assertIn('crd_pipeline_runs_total{command="fetch",status="success"} 2', text)
+        self.assertIn('crd_pipeline_events_total{name="articles_fetched"} 10', text)
+        # Quantiles come from the latest run; count and sum accumulate over all runs.
+        self.assertIn('crd_pipeline_duration_seconds_count{name="stage_fetch"} 3', text)
+        self.assertIn('crd_pipeline_duration_seconds_sum{name="stage_fetch"} 6.0', text)
+        self.assertIn('crd_pipeline_duration_seconds{name="stage_fetch",quantile="0.5"} 2.0', text)
+
+    def test_large_values_keep_full_precision(self):
+        self.db.record_llm_usage('m', 1234567, 7654321, cost=0.1 + 0.2)
+        text = render_metrics(self.db)
+        self.assertIn('crd_llm_tokens_total{kind="prompt"} 1234567', text)
+        self.assertIn('crd_llm_tokens_total{kind="completion"} 7654321', text)
+        self.assertIn(f'crd_llm_cost_total {0.1 + 0.2!r}', text)
+
+if __name__ == '__main__':
+    unittest.main()
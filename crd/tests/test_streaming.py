@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.streaming import bounded_map, batched
+
+class TestBoundedMap(unittest.TestCase):
+
+    def test_items_are_pulled_lazily_within_the_window(self):
+        lock = threading.Lock()
+        state = {'pulled': 0, 'done': 0, 'max_ahead': 0}
+
+        def items():
+            for i in range(50):
+                with lock:
+                    state['pulled'] += 1
+                    state['max_ahead'] = max(state['max_ahead'], state['pulled'] - state['done'])
+                yield i
+
+        def work(i):
+            time.sleep(0.001)
+            with lock:
+                state['done'] += 1
+            return i * 2
+
+        results = list(bounded_map(work, items(), max_workers=3, window=5))
+        self.assertEqual(sorted(results), [i * 2 for i in range(50)])
+        self.assertLessEqual(state['max_ahead'], 6)
+
+    def test_exceptions_propagate(self):
+        def work(i):
+            if i == 3:
+                raise RuntimeError('boom')
+            return i
+
+        with self.assertRaises(RuntimeError):
+            list(bounded_map(work, range(10), max_workers=2))
+
+class TestBatched(unittest.TestCase):
+
+    def test_batches_are_filled_in_order_with_a_short_tail(self):
+        self.assertEqual(list(batched(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(batched([], 3)), [])
+
+    def test_items_are_pulled_lazily(self):
+        pulled = []
+
+        def items():
+            for i in range(10):
+                pulled.append(i)
+                yield i
+
+        next(batched(items(), 4))
+        self.assertEqual(pulled, [0, 1, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import threading
+from unittest.mock import MagicMock
+
+# Add project root to path to allow importing crd
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from crd.utils.topk import TopKSelector
+from crd.database import DatabaseManager
+from crd.analyzer import ArticleAnalyzer
+
+class TestTopKSelector(unittest.TestCase):
+
+    def test_releases_match_offline_selection(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            count = rng.randint(0, 30)
+            limit = rng.randint(1, 8)
+            scores = {i: rng.choice([None, 1, 3, 5, 6.5, 7, 8, 9, 10, 10]) for i in range(1, count + 1)}
+            order = list(scores)
+            rng.shuffle(order)
+
+            selector = TopKSelector(limit, 6.5, scores)
+            released = []
+            for article_id in order:
+                released += selector.offer(article_id, scores[article_id])
+            released += selector.finish()
+
+            expected = sorted((i for i, s in scores.items() if s is not None and s >= 6.5),
+                              key=lambda i: (-scores[i], i))[:limit]
+            self.assertEqual(sorted(released), sorted(expected))
+            self.assertEqual(selector.selection(), expected)
+
+    def test_top_scores_are_released_before_all_ratings_arrive(self):
+        selector = TopKSelector(2, 5, pending_ids=range(1, 101))
+        self.assertEqual(selector.offer(1, 10), [1])
+        # Id 50 could still be beaten by a pending article with a lower id and a 10.
+        self.assertEqual(selector.offer(50, 10), [])
+        self.assertEqual(selector.offer(2, 3), [])
+        for article_id in range(3, 49):
+            self.assertEqual(selector.discard(article_id), [])
+        # Once no pending article has a lower id, 50 is certain to stay in the top 2.
+        self.assertEqual(selector.discard(49), [50])
+
+    def test_threshold_rises_to_the_cut_line(self):
+        selector = TopKSelector(2, 5, pending_ids=range(1, 5))
+        selector.offer(1, 9)
+        self.assertEqual(selector.threshold(), 5)
+        selector.offer(2, 7)
+        self.assertEqual(selector.threshold(), 7)
+        selector.offer(3, 8)
+        self.assertEqual(selector.threshold(), 8)
+
+class TestOnlineSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        criteria_path = os.path.join(self.test_dir, 'criteria.json')
+        with open(criteria_path, 'w', encoding='utf-8') as f:
+            json.dump({'default': {'Relevance': 10}}, f)
+        self.scores = [3, 10, 7, 9, 2, 10, 8, 6]
+        for i, score in enumerate(self.scores):
+            self.db.add_article({'link': f'http://example.com/{i}', 'title': f'A{i}', 'date': '2024-05-01',
+                                 'fetch_date': '2024-05-01', 'category': 'Test', 'content': f'score {score}'})
+        api_client = MagicMock()
+        api_client.request.side_effect = lambda payload: {'choices': [{'message': {
+            'content': f"Fine. Rating: {payload['messages'][1]['content'].split()[-1]}/10"}}]}
+        self.analyzer = ArticleAnalyzer(self.db, api_client, criteria_path, top_articles=3,
+                                        min_score_map={'Test': 6.5}, max_workers=2)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_selection_matches_batch_selection_and_is_handed_over(self):
+        handed_over = []
+        top_ids = self.analyzer.process('Test', '2024-05-01', on_selected=handed_over.extend)
+
+        ids = self.db.get_article_ids_by_status('selected_for_summary', 'Test', '2024-05-01')
+        by_score = {article_id: self.scores[article_id - 1] for article_id in ids}
+        self.assertEqual(sorted(by_score.values()), [9, 10, 10])
+        self.assertEqual(sorted(handed_over), sorted(ids))
+        self.assertEqual(top_ids, [2, 6, 4])
+
+    def test_two_workers_complete_the_selection_together(self):
+        entered, gate = threading.Event(), threading.Event()
+
+        def slow_rating(payload):
+            entered.set()
+            gate.wait(5)
+            return {'choices': [{'message': {'content': f"Ok. Rating: {payload['messages'][1]['content'].split()[-1]}/10"}}]}
+
+        other_client = MagicMock()
+        other_client.request.side_effect = slow_rating
+        other = ArticleAnalyzer(self.db, other_client, self.analyzer.criteria_path, top_articles=3,
+                                min_score_map={'Test': 6.5}, max_workers=1, worker_id='other')
+        thread = threading.Thread(target=other.process, args=('Test', '2024-05-01'))
+        thread.start()
+        self.assertTrue(entered.wait(5))
+
+        # Article 1 is leased by the other worker, so this one cannot finish the selection alone.
+        self.analyzer.process('Test', '2024-05-01')
+        self.assertEqual(len(self.db.get_article_ids_by_status('selected_for_summary', 'Test', '2024-05-01')), 1)
+
+        gate.set()
+        thread.join(5)
+        self.assertEqual(sorted(self.db.get_article_ids_by_status('selected_for_summary', 'Test', '2024-05-01')), [2, 4, 6])
+        # Every article was rated exactly once across the two workers.
+        self.assertEqual(other_client.request.call_count + self.analyzer.api_client.request.call_count, len(self.scores))
+
+if __name__ == '__main__':
+    unittest.main()
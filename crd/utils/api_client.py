@@ -1,17 +1,30 @@
 import requests
 import logging
+import json
 import time
 
 logger = logging.getLogger(__name__)
 
+# Rough size of a token, for estimating the usage of streams closed before the server reported it.
+CHARS_PER_TOKEN = 4
+
+def estimate_usage(payload, completion_chars):
+    """Estimated token usage of a request whose reply was cut off after ``completion_chars`` characters."""
+    prompt_chars = sum(len(str(message.get('content') or '')) for message in payload.get('messages') or [])
+    return {'prompt_tokens': -(-prompt_chars // CHARS_PER_TOKEN),
+            'completion_tokens': -(-completion_chars // CHARS_PER_TOKEN),
+            'estimated': True}
+
 class APIClient:
     """Client for interacting with OpenAI-compatible APIs"""
     
-    def __init__(self, api_url, api_key, max_retries=3, retry_delay=2):
+    def __init__(self, api_url, api_key, max_retries=3, retry_delay=2, usage_callback=None):
         self.api_url = api_url
         self.api_key = api_key
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        # Called as usage_callback(model, usage) with the response's token usage, if reported.
+        self.usage_callback = usage_callback
         
     def request(self, payload, timeout=30):
         """Make a request to the API with retry logic"""
@@ -29,11 +42,74 @@ class APIClient:
                     timeout=timeout
                 )
                 response.raise_for_status()
-                return response.json()
+                result = response.json()
+                if isinstance(result, dict) and result.get('usage'):
+                    self.report_usage(result.get('model') or payload.get('model'), result['usage'])
+                return result
             except requests.RequestException as e:
                 logger.warning(f"API request failed (attempt {attempt+1}/{self.max_retries}): {e}")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
                 else:
                     logger.error(f"API request failed after {self.max_retries} attempts")
-                    raise
\ No newline at end of file
+                    raise
+
+    def stream(self, payload, timeout=30):
+        """Stream a chat completion, yielding pieces of the reply's content as they arrive.
+
+        Retries like ``request`` until the response starts. Closing the
+        generator early closes the connection, which stops the generation.
+        The server then never sends the final chunk with the token usage, so
+        an estimate (marked ``estimated``) is reported instead.
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+        for attempt in range(self.max_retries):
+            try:
+                response = requests.post(self.api_url, headers=headers, json=payload, timeout=timeout, stream=True)
+                response.raise_for_status()
+                break
+            except requests.RequestException as e:
+                logger.warning(f"API stream request failed (attempt {attempt+1}/{self.max_retries}): {e}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(self.retry_delay)
+                else:
+                    logger.error(f"API stream request failed after {self.max_retries} attempts")
+                    raise
+
+        usage_reported = False
+        completion_chars = 0
+        with response:
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get('usage'):
+                        usage_reported = True
+                        self.report_usage(chunk.get('model') or payload.get('model'), chunk['usage'])
+                    for choice in chunk.get('choices') or []:
+                        content = (choice.get('delta') or {}).get('content')
+                        if content:
+                            completion_chars += len(content)
+                            yield content
+            except GeneratorExit:
+                if not usage_reported:
+                    self.report_usage(payload.get('model'), estimate_usage(payload, completion_chars))
+                raise
+
+    def report_usage(self, model, usage):
+        """Pass token usage to ``usage_callback``; a failing callback never fails the request."""
+        if not self.usage_callback:
+            return
+        try:
+            self.usage_callback(model, usage)
+        except Exception as e:
+            logger.warning(f"Failed to record API usage: {e}")
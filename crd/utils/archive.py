@@ -0,0 +1,142 @@
+import os
+import gzip
+import glob
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# A segment is closed and a new one started once it grows past this many bytes.
+SEGMENT_MAX_BYTES = 100 * 1024 * 1024
+
+SEGMENT_SUFFIX = '.warc.gz'
+INDEX_SUFFIX = '.idx'
+
+# Headers describing a transfer encoding the HTTP client has already undone; the stored body is decoded.
+TRANSFER_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+# Where one record sits: segment file path, byte offset and compressed length.
+RecordLocation = namedtuple('RecordLocation', 'url date path offset length')
+ArchivedResponse = namedtuple('ArchivedResponse', 'url status headers body')
+
+def _warc_record(url, status, headers, body):
+    headers = [(k, v) for k, v in headers.items() if k.lower() not in TRANSFER_HEADERS]
+    http_block = f'HTTP/1.1 {status}\r\n'.encode('utf-8')
+    http_block += ''.join(f'{k}: {v}\r\n' for k, v in headers + [('Content-Length', len(body))]).encode('utf-8')
+    http_block += b'\r\n' + body
+    warc_headers = (
+        'WARC/1.0\r\n'
+        'WARC-Type: response\r\n'
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n'
+        f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+        f'WARC-Target-URI: {url}\r\n'
+        'Content-Type: application/http; msgtype=response\r\n'
+        f'Content-Length: {len(http_block)}\r\n'
+        '\r\n'
+    )
+    return warc_headers.encode('utf-8') + http_block + b'\r\n\r\n'
+
+def _parse_headers(lines):
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    return headers
+
+def read_record(path, offset, length):
+    """Read the response record at ``offset`` of a segment; a plain function so process pools can call it."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+    warc_head, _, rest = data.partition(b'\r\n\r\n')
+    warc_headers = _parse_headers(warc_head.decode('utf-8').split('\r\n')[1:])
+    http_block = rest[:int(warc_headers['Content-Length'])]
+    http_head, _, body = http_block.partition(b'\r\n\r\n')
+    status_line, *header_lines = http_head.decode('utf-8').split('\r\n')
+    return ArchivedResponse(warc_headers['WARC-Target-URI'], int(status_line.split()[1]), _parse_headers(header_lines), body)
+
+def decode_body(response):
+    """The body of an ArchivedResponse as text, using the charset its Content-Type declares."""
+    content_type = next((v for k, v in response.headers.items() if k.lower() == 'content-type'), '')
+    charset = next((p.split('=', 1)[1].strip('"\' ') for p in content_type.split(';') if p.strip().lower().startswith('charset=')), 'utf-8')
+    try:
+        return response.body.decode(charset, errors='replace')
+    except LookupError:
+        return response.body.decode('utf-8', errors='replace')
+
+class PageArchive:
+    """Append-only archive of raw HTTP responses, so pages can be re-extracted offline.
+
+    Responses are stored as WARC response records, each compressed as its own
+    gzip member, in segment files under ``root/<date>/``. Standard WARC tools
+    can read the segments, and a record can be decompressed alone from its
+    offset. Every segment has an ``.idx`` file next to it with one
+    tab-separated line per record: date, URL, offset and length. Each process
+    writes its own segments, so concurrent fetchers never share a file.
+    """
+
+    def __init__(self, root, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._sequence = 0
+
+    def _open_segment(self, date_str):
+        directory = os.path.join(self.root, date_str)
+        os.makedirs(directory, exist_ok=True)
+        self._sequence += 1
+        name = f"crd-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self._sequence:05d}"
+        path = os.path.join(directory, name + SEGMENT_SUFFIX)
+        segment = (path, open(path, 'ab'), open(os.path.join(directory, name + INDEX_SUFFIX), 'a', encoding='utf-8'))
+        self._segments[date_str] = segment
+        return segment
+
+    def write(self, url, status, headers, body, date_str):
+        """Append one response; returns its RecordLocation."""
+        record = gzip.compress(_warc_record(url, status, headers, body))
+        with self._lock:
+            segment = self._segments.get(date_str)
+            if segment is None or segment[1].tell() >= self.segment_max_bytes:
+                if segment:
+                    self._close_segment(segment)
+                segment = self._open_segment(date_str)
+            path, data, index = segment
+            offset = data.tell()
+            data.write(record)
+            data.flush()
+            index.write(f'{date_str}\t{url}\t{offset}\t{len(record)}\n')
+            index.flush()
+        return RecordLocation(url, date_str, path, offset, len(record))
+
+    def _close_segment(self, segment):
+        segment[1].close()
+        segment[2].close()
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments.values():
+                self._close_segment(segment)
+            self._segments = {}
+
+    def locations(self, date_str=None):
+        """The latest archived record of every URL, optionally only those archived for ``date_str``."""
+        latest = {}
+        pattern = os.path.join(self.root, date_str or '*', '*' + INDEX_SUFFIX)
+        # Segment names start with their creation time, so later records override earlier ones.
+        for index_path in sorted(glob.glob(pattern), key=os.path.basename):
+            path = index_path[:-len(INDEX_SUFFIX)] + SEGMENT_SUFFIX
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        date, url, offset, length = line.rstrip('\n').split('\t')
+                        latest[url] = RecordLocation(url, date, path, int(offset), int(length))
+                    except ValueError:
+                        logger.warning(f"Skipping malformed archive index line in {index_path}")
+        return list(latest.values())
+
+    def read(self, location):
+        return read_record(location.path, location.offset, location.length)
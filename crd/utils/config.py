@@ -14,8 +14,16 @@ class Config:
         
         # Model settings
         self.rating_model = os.getenv("RATING_MODEL", "gpt-3.5-turbo")
+        # Optional stronger model that re-rates articles scored near the selection threshold.
+        self.rating_escalation_model = os.getenv("RATING_ESCALATION_MODEL", "")
+        self.rating_escalation_band = float(os.getenv("RATING_ESCALATION_BAND", 1.0))
+        # Output token budget of one rating, and whether to stream ratings and stop at the end of the JSON reply.
+        self.rating_max_tokens = int(os.getenv("RATING_MAX_TOKENS", 150))
+        self.rating_stream = os.getenv("RATING_STREAM", "false").lower() in ("1", "true", "yes")
         self.summary_model = os.getenv("SUMMARY_MODEL", "gpt-4o")
         self.translation_model = os.getenv("TRANSLATION_MODEL", "gpt-4o")
+        # Prices in USD per million tokens, e.g. {"gpt-4o": {"prompt": 2.5, "completion": 10}}
+        self.llm_prices = self.load_json_env("LLM_PRICES")
         
         self.feeds_config = self.load_feeds_config(feeds_config)
         
@@ -29,6 +37,9 @@ class Config:
         self.threads = int(os.getenv("THREADS", 10))
         self.date_range_days = int(os.getenv("DATE_RANGE_DAYS", 7))
         self.top_articles = int(os.getenv("TOP_ARTICLES", 10))
+        # Articles rated per request; above 1 they are ranked listwise from excerpts.
+        self.rating_batch_size = int(os.getenv("RATING_BATCH_SIZE", 1))
+        self.rating_excerpt_chars = int(os.getenv("RATING_EXCERPT_CHARS", 2000))
         
         # Minimum score settings
         self.minimum_score_map = {
@@ -38,7 +49,23 @@ class Config:
         }
         self.minimum_score = float(os.getenv("MINIMUM_SCORE", 6.5)) # Default
         
-        self.keywords = os.getenv("KEYWORDS", "").split(',') if os.getenv("KEYWORDS") else []
+        self.keywords = [k.strip() for k in os.getenv("KEYWORDS", "").split(',') if k.strip()]
+
+    def load_json_env(self, name):
+        """Parses a JSON object from an environment variable, or returns an empty dict."""
+        value = os.getenv(name)
+        if not value:
+            return {}
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing {name}: {e}")
+            return {}
+
+    def llm_cost(self, model, prompt_tokens, completion_tokens):
+        """Cost in USD of a call, or 0.0 if the model has no configured price."""
+        prices = self.llm_prices.get(model, {})
+        return (prompt_tokens * prices.get('prompt', 0) + completion_tokens * prices.get('completion', 0)) / 1_000_000
 
     def load_feeds_config(self, config_path):
         """Loads the feeds configuration from a JSON file."""
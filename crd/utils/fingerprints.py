@@ -0,0 +1,17 @@
+import hashlib
+
+def fingerprint(*parts):
+    """Return a short, stable hash of ``parts``, e.g. the model and prompts a stage runs with."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part if part is not None else '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+def stage_fingerprint(stage_key, content_hash):
+    """The fingerprint stored with a stage's output: the stage's key plus the hash of the content it read.
+
+    The repository's ``invalidate_stale_*`` queries build the same string in
+    SQL (``key || ':' || content_hash``), so the two must stay in step.
+    """
+    return f"{stage_key}:{content_hash or ''}"
@@ -0,0 +1,95 @@
+import re
+
+# Outcomes of KeywordFilter.screen.
+REJECT = 'reject'
+ACCEPT = 'accept'
+CHECK_BODY = 'check_body'
+
+SCOPES = ('content', 'headline')
+
+def _term_pattern(term):
+    """Regex for one term: case-insensitive, whole words at ASCII word edges, and a trailing * matches any suffix."""
+    prefix = term.endswith('*')
+    term = term.rstrip('*').strip()
+    pattern = r'\s+'.join(re.escape(word) for word in term.split())
+    # CJK text has no spaces between words, so only ASCII letters and digits get word boundaries.
+    if re.match(r'[A-Za-z0-9_]', term):
+        pattern = r'(?<![A-Za-z0-9_])' + pattern
+    if prefix:
+        pattern += r'[A-Za-z0-9_]*'
+    elif re.search(r'[A-Za-z0-9_]$', term):
+        pattern += r'(?![A-Za-z0-9_])'
+    return pattern
+
+def _clean_terms(terms):
+    return [t.strip() for t in terms or () if t and t.strip().rstrip('*').strip()]
+
+class KeywordFilter:
+    """A compiled include/exclude keyword rule for one category.
+
+    An article passes if its text contains at least one ``include`` term (when
+    any are configured) and no ``exclude`` term. With ``scope='content'`` the
+    text is the RSS title and summary plus the page body. With
+    ``scope='headline'`` it is only the title and summary, so every decision is
+    made before the page is fetched. All terms are compiled into one regex of
+    zero-width lookaheads, so a single pass finds every include and exclude
+    occurrence, including overlapping ones.
+    """
+
+    def __init__(self, include=(), exclude=(), scope='content'):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown keyword scope {scope!r}; expected one of: {', '.join(SCOPES)}")
+        self.include = _clean_terms(include)
+        self.exclude = _clean_terms(exclude)
+        self.scope = scope
+        alternatives = [f'(?=(?P<exclude>{"|".join(map(_term_pattern, self.exclude))}))'] if self.exclude else []
+        if self.include:
+            alternatives.append(f'(?=(?P<include>{"|".join(map(_term_pattern, self.include))}))')
+        self.pattern = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    @classmethod
+    def from_config(cls, config, default_include=()):
+        """Build the filter from a category's ``keywords`` entry in feeds.json.
+
+        The entry is either a list of include terms or an object with
+        ``include``, ``exclude`` and ``scope``. Categories without one use
+        ``default_include``, i.e. the global KEYWORDS setting.
+        """
+        if config is None:
+            return cls(include=default_include)
+        if isinstance(config, list):
+            return cls(include=config)
+        return cls(config.get('include', ()), config.get('exclude', ()), config.get('scope', 'content'))
+
+    def __bool__(self):
+        return self.pattern is not None
+
+    def scan(self, text):
+        """Return (include found, exclude found) for ``text`` in one pass, stopping at the first exclude."""
+        found_include = False
+        if self.pattern is None or not text:
+            return found_include, False
+        for match in self.pattern.finditer(text):
+            if self.exclude and match.group('exclude') is not None:
+                return found_include, True
+            found_include = True
+            if not self.exclude:
+                break
+        return found_include, False
+
+    def screen(self, *texts, included=False, final=False):
+        """Screen more of an article's text; returns (outcome, whether an include term has been seen).
+
+        The outcome is REJECT, ACCEPT or CHECK_BODY. CHECK_BODY means the body
+        must be fetched and passed back with ``final=True`` and the returned
+        ``included`` flag.
+        """
+        found_include, found_exclude = self.scan('\n'.join(t for t in texts if t))
+        if found_exclude:
+            return REJECT, included
+        included = included or found_include or not self.include
+        if final or self.scope == 'headline':
+            return (ACCEPT if included else REJECT), included
+        if included and not self.exclude:
+            return ACCEPT, included
+        return CHECK_BODY, included
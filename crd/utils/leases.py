@@ -0,0 +1,49 @@
+import os
+import uuid
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+
+def make_worker_id():
+    """A worker id unique across hosts and processes sharing the database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class LeaseKeeper:
+    """Keeps a worker's article leases alive while it works.
+
+    A background thread extends every lease held by ``worker_id`` each
+    ``lease_seconds / 3`` seconds. On exit the thread stops and any leases
+    still held, for example on articles whose processing failed, are
+    released so other workers can pick them up straight away instead of
+    waiting for them to expire.
+    """
+
+    def __init__(self, db_manager, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.db_manager = db_manager
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                self.db_manager.renew_leases(self.worker_id, self.lease_seconds)
+        finally:
+            self.db_manager.close_conn()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f'lease-keeper-{self.worker_id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        released = self.db_manager.release_leases(self.worker_id)
+        if released:
+            logger.info(f"Released {released} unfinished article leases held by {self.worker_id}.")
@@ -0,0 +1,143 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cpu', 'mem')
+PROFILE_STAGES = ('fetch', 'analyze', 'summarize', 'render', 'export')
+
+# Steps that run several stages at once; their CPU and memory cannot be split, so they are
+# profiled under their own label whenever any of the stages they run is selected.
+COMBINED_STAGES = {'analyze_summarize': ('analyze', 'summarize')}
+
+class StageProfiler:
+    """Profiles selected pipeline stages with cProfile (cpu) or tracemalloc (mem).
+
+    CPU profiles cover the stage's thread and every thread started while the
+    stage runs, such as ThreadPoolExecutor workers, and are merged into one
+    ``<stage>.pstats`` file. Memory profiles record the peak traced size and
+    the top allocation sites still alive at the end of the stage, written to
+    ``<stage>.mem.txt``. With ``mode=None`` profiling is disabled and
+    ``profile()`` costs nothing.
+    """
+
+    def __init__(self, mode=None, stages=None, output_dir='.', top=20):
+        if mode not in (None,) + PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.stages = set(stages) if stages else set(PROFILE_STAGES)
+        unknown = self.stages - set(PROFILE_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown profile stages: {', '.join(sorted(unknown))}")
+        self.output_dir = output_dir
+        self.top = top
+        self.results = []
+
+    @contextmanager
+    def profile(self, stage):
+        """Profile the enclosed block if ``stage``, or a stage it combines, was selected."""
+        if self.mode is None or not self.stages.intersection(COMBINED_STAGES.get(stage, (stage,))):
+            yield
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        runner = self._profile_cpu if self.mode == 'cpu' else self._profile_mem
+        with runner(stage):
+            yield
+
+    @contextmanager
+    def _profile_cpu(self, stage):
+        profiles = []
+        lock = threading.Lock()
+
+        def start_thread_profile(frame, event, arg):
+            # Runs once as the first profile event of each new thread; from then
+            # on that thread's own cProfile instance takes over.
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ profiles through sys.monitoring, which allows one
+                # active profiler per interpreter; that one already sees every thread.
+                return
+            with lock:
+                profiles.append(profile)
+
+        main_profile = cProfile.Profile()
+        threading.setprofile(start_thread_profile)
+        main_profile.enable()
+        try:
+            yield
+        finally:
+            main_profile.disable()
+            threading.setprofile(None)
+            stats = pstats.Stats(main_profile)
+            with lock:
+                worker_profiles = list(profiles)
+            for profile in worker_profiles:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    # A thread that never made a profiled call has no stats.
+                    continue
+            path = os.path.join(self.output_dir, f"{stage}.pstats")
+            stats.dump_stats(path)
+            self.results.append({'stage': stage, 'mode': 'cpu', 'path': path, 'threads': len(worker_profiles) + 1,
+                                 'summary': self._hottest(stats)})
+            logger.info(f"CPU profile of {stage} ({len(worker_profiles) + 1} threads) written to {path}")
+
+    def _hottest(self, stats):
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('tottime').print_stats(min(self.top, 10))
+        lines = out.getvalue().splitlines()
+        # Keep the table header and rows; drop pstats' preamble.
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith('ncalls'):
+                return [l for l in lines[i:] if l.strip()]
+        return [l for l in lines if l.strip()]
+
+    @contextmanager
+    def _profile_mem(self, stage):
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap>')]
+            growth = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')[:self.top]
+            lines = [f"Stage {stage}: peak {peak / 1024 / 1024:.1f} MiB, {current / 1024 / 1024:.1f} MiB traced at end, "
+                     f"{time.perf_counter() - start:.2f}s",
+                     f"Top {len(growth)} allocation sites by growth during the stage:"]
+            lines += [f"  {stat}" for stat in growth]
+            path = os.path.join(self.output_dir, f"{stage}.mem.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.results.append({'stage': stage, 'mode': 'mem', 'path': path, 'peak_bytes': peak,
+                                 'summary': lines[:2] + lines[2:2 + min(self.top, 10)]})
+            logger.info(f"Memory profile of {stage} (peak {peak / 1024 / 1024:.1f} MiB) written to {path}")
+
+    def report(self):
+        """Print the hottest functions or largest allocation sites of each profiled stage."""
+        if not self.results:
+            return
+        print("\n--- CRD Profiles ---")
+        for result in self.results:
+            print(f"\n[{result['mode']}] {result['stage']} -> {result['path']}")
+            for line in result['summary']:
+                print(f"  {line}")
+        print("--------------------\n")
@@ -0,0 +1,119 @@
+import os
+import glob
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Article fields that end up on the rendered analysis card. Any change to one of
+# them produces a new content hash and therefore a new cache entry.
+RENDER_FIELDS = ('title', 'chinese_title', 'chinese_summary', 'url', 'source', 'thumbnail_path')
+
+# Bump when the card layout in NewsletterRenderer.generate_article_analysis_image changes, so every card is rendered again.
+CARD_TEMPLATE_VERSION = 1
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+def article_content_hash(article):
+    """Return a short, stable hash of the fields rendered onto an analysis card."""
+    digest = hashlib.sha256(f'v{CARD_TEMPLATE_VERSION}\0'.encode('utf-8'))
+    for field in RENDER_FIELDS:
+        digest.update(str(article.get(field) or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+class RenderCache:
+    """Cache of rendered analysis images keyed by article id and content hash.
+
+    Renders are single-flight: while one caller renders a given key, other
+    callers either wait for it to finish or are told the render is pending.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def key_for(self, article):
+        return article['id'], article_content_hash(article)
+
+    def cache_key(self, article):
+        """String form of the key, used to deduplicate queued render jobs."""
+        return '{}:{}'.format(*self.key_for(article))
+
+    def filename_for(self, article):
+        article_id, content_hash = self.key_for(article)
+        return f"analysis_{article_id}_{content_hash}.png"
+
+    def relpath_for(self, article):
+        """Path of the image relative to the output directory (used for URLs)."""
+        return f"{article['fetch_date']}/{self.filename_for(article)}"
+
+    def path_for(self, article):
+        return os.path.join(self.output_dir, article['fetch_date'], self.filename_for(article))
+
+    def lookup(self, article):
+        """Return the relative path of a fresh cached image, or None."""
+        if os.path.exists(self.path_for(article)):
+            return self.relpath_for(article)
+        return None
+
+    def is_rendering(self, article):
+        with self._lock:
+            return self.key_for(article) in self._inflight
+
+    def invalidate_stale(self, article):
+        """Remove images rendered for older versions of the article's content."""
+        current = self.path_for(article)
+        pattern = os.path.join(self.output_dir, article['fetch_date'], f"analysis_{article['id']}_*.png")
+        for path in glob.glob(pattern):
+            if path != current:
+                try:
+                    os.remove(path)
+                    logger.info(f"Removed stale analysis image {path}")
+                except OSError as e:
+                    logger.warning(f"Could not remove stale analysis image {path}: {e}")
+
+    def get_or_render(self, article, render_fn, wait=True, timeout=None):
+        """Return (status, relpath) for the article's analysis image.
+
+        If the image is not cached, the first caller for a key runs
+        ``render_fn(article, path)``. Concurrent callers for the same key wait
+        for that render when ``wait`` is true, otherwise they get PENDING.
+        """
+        path = self.path_for(article)
+        relpath = self.relpath_for(article)
+        if os.path.exists(path):
+            return READY, relpath
+
+        key = self.key_for(article)
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if leader:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.invalidate_stale(article)
+                render_fn(article, path)
+            except Exception as e:
+                logger.error(f"Render failed for article {article['id']}: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+        else:
+            if not wait:
+                return PENDING, relpath
+            if not event.wait(timeout):
+                return PENDING, relpath
+
+        return (READY if os.path.exists(path) else FAILED), relpath
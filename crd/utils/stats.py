@@ -1,36 +1,211 @@
+import os
+import json
+import math
 import time
+import random
 import logging
+import threading
 from collections import defaultdict
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
-class StatsManager:
-    """A manager to collect and report operational statistics."""
-    def __init__(self):
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, float('inf'))
+
+class LatencyHistogram:
+    """Latency distribution of one timed block.
+
+    Keeps cumulative bucket counts for export plus a bounded reservoir sample
+    of raw durations for percentiles.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.max_samples = max_samples
+        self.samples = []
+
+    def observe(self, duration):
+        self.count += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.bucket_counts[i] += 1
+                break
+        if len(self.samples) < self.max_samples:
+            self.samples.append(duration)
+        else:
+            # Reservoir sampling keeps a uniform sample of all observations.
+            slot = random.randrange(self.count)
+            if slot < self.max_samples:
+                self.samples[slot] = duration
+
+    def percentile(self, p):
+        """Return the p-th percentile (0-100) of the observed durations."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        # Nearest-rank percentile.
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100.0 * len(ordered)) - 1))
+        return ordered[index]
+
+    def merge(self, other):
+        """Fold another histogram into this one (used to combine per-thread shards)."""
+        self.count += other.count
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.bucket_counts = [a + b for a, b in zip(self.bucket_counts, other.bucket_counts)]
+        self.samples.extend(other.samples)
+        if len(self.samples) > self.max_samples:
+            self.samples = random.sample(self.samples, self.max_samples)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_time': self.total_time,
+            'avg': self.total_time / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max_time,
+        }
+
+class _Shard:
+    """Statistics recorded by one thread. Only that thread writes to it, so no locking is needed."""
+
+    def __init__(self, thread):
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
         self.counters = defaultdict(int)
-        self.timings = defaultdict(lambda: {'count': 0, 'total_time': 0.0})
+        self.timings = defaultdict(LatencyHistogram)
+        self.events = []
+        self.span_stack = []
+
+class StatsManager:
+    """A manager to collect and report operational statistics.
+
+    Each thread records into its own shard; shards are merged when the
+    statistics are read. Durations use the monotonic perf_counter clock.
+    With ``trace=True`` every span is also kept as a Chrome trace event,
+    which ``write_trace`` dumps for chrome://tracing or Perfetto.
+    """
+    def __init__(self, trace=False):
+        self.trace = trace
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
         self._start_time = time.time()
+        self._start_clock = time.perf_counter()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _all_shards(self):
+        with self._shards_lock:
+            return list(self._shards)
+
+    @property
+    def counters(self):
+        """Counters merged across all threads."""
+        merged = defaultdict(int)
+        for shard in self._all_shards():
+            for name, value in dict(shard.counters).items():
+                merged[name] += value
+        return merged
+
+    @property
+    def timings(self):
+        """Latency histograms merged across all threads."""
+        merged = defaultdict(LatencyHistogram)
+        for shard in self._all_shards():
+            for name, hist in dict(shard.timings).items():
+                merged[name].merge(hist)
+        return merged
 
     def increment(self, name, count=1):
         """Increment a named counter."""
-        self.counters[name] += count
+        self._shard().counters[name] += count
 
     def record_time(self, name, duration):
         """Record a timing for a named operation."""
-        self.timings[name]['count'] += 1
-        self.timings[name]['total_time'] += duration
+        self._shard().timings[name].observe(duration)
 
     @contextmanager
-    def time_block(self, name):
-        """A context manager to time a block of code."""
-        start = time.time()
-        yield
-        self.record_time(name, time.time() - start)
+    def time_block(self, name, **context):
+        """A context manager to time a block of code.
+
+        The timing is always recorded under ``name``, so metric names stay the
+        same wherever the block runs. Blocks nest: the trace event carries the
+        slash-joined path (e.g. ``article/fetch``) and inherits the enclosing
+        block's context, such as the article id.
+        """
+        shard = self._shard()
+        parent = shard.span_stack[-1] if shard.span_stack else None
+        path = f"{parent[0]}/{name}" if parent else name
+        if parent:
+            context = {**parent[1], **context}
+        shard.span_stack.append((path, context))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            shard.span_stack.pop()
+            shard.timings[name].observe(end - start)
+            if self.trace:
+                shard.events.append({
+                    'name': name, 'cat': path.split('/', 1)[0], 'ph': 'X', 'pid': os.getpid(), 'tid': shard.thread_id,
+                    'ts': (start - self._start_clock) * 1e6, 'dur': (end - start) * 1e6,
+                    'args': {**context, 'path': path}
+                })
+
+    span = time_block
+
+    def trace_events(self):
+        """All recorded spans as Chrome trace events, plus thread name metadata."""
+        events = []
+        for shard in self._all_shards():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': shard.thread_id,
+                           'args': {'name': shard.thread_name}})
+            events.extend(list(shard.events))
+        return events
+
+    def write_trace(self, path):
+        """Write the recorded spans as Chrome trace JSON (open in chrome://tracing or ui.perfetto.dev)."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f, default=str)
+        logger.info(f"Wrote trace with {sum(len(s.events) for s in self._all_shards())} spans to {path}")
+
+    def snapshot(self):
+        """Return the collected counters and timing summaries as plain dicts."""
+        return {
+            'started_at': self._start_time,
+            'duration': time.perf_counter() - self._start_clock,
+            'counters': dict(self.counters),
+            'timings': {name: hist.summary() for name, hist in self.timings.items()},
+        }
+
+    def persist(self, db_manager, command, category=None, target_date=None, status='success'):
+        """Store this run's counters and timing summaries in the pipeline metrics tables."""
+        try:
+            return db_manager.record_pipeline_run(command, category, target_date, status, self.snapshot())
+        except Exception as e:
+            logger.error(f"Failed to persist pipeline metrics: {e}")
+            return None
 
     def report(self):
         """Print a formatted report of all collected statistics."""
-        total_duration = time.time() - self._start_time
+        total_duration = time.perf_counter() - self._start_clock
         print("\n--- CRD Pipeline Statistics ---")
         print(f"Total Execution Time: {total_duration:.2f} seconds")
         print("\nCounters:")
@@ -38,7 +213,8 @@ class StatsManager:
             print(f"  - {name}: {value}")
 
         print("\nTimings:")
-        for name, data in sorted(self.timings.items()):
-            avg_time = data['total_time'] / data['count'] if data['count'] > 0 else 0
-            print(f"  - {name}: {data['count']} calls, {data['total_time']:.2f}s total, {avg_time:.2f}s avg")
-        print("-----------------------------\n")
\ No newline at end of file
+        for name, hist in sorted(self.timings.items()):
+            data = hist.summary()
+            print(f"  - {name}: {data['count']} calls, {data['total_time']:.2f}s total, {data['avg']:.2f}s avg, "
+                  f"p50 {data['p50']:.2f}s, p95 {data['p95']:.2f}s, p99 {data['p99']:.2f}s")
+        print("-----------------------------\n")
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def batched(items, size):
+    """Yield lists of up to ``size`` consecutive items, pulling from ``items`` lazily."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def bounded_map(fn, items, max_workers=10, window=None):
+    """Apply ``fn`` to ``items`` on a thread pool, yielding results as they complete.
+
+    Unlike ``executor.map`` this pulls from ``items`` lazily and keeps at most
+    ``window`` calls (default ``2 * max_workers``) in flight, so a large or
+    unbounded iterable never has to be materialised, and each item can be
+    garbage-collected as soon as its call returns. Exceptions raised by ``fn``
+    propagate when the corresponding result is yielded.
+    """
+    window = window or max_workers * 2
+    iterator = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(fn, item))
+                del item
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
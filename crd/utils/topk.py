@@ -0,0 +1,101 @@
+import bisect
+import heapq
+
+# Ratings are "X/10", so no article still waiting to be rated can score above this.
+MAX_SCORE = 10.0
+
+class TopKSelector:
+    """Online top-N selection over a stream of ratings.
+
+    Articles are ranked by score (descending), then by id (ascending), which
+    matches ``DatabaseManager.select_top_articles_for_summary``. Only articles
+    scoring at least ``min_score`` are candidates. The selector knows which
+    article ids are still ``pending`` a rating. An article is released as soon
+    as it is provably in the final top-N: the candidates ranked above it plus
+    every pending article that could still outrank it number fewer than N.
+    Released articles are never revoked, so handing them to summarization
+    early never changes the final selection.
+    """
+
+    def __init__(self, limit, min_score, pending_ids=(), max_score=MAX_SCORE):
+        self.limit = limit
+        self.min_score = min_score
+        self.max_score = max_score
+        self.pending = sorted(pending_ids)
+        self.heap = []  # min-heap of (score, -id): the weakest current top-N candidate is heap[0]
+        self.released = set()
+        self.offered = set()
+
+    @staticmethod
+    def _rank_key(score, article_id):
+        return (-score, article_id)
+
+    def _remove_pending(self, article_id):
+        index = bisect.bisect_left(self.pending, article_id)
+        if index < len(self.pending) and self.pending[index] == article_id:
+            del self.pending[index]
+
+    def _contenders(self, score, article_id):
+        """Pending articles that could still outrank an article with this score and id."""
+        if score < self.max_score:
+            return len(self.pending)
+        # A pending article can at best tie at the maximum, and then wins only with a lower id.
+        return bisect.bisect_left(self.pending, article_id)
+
+    def offer(self, article_id, score):
+        """Record a rating (``score`` None for a failed rating) and return the ids newly released.
+
+        Repeated offers of a scored article are ignored.
+        """
+        if article_id in self.offered:
+            return []
+        self._remove_pending(article_id)
+        if score is not None:
+            self.offered.add(article_id)
+        if score is not None and score >= self.min_score and self.limit > 0:
+            entry = (score, -article_id)
+            if len(self.heap) < self.limit:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                # Released candidates are provably in the final top-N, so they are never the weakest.
+                heapq.heapreplace(self.heap, entry)
+        return self._release()
+
+    def discard(self, article_id):
+        """Drop an article from the pending set without a score."""
+        return self.offer(article_id, None)
+
+    def _release(self):
+        ranked = sorted(self.heap, key=lambda entry: self._rank_key(entry[0], -entry[1]))
+        newly_released = []
+        for rank, (score, negative_id) in enumerate(ranked):
+            article_id = -negative_id
+            if article_id in self.released:
+                continue
+            if rank + self._contenders(score, article_id) < self.limit:
+                self.released.add(article_id)
+                newly_released.append(article_id)
+        return newly_released
+
+    def threshold(self):
+        """The score a new article must reach to enter the current top-N.
+
+        That is ``min_score`` until N candidates are in, then the weakest
+        candidate's score. It only rises as ratings arrive, and it is safe
+        to read from other threads while ratings are offered.
+        """
+        heap = self.heap
+        if self.limit > 0 and len(heap) >= self.limit:
+            return max(self.min_score, heap[0][0])
+        return self.min_score
+
+    def selection(self):
+        """The current top-N ids in rank order; the final selection once nothing is pending."""
+        ranked = sorted(self.heap, key=lambda entry: self._rank_key(entry[0], -entry[1]))
+        return [-negative_id for _, negative_id in ranked]
+
+    def finish(self, still_pending=()):
+        """Treat pending articles as unrated, except ``still_pending``, and return the ids newly released."""
+        keep = set(still_pending)
+        self.pending = [article_id for article_id in self.pending if article_id in keep]
+        return self._release()
@@ -1,68 +1,188 @@
-from flask import Flask, render_template, request, g, jsonify, url_for
+from flask import Flask, render_template, request, g, jsonify, url_for, Response
 import os
+import json
+import base64
+import binascii
 from datetime import datetime
 
-from ..database import DatabaseManager
-from ..renderer import NewsletterRenderer
+from ..database import open_database, ARTICLE_LIST_FIELDS, validate_article_fields
+from ..utils.render_cache import RenderCache
+from .response_cache import ResponseCache
+from .metrics import render_metrics, PROMETHEUS_CONTENT_TYPE
 
 app = Flask(__name__)
 app.secret_key = 'a_temp_secret_key_for_flashing'
 
 # --- Configuration ---
-DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'crd.db'))
+# A SQLite path or a postgresql:// DSN.
+DATABASE_PATH = os.environ.get('CRD_DATABASE') or os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'crd.db'))
 OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'static', 'output'))
 NEWSLETTER_TITLE = "Research Digest"
 NEWSLETTER_FONT = "Arial, sans-serif"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Images are rendered by `crd render-worker`; the web app only enqueues jobs and serves results.
+render_cache = RenderCache(OUTPUT_DIR)
+response_cache = ResponseCache()
+_db = None
 
 # --- Database Handling ---
 def get_db():
+    """Return the process-wide repository; it hands each thread its own connection."""
+    global _db
     if 'db' not in g:
-        g.db = DatabaseManager(DATABASE_PATH)
+        if _db is None:
+            _db = open_database(DATABASE_PATH)
+            _db.create_tables()
+        g.db = _db
     return g.db
 
-@app.teardown_appcontext
-def close_db(error):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close_conn()
+def cached_json(build, metrics=False):
+    """Serve a JSON response from the response cache, honouring If-None-Match and gzip.
+
+    The cache key is the request path plus its query string; entries are dropped
+    whenever the database generation changes. Responses that also show LLM usage
+    pass ``metrics=True`` to add the metrics generation to their key, so usage
+    writes refresh only those responses.
+    """
+    db = get_db()
+    key = (request.path, tuple(sorted(request.args.items(multi=True))))
+    if metrics:
+        key += (db.get_generation('metrics_generation'),)
+    entry = response_cache.get_or_build(key, db.get_generation(), build)
+
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entry.etags[1] if use_gzip else entry.etags[0]
+    headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if any(tag in if_none_match for tag in entry.etags) or if_none_match.strip() == '*':
+        return Response(status=304, headers=headers)
+
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(entry.gzip_body, mimetype='application/json', headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
 
 # --- Routes ---
 @app.route('/')
 def home():
     return render_template('index.html')
 
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor into a (fetch_date, score, id) key, or raise ValueError."""
+    try:
+        fetch_date, score, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(fetch_date), float(score), int(article_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
 @app.route('/api/articles')
 def api_articles():
+    """List summarized articles.
+
+    Without ``limit`` or ``cursor`` this returns articles for one date (the latest
+    by default) grouped by date and category. With them it returns a flat page
+    across the whole archive plus a ``next_cursor``. ``fields`` selects columns;
+    the default is the list view, which leaves out the article body.
+    """
     db = get_db()
     date_str = request.args.get('date')
     category = request.args.get('category')
+    fields = request.args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(ARTICLE_LIST_FIELDS)
+    paginated = 'limit' in request.args or 'cursor' in request.args
 
-    # If no date is specified, default to the most recent date available.
-    if not date_str:
-        available_dates = db.get_available_dates()
-        if available_dates:
-            date_str = available_dates[0]
+    try:
+        validate_article_fields(fields)
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if paginated:
+        def build_page():
+            articles, next_key = db.get_summarized_articles_page(
+                date_str=date_str, category_filter=category, fields=fields, after=after, limit=limit
+            )
+            return {'articles': articles, 'next_cursor': encode_cursor(next_key) if next_key else None}
+        return cached_json(build_page)
+
+    def build():
+        target_date = date_str
+        # If no date is specified, default to the most recent date available.
+        if not target_date:
+            available_dates = db.get_available_dates()
+            if available_dates:
+                target_date = available_dates[0]
+        if not target_date:
+            return {}
+        return db.get_summarized_articles_for_date(date_str=target_date, category_filter=category, fields=fields)
 
-    articles = db.get_summarized_articles_for_date(date_str=date_str, category_filter=category)
-    return jsonify(articles)
+    return cached_json(build)
+
+@app.route('/api/articles/<int:article_id>')
+def api_article_detail(article_id):
+    """Full record of one summarized article, including its content."""
+    db = get_db()
+
+    article = db.get_article_by_id(article_id)
+    if not article or article['status'] not in ('complete', 'summarized'):
+        return jsonify({'error': 'Article not found'}), 404
+    return cached_json(lambda: article)
 
 @app.route('/api/categories')
 def api_categories():
     db = get_db()
-    categories = db.get_all_categories()
-    return jsonify(categories)
+    return cached_json(db.get_all_categories)
 
 @app.route('/api/available_dates')
 def api_available_dates():
     db = get_db()
-    dates = db.get_available_dates()
-    return jsonify(dates)
+    return cached_json(db.get_available_dates)
+
+@app.route('/api/search')
+def api_search():
+    """Ranked full-text search over summarized articles, with highlighted snippets."""
+    db = get_db()
+    query = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    return cached_json(lambda: {
+        'query': query,
+        'results': db.search_articles(query, limit=limit, category_filter=category)
+    })
 
 @app.route('/stats')
 def stats():
     db = get_db()
     stats_data = db.get_stats()
-    return render_template('stats.html', stats=stats_data)
+    stage_history = db.get_stage_duration_history()
+    return render_template('stats.html', stats=stats_data, stage_history=stage_history)
+
+@app.route('/api/stats')
+def api_stats():
+    db = get_db()
+    return cached_json(db.get_stats, metrics=True)
+
+@app.route('/metrics')
+def metrics():
+    db = get_db()
+    return Response(render_metrics(db), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def enqueue_render(db, article):
+    """Queue a render of the article's analysis card and return the job id."""
+    return db.enqueue_render_job(article['id'], render_cache.cache_key(article), render_cache.relpath_for(article))
 
 @app.route('/share/<int:article_id>')
 def share_article(article_id):
@@ -71,36 +191,21 @@ def share_article(article_id):
     if not article:
         return "Article not found", 404
 
-    date_str = article['fetch_date']
-    output_dir_for_date = os.path.join(OUTPUT_DIR, date_str)
-    os.makedirs(output_dir_for_date, exist_ok=True)
-
-    safe_filename = "".join([c for c in article['title'] if c.isalpha() or c.isdigit() or c.isspace()]).rstrip().replace(' ', '_')
-    image_filename = f"analysis_{safe_filename}.png"
-    image_path = os.path.join(output_dir_for_date, image_filename)
-    image_url_for_template = url_for('static', filename=f'output/{date_str}/{image_filename}')
-
-    # Generate the image if it doesn't exist
-    if not os.path.exists(image_path):
-        renderer = NewsletterRenderer(
-            db_manager=db,
-            title=NEWSLETTER_TITLE,
-            font=NEWSLETTER_FONT,
-            width=600
-        )
-        try:
-            renderer.generate_article_analysis_image(article, image_path)
-        except Exception as e:
-            app.logger.error(f"Error generating image for sharing article {article_id}: {e}", exc_info=True)
-            # Optionally, redirect to the original article anyway or show a generic error page
+    image_relpath = render_cache.lookup(article)
+    if not image_relpath:
+        if enqueue_render(db, article) is None:
             return "Could not generate analysis image.", 500
+        # The page refreshes itself until the worker has rendered the image.
+        return render_template('share.html', article=article, pending=True), 202
 
+    image_url_for_template = url_for('static', filename=f'output/{image_relpath}')
     # For meta tags, we need the full URL
-    image_full_url = url_for('static', filename=f'output/{date_str}/{image_filename}', _external=True)
+    image_full_url = url_for('static', filename=f'output/{image_relpath}', _external=True)
 
     return render_template(
         'share.html',
         article=article,
+        pending=False,
         image_full_url=image_full_url,
         image_url_for_template=image_url_for_template
     )
@@ -113,28 +218,39 @@ def generate_image(article_id):
     if not article:
         return jsonify({'error': 'Article not found'}), 404
 
-    date_str = article['fetch_date']
-    output_dir_for_date = os.path.join(OUTPUT_DIR, date_str)
-    os.makedirs(output_dir_for_date, exist_ok=True)
-    
-    safe_filename = "".join([c for c in article['title'] if c.isalpha() or c.isdigit() or c.isspace()]).rstrip()
-    image_filename = f"analysis_{safe_filename}.png"
-    image_path = os.path.join(output_dir_for_date, image_filename)
-    
-    renderer = NewsletterRenderer(
-        db_manager=db,
-        title=NEWSLETTER_TITLE,
-        font=NEWSLETTER_FONT,
-        width=600
-    )
-    
-    try:
-        renderer.generate_article_analysis_image(article, image_path)
-        image_url = f'/static/output/{date_str}/{image_filename}'
-        return jsonify({'image_url': image_url})
-    except Exception as e:
-        app.logger.error(f"Error generating image for article {article_id}: {e}", exc_info=True)
-        return jsonify({'error': 'Failed to generate image'}), 500
+    image_relpath = render_cache.lookup(article)
+    if image_relpath:
+        return jsonify({'image_url': url_for('static', filename=f'output/{image_relpath}')})
+
+    job_id = enqueue_render(db, article)
+    if job_id is None:
+        return jsonify({'error': 'Failed to queue image generation'}), 500
+    return jsonify({'status': 'queued', 'job_id': job_id, 'poll_url': url_for('render_job_status', job_id=job_id)}), 202
+
+
+@app.route('/render_jobs/<int:job_id>')
+def render_job_status(job_id):
+    db = get_db()
+    job = db.get_render_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job['status'] == 'done':
+        # Look up the current image: the worker renders the latest content even if the job is stale.
+        article = db.get_article_by_id(job['article_id'])
+        image_relpath = render_cache.lookup(article) if article else None
+        if image_relpath:
+            return jsonify({'status': 'done', 'image_url': url_for('static', filename=f'output/{image_relpath}')})
+        return jsonify({'status': 'failed', 'error': 'Rendered image is missing'}), 500
+    if job['status'] == 'failed':
+        return jsonify({'status': 'failed', 'error': job['error'] or 'Failed to generate image'}), 500
+    return jsonify({'status': job['status'], 'poll_url': url_for('render_job_status', job_id=job_id)}), 202
+
+
+@app.route('/api/render_queue/metrics')
+def api_render_queue_metrics():
+    db = get_db()
+    return jsonify(db.get_render_queue_metrics())
 
 if __name__ == '__main__':
     import argparse
@@ -0,0 +1,80 @@
+"""Prometheus text exposition of the pipeline metrics stored in the database."""
+
+from decimal import Decimal
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+QUANTILES = (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99'))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _value(value):
+    """Format a sample value without losing precision: integers exactly, floats in full."""
+    if value is None:
+        return '0'
+    # PostgreSQL returns integer sums as Decimal.
+    if isinstance(value, (int, Decimal)) and value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+class MetricsWriter:
+    """Accumulates metric families and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, metric_type, help_text, samples):
+        """Add a family; samples are (labels, value) pairs, or (suffix, labels, value) for summaries."""
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {metric_type}')
+        for sample in samples:
+            suffix, labels, value = sample if len(sample) == 3 else ('', *sample)
+            self.lines.append(f'{name}{suffix}{_labels(labels)} {_value(value)}')
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+def render_metrics(db):
+    """Render the /metrics page from the pipeline, article and render queue tables."""
+    writer = MetricsWriter()
+    summary = db.get_pipeline_metrics_summary()
+
+    writer.family('crd_pipeline_runs_total', 'counter', 'CLI runs recorded, by command and outcome.',
+                  [({'command': command, 'status': status}, count)
+                   for (command, status), count in sorted(summary['runs'].items())])
+    writer.family('crd_pipeline_events_total', 'counter', 'StatsManager counters summed over all recorded runs.',
+                  [({'name': name}, total) for name, total in sorted(summary['counters'].items())])
+
+    timing_samples = []
+    for name, timing in sorted(summary['timings'].items()):
+        for quantile, column in QUANTILES:
+            timing_samples.append(('', {'name': name, 'quantile': quantile}, timing[column]))
+        timing_samples.append(('_sum', {'name': name}, timing['total']))
+        timing_samples.append(('_count', {'name': name}, timing['count']))
+    writer.family('crd_pipeline_duration_seconds', 'summary',
+                  'Latency of timed pipeline blocks: quantiles from the most recent run that recorded them, '
+                  'count and sum over all runs.', timing_samples)
+
+    stats = db.get_stats()
+    writer.family('crd_articles', 'gauge', 'Articles by category and status.',
+                  [({'category': category, 'status': status}, count)
+                   for category, statuses in sorted(stats.get('status_breakdown', {}).items())
+                   for status, count in sorted(statuses.items())])
+    spend = stats.get('llm_spend_per_day', {}).values()
+    writer.family('crd_llm_calls_total', 'counter', 'LLM API calls.', [({}, sum(day['calls'] for day in spend))])
+    writer.family('crd_llm_tokens_total', 'counter', 'LLM tokens used.',
+                  [({'kind': 'prompt'}, sum(day['prompt_tokens'] for day in spend)),
+                   ({'kind': 'completion'}, sum(day['completion_tokens'] for day in spend))])
+    writer.family('crd_llm_cost_total', 'counter', 'LLM spend in the currency of LLM_PRICES.',
+                  [({}, sum(day['cost'] for day in spend))])
+
+    queue = db.get_render_queue_metrics()
+    writer.family('crd_render_jobs', 'gauge', 'Render jobs by status.',
+                  [({'status': status}, queue.get(key, 0))
+                   for status, key in (('queued', 'queue_depth'), ('running', 'running'), ('done', 'done'), ('failed', 'failed'))])
+    return writer.render()
@@ -0,0 +1,66 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CachedResponse:
+    """A serialized JSON body with its precompressed form and ETag."""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+
+    @property
+    def etags(self):
+        """Strong ETags of the identity and gzip representations."""
+        return f'"{self.etag}"', f'"{self.etag}-gz"'
+
+
+class ResponseCache:
+    """In-process LRU cache of JSON API responses.
+
+    Entries are valid for one database generation; when the pipeline writes to
+    the database the generation changes and the whole cache is dropped.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, generation, build):
+        """Return the cached response for ``key``, building it with ``build()`` on a miss."""
+        if generation is None:
+            # The generation could not be read, so nothing can be safely cached.
+            return CachedResponse(build())
+        with self._lock:
+            # A request that read the generation before a newer write must not populate the cache.
+            outdated = self.generation is not None and generation < self.generation
+            if not outdated:
+                if generation != self.generation:
+                    self._entries.clear()
+                    self.generation = generation
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    return entry
+        if outdated:
+            return CachedResponse(build())
+
+        # Build outside the lock so slow queries don't serialize unrelated keys.
+        entry = CachedResponse(build())
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation = None
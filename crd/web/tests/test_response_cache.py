@@ -0,0 +1,113 @@
+import unittest
+import os
+import gzip
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+from crd.database import DatabaseManager
+from crd.web import app as web_app
+from crd.web.app import app
+
+class ApiTestCase(unittest.TestCase):
+    """Runs the app against a temporary database with one summarized article."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.test_dir, 'test.db'))
+        self.db.create_tables()
+        self._add_summarized('http://example.com/a', 'A', '2024-05-01')
+        patcher = patch.object(web_app, '_db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        web_app.response_cache.clear()
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.test_dir)
+
+    def _add_summarized(self, url, title, date_str):
+        self.db.add_article({
+            'link': url, 'title': title, 'date': date_str,
+            'fetch_date': date_str, 'category': 'Test', 'content': 'body'
+        })
+        article_id = [a for a in self.db.get_articles_by_status('fetched', 'Test', date_str) if a['url'] == url][0]['id']
+        self.db.update_article_summary(article_id, title, 'summary', '摘要')
+
+class TestCachedApiResponses(ApiTestCase):
+
+    def test_repeat_request_with_etag_returns_304(self):
+        response = self.app.get('/api/available_dates')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), ['2024-05-01'])
+        etag = response.headers['ETag']
+
+        response = self.app.get('/api/available_dates', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_gzip_body_is_precompressed(self):
+        response = self.app.get('/api/articles', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        articles = json.loads(gzip.decompress(response.data))
+        self.assertIn('2024-05-01', articles)
+        self.assertIn('Test', articles['2024-05-01'])
+
+    def test_write_invalidates_cached_response(self):
+        etag = self.app.get('/api/available_dates').headers['ETag']
+        self._add_summarized('http://example.com/b', 'B', '2024-05-02')
+
+        response = self.app.get('/api/available_dates', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), ['2024-05-02', '2024-05-01'])
+
+    def test_llm_usage_refreshes_stats_but_keeps_article_responses(self):
+        self.app.get('/api/available_dates')
+        self.app.get('/api/stats')
+        self.db.record_llm_usage('m', 100, 20, day='2024-05-01')
+
+        with patch.object(self.db, 'get_available_dates') as get_available_dates:
+            self.assertEqual(self.app.get('/api/available_dates').get_json(), ['2024-05-01'])
+        get_available_dates.assert_not_called()
+        self.assertEqual(self.app.get('/api/stats').get_json()['llm_spend_per_day']['2024-05-01']['calls'], 1)
+
+class TestArticlesPagination(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._add_summarized('http://example.com/b', 'B', '2024-05-01')
+        self._add_summarized('http://example.com/c', 'C', '2024-05-02')
+
+    def test_default_list_view_omits_content(self):
+        articles = self.app.get('/api/articles?date=2024-05-01').get_json()
+        article = articles['2024-05-01']['Test'][0]
+        self.assertNotIn('content', article)
+        self.assertIn('chinese_summary', article)
+
+    def test_cursor_pages_cover_archive_without_overlap(self):
+        seen = []
+        url = '/api/articles?limit=2&fields=id,title'
+        while url:
+            page = self.app.get(url).get_json()
+            self.assertLessEqual(len(page['articles']), 2)
+            for article in page['articles']:
+                self.assertEqual(set(article), {'id', 'title'})
+            seen.extend(a['title'] for a in page['articles'])
+            url = f"/api/articles?limit=2&fields=id,title&cursor={page['next_cursor']}" if page['next_cursor'] else None
+        self.assertEqual(sorted(seen), ['A', 'B', 'C'])
+        self.assertEqual(seen[0], 'C')
+
+    def test_unknown_field_and_bad_cursor_are_rejected(self):
+        self.assertEqual(self.app.get('/api/articles?fields=id,password').status_code, 400)
+        self.assertEqual(self.app.get('/api/articles?cursor=not-a-cursor').status_code, 400)
+
+    def test_detail_endpoint_includes_content(self):
+        article_id = self.app.get('/api/articles?limit=1&fields=id').get_json()['articles'][0]['id']
+        detail = self.app.get(f'/api/articles/{article_id}').get_json()
+        self.assertEqual(detail['content'], 'body')
+        self.assertEqual(self.app.get('/api/articles/9999').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
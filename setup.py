@@ -19,6 +19,11 @@ setup(
         "concurrent-log-handler",  # For rotating log files
         "tqdm"  # For progress bars
     ],
+    extras_require={
+        "postgres": ["psycopg[binary,pool]"],
+        # pgserver bundles PostgreSQL binaries, so the contract tests can start their own server.
+        "test": ["psycopg[binary,pool]", "pgserver"],
+    },
     entry_points={
         'console_scripts': [
             'crd=crd.cli:main',